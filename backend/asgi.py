@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Proxy endpoints use the async views under ASGI (see sports/async_views.py)
+os.environ.setdefault('ASYNC_PROXY_VIEWS', '1')
 
 application = get_asgi_application()
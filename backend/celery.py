@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
@@ -10,3 +11,25 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks([
     "backend.services",
 ])
+
+
+# Upstream calls made by tasks yield to interactive requests (see rate_limit_service)
+@task_prerun.connect
+def _mark_background_priority(task_id=None, task=None, **kwargs):
+    from backend.services.rate_limit_service import PRIORITY_BACKGROUND, upstream_priority
+    task.request.upstream_priority_token = upstream_priority.set(PRIORITY_BACKGROUND)
+
+
+@task_postrun.connect
+def _reset_priority(task_id=None, task=None, **kwargs):
+    from backend.services.rate_limit_service import upstream_priority
+    token = getattr(task.request, "upstream_priority_token", None)
+    if token is not None:
+        upstream_priority.reset(token)
+
+
+# atexit doesn't run when prefork children exit, so write their buffered odds history here
+@worker_process_shutdown.connect
+def _flush_odds_history(**kwargs):
+    from backend.services.odds_history_service import odds_history
+    odds_history.flush()
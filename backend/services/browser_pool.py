@@ -0,0 +1,300 @@
+import atexit
+import itertools
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class BrowserPoolTimeout(Exception):
+    pass
+
+
+class FakeDriver:
+    """
+    Stand-in for a Selenium driver, used when BROWSER_POOL_DRIVER=fake.
+
+    Implements the subset of the WebDriver API our services call, so the pool,
+    token acquisition and scraping flow can run without Chrome.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, fail_health_check=False):
+        self.id = next(self._ids)
+        self.current_url = "about:blank"
+        self.fail_health_check = fail_health_check
+        self.quit_called = False
+        self._cookies = []
+        self._logs = []
+
+    def get(self, url):
+        self.current_url = url
+        if not any(cookie["name"] == "g_token" for cookie in self._cookies):
+            self._cookies.append({"name": "g_token", "value": f"fake-{uuid.uuid4().hex}"})
+
+    def get_cookies(self):
+        return list(self._cookies)
+
+    def delete_all_cookies(self):
+        self._cookies = []
+
+    def find_element(self, by=None, value=None):
+        return _FakeElement()
+
+    def find_elements(self, by=None, value=None):
+        return [_FakeElement()]
+
+    def execute_script(self, script, *args):
+        if self.fail_health_check:
+            raise RuntimeError("fake driver is unhealthy")
+        if "readyState" in script:
+            return "complete"
+        return None
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+    def get_log(self, log_type):
+        logs, self._logs = self._logs, []
+        return logs
+
+    def set_window_size(self, width, height):
+        pass
+
+    def maximize_window(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class _FakeElement:
+    text = "Login with demo ID"
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        pass
+
+
+class BrowserSession:
+    """A pooled driver plus the bookkeeping used to decide when to recycle it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Pool of warm headless browser sessions.
+
+    Sessions are checked out, used and returned instead of starting and quitting
+    Chrome for every task. Returned sessions are health-checked and recycled
+    after max_uses checkouts or max_age seconds; replacements are created lazily.
+    """
+
+    def __init__(self, size=None, max_uses=None, max_age=None, driver=None,
+                 on_create=None, reset_on_checkin=True, checkout_timeout=None):
+        self.size = size or settings.BROWSER_POOL_SIZE
+        self.max_uses = max_uses or settings.BROWSER_POOL_MAX_USES
+        self.max_age = max_age or settings.BROWSER_POOL_MAX_AGE
+        self.driver_kind = driver or settings.BROWSER_POOL_DRIVER
+        self.checkout_timeout = checkout_timeout or settings.BROWSER_POOL_CHECKOUT_TIMEOUT
+        # Called with each new driver, e.g. to log in or install CDP hooks once per session
+        self.on_create = on_create
+        self.reset_on_checkin = reset_on_checkin
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {"created": 0, "recycled": 0, "unhealthy": 0, "checkouts": 0, "waits": 0}
+
+    def warm(self, count=None):
+        """Start sessions up front so the first callers don't pay the cold start."""
+        for _ in range(min(count or self.size, self.size)):
+            session = self._create_session()
+            if session is None:
+                break
+            self._idle.put(session)
+
+    def checkout(self, timeout=None):
+        """Borrow a healthy session, creating one if the pool is not yet full."""
+        if self._closed:
+            raise BrowserPoolTimeout("Browser pool is closed")
+        deadline = time.monotonic() + (timeout or self.checkout_timeout)
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                session = self._create_session()
+                if session is None:
+                    with self._lock:
+                        self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BrowserPoolTimeout("No browser session available")
+                    try:
+                        session = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        raise BrowserPoolTimeout("No browser session available")
+
+            expired = self._is_expired(session)
+            if expired or not self._is_healthy(session):
+                self._discard(session, recycled=expired)
+                continue
+
+            session.uses += 1
+            with self._lock:
+                self._stats["checkouts"] += 1
+            return session
+
+    def checkin(self, session, healthy=True):
+        """Return a session; broken or worn-out sessions are quit instead of reused."""
+        if not healthy or self._closed or session.uses >= self.max_uses or self._is_expired(session):
+            self._discard(session, recycled=healthy)
+            return
+        if self.reset_on_checkin:
+            self._reset(session)
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Context manager yielding a driver; the session is discarded if the block raises."""
+        browser = self.checkout(timeout)
+        healthy = True
+        try:
+            yield browser.driver
+        except Exception:
+            healthy = self._is_healthy(browser)
+            raise
+        finally:
+            self.checkin(browser, healthy=healthy)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": self.size, "open": self._created, "idle": self._idle.qsize()}
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(session)
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    def _create_session(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        driver = None
+        try:
+            driver = build_driver(self.driver_kind)
+            if self.on_create:
+                self.on_create(driver)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            if driver is not None:
+                driver.quit()
+            raise
+        with self._lock:
+            self._stats["created"] += 1
+        return BrowserSession(driver)
+
+    def _discard(self, session, recycled=True):
+        with self._lock:
+            self._created -= 1
+            self._stats["recycled" if recycled else "unhealthy"] += 1
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+
+    def _is_expired(self, session):
+        return time.monotonic() - session.created_at > self.max_age
+
+    @staticmethod
+    def _is_healthy(session):
+        try:
+            session.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(session):
+        driver = session.driver
+        try:
+            driver.delete_all_cookies()
+            driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            # Drain buffered network events so the next borrower only sees its own
+            driver.get_log("performance")
+        except Exception:
+            pass
+
+
+def build_driver(kind=None, headless=None):
+    """
+    Create a driver of the given kind: "chrome", "undetected" or "fake".
+
+    BROWSER_POOL_DRIVER=fake forces fake drivers everywhere, so pools that ask
+    for a specific browser can still run without Chrome installed.
+    """
+    kind = kind or settings.BROWSER_POOL_DRIVER
+    headless = settings.BROWSER_POOL_HEADLESS if headless is None else headless
+
+    if kind == "fake" or settings.BROWSER_POOL_DRIVER == "fake":
+        return FakeDriver()
+
+    if kind == "undetected":
+        import undetected_chromedriver as uc
+        options = uc.ChromeOptions()
+        options.add_argument("--disable-notifications")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        if headless:
+            options.add_argument("--headless=new")
+        return uc.Chrome(options=options)
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--window-size=1920,1080")
+    # Network logging is needed by SimpleAPIScraper to read API payloads
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return webdriver.Chrome(options=options)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Process-wide pool shared by token acquisition and scraping."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,454 @@
+import asyncio
+import json
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend.services.redis_service import get_redis_client
+from backend.services.scaper_service import (
+    get_highlight_home_private,
+    get_highlight_home_private_async,
+    get_odds,
+    get_odds_async,
+)
+
+CACHE_FRESH = "hit"
+CACHE_STALE = "stale"
+CACHE_MISS = "miss"
+
+_revalidate_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-revalidate")
+_batch_executor = ThreadPoolExecutor(max_workers=settings.ODDS_BATCH_WORKERS, thread_name_prefix="cache-batch")
+
+
+class CacheEntry:
+    """Cached value as stored in Redis (JSON bytes) plus how it was served."""
+
+    __slots__ = ("raw", "state", "age_ms", "_data")
+
+    def __init__(self, raw, state, age_ms, data=None):
+        self.raw = raw
+        self.state = state
+        self.age_ms = age_ms
+        self._data = data
+
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.raw)
+        return self._data
+
+
+class StaleWhileRevalidateCache:
+    """
+    Redis cache with a fresh TTL, a stale-while-revalidate window and coalesced misses.
+
+    Values are stored as JSON under "{prefix}/{id}" with an expiry of
+    ttl_ms + stale_ms, so the entry age is derived from its PTTL and no
+    timestamp has to be stored next to the value:
+      - age < ttl_ms                → served as a hit
+      - ttl_ms <= age (still in Redis) → served stale, refreshed in the background
+      - missing                     → one caller per key fetches, the rest wait for it
+
+    Misses are coalesced in-process (one fetch per key per process) and across
+    processes with a short Redis lock, so a burst for the same key costs a
+    single upstream call.
+    """
+
+    def __init__(self, prefix, ttl_ms, stale_ms, lock_timeout_ms=3000, redis_client=None):
+        self.prefix = prefix
+        self.ttl_ms = ttl_ms
+        self.stale_ms = stale_ms
+        self.lock_timeout_ms = lock_timeout_ms
+        self.redis = redis_client or get_redis_client()
+
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._counts = {CACHE_FRESH: 0, CACHE_STALE: 0, CACHE_MISS: 0}
+        self._unflushed = dict(self._counts)
+        self._last_flush = time.monotonic()
+        # Sync callers record from several threads at once
+        self._counts_lock = threading.Lock()
+        # The event loop only keeps weak references to tasks: hold background refreshes until done
+        self._background_tasks = set()
+
+    def key(self, item_id):
+        return f"{self.prefix}/{item_id}"
+
+    def peek(self, item_id):
+        """Return the cached entry (fresh or stale) without fetching, or None."""
+        raw, pttl = self._read(self.key(item_id))
+        if raw is None:
+            return None
+        age_ms = self._age_ms(pttl)
+        return CacheEntry(raw, CACHE_FRESH if age_ms < self.ttl_ms else CACHE_STALE, age_ms)
+
+    def get_or_fetch(self, item_id, fetch):
+        """Return a CacheEntry for item_id, calling fetch() on a miss or in the background when stale."""
+        key = self.key(item_id)
+        entry = self.peek(item_id)
+        if entry is not None:
+            if entry.state == CACHE_STALE:
+                _revalidate_executor.submit(self._revalidate, key, fetch)
+            self._record(entry.state)
+            return entry
+
+        self._record(CACHE_MISS)
+        return self._fetch_coalesced(key, fetch)
+
+    async def aget_or_fetch(self, item_id, fetch):
+        """Async get_or_fetch; fetch is a coroutine function. Redis calls run in a thread."""
+        key = self.key(item_id)
+        entry = await sync_to_async(self.peek, thread_sensitive=False)(item_id)
+        if entry is not None:
+            if entry.state == CACHE_STALE:
+                self._spawn(self._arevalidate(key, fetch))
+            self._record(entry.state)
+            return entry
+
+        self._record(CACHE_MISS)
+        return await self._afetch_coalesced(key, fetch)
+
+    def get_many_or_fetch(self, items, timeout):
+        """
+        Batch get_or_fetch for (item_id, fetch) pairs, returning a list aligned with items.
+
+        Cached entries are read in one pipeline; misses are fetched concurrently on
+        a bounded pool. Each slot holds a CacheEntry, the exception raised by its
+        fetch, or None when it was not ready within timeout seconds.
+        """
+        items = list(items)
+        results = self.peek_many([item_id for item_id, _ in items])
+        pending = {}
+        for index, ((item_id, fetch), entry) in enumerate(zip(items, results)):
+            key = self.key(item_id)
+            if entry is None:
+                self._record(CACHE_MISS)
+                pending[_batch_executor.submit(self._fetch_coalesced, key, fetch)] = index
+                continue
+            if entry.state == CACHE_STALE:
+                _revalidate_executor.submit(self._revalidate, key, fetch)
+            self._record(entry.state)
+
+        done, not_done = wait(pending, timeout=timeout)
+        for future in not_done:
+            # Queued fetches are dropped; running ones finish and still fill the cache
+            future.cancel()
+        for future in done:
+            results[pending[future]] = future.exception() or future.result()
+        return results
+
+    async def aget_many_or_fetch(self, items, timeout):
+        """Async get_many_or_fetch; fetch is a coroutine function."""
+        items = list(items)
+        results = await sync_to_async(self.peek_many, thread_sensitive=False)([item_id for item_id, _ in items])
+        pending = {}
+        for index, ((item_id, fetch), entry) in enumerate(zip(items, results)):
+            key = self.key(item_id)
+            if entry is None:
+                self._record(CACHE_MISS)
+                pending[asyncio.ensure_future(self._afetch_coalesced(key, fetch))] = index
+                continue
+            if entry.state == CACHE_STALE:
+                self._spawn(self._arevalidate(key, fetch))
+            self._record(entry.state)
+
+        if pending:
+            done, not_done = await asyncio.wait(pending, timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            for task in done:
+                results[pending[task]] = task.exception() or task.result()
+        return results
+
+    def peek_many(self, item_ids):
+        """peek for many ids in one round-trip; a list of CacheEntry or None aligned with item_ids."""
+        pipe = self.redis.pipeline(transaction=False)
+        for item_id in item_ids:
+            key = self.key(item_id)
+            pipe.get(key)
+            pipe.pttl(key)
+        replies = pipe.execute()
+
+        entries = []
+        for raw, pttl in zip(replies[::2], replies[1::2]):
+            if raw is None:
+                entries.append(None)
+                continue
+            age_ms = self._age_ms(pttl)
+            entries.append(CacheEntry(raw, CACHE_FRESH if age_ms < self.ttl_ms else CACHE_STALE, age_ms))
+        return entries
+
+    def store(self, item_id, value):
+        """Write a value (object or pre-encoded JSON bytes) as fresh."""
+        raw = self._encode(value)
+        self.redis.set(self.key(item_id), raw, px=self.ttl_ms + self.stale_ms)
+        return raw
+
+    def store_many(self, items):
+        """Write many (item_id, value) pairs in one pipeline round-trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        for item_id, value in items:
+            pipe.set(self.key(item_id), self._encode(value), px=self.ttl_ms + self.stale_ms)
+        pipe.execute()
+
+    def stats(self):
+        """Hit/miss/stale counts across all processes, plus this process' own counts."""
+        self._flush_counts(force=True)
+        totals = self.redis.hgetall(self._stats_key())
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {
+            "cluster": {name.decode("utf-8"): int(value) for name, value in totals.items()},
+            "process": counts,
+            "ttl_ms": self.ttl_ms,
+            "stale_ms": self.stale_ms,
+        }
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    def _read(self, key):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        return pipe.execute()
+
+    def _age_ms(self, pttl):
+        # Entries written with another expiry (e.g. by scrape_events) may look younger
+        # or older than they are; clamp so they are at worst treated as stale
+        if pttl is None or pttl < 0:
+            return self.ttl_ms
+        return max(0, self.ttl_ms + self.stale_ms - pttl)
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def _lock_key(self, key):
+        return f"{key}:lock"
+
+    def _fetch_coalesced(self, key, fetch):
+        # In-process: the first thread fetches, the others wait on its event
+        with self._inflight_lock:
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = {"event": threading.Event(), "entry": None, "error": None}
+                self._inflight[key] = waiter
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            waiter["event"].wait(self.lock_timeout_ms / 1000)
+            if waiter["entry"] is not None:
+                return waiter["entry"]
+            if waiter["error"] is not None:
+                raise waiter["error"]
+            return self._fetch_locked(key, fetch)
+
+        try:
+            waiter["entry"] = self._fetch_locked(key, fetch)
+            return waiter["entry"]
+        except Exception as e:
+            waiter["error"] = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            waiter["event"].set()
+
+    def _fetch_locked(self, key, fetch):
+        # Across processes: whoever takes the Redis lock fetches, others poll for the value
+        lock_key = self._lock_key(key)
+        if self.redis.set(lock_key, b"1", nx=True, px=self.lock_timeout_ms):
+            try:
+                return self._fetch_and_store(key, fetch)
+            finally:
+                self.redis.delete(lock_key)
+
+        deadline = time.monotonic() + self.lock_timeout_ms / 1000
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            raw, pttl = self._read(key)
+            if raw is not None:
+                return CacheEntry(raw, CACHE_FRESH, self._age_ms(pttl))
+        # The lock holder failed or is too slow, fetch ourselves
+        return self._fetch_and_store(key, fetch)
+
+    def _fetch_and_store(self, key, fetch):
+        data = fetch()
+        raw = self._encode(data)
+        self.redis.set(key, raw, px=self.ttl_ms + self.stale_ms)
+        return CacheEntry(raw, CACHE_MISS, 0, data=None if isinstance(data, (bytes, bytearray)) else data)
+
+    def _revalidate(self, key, fetch):
+        lock_key = self._lock_key(key)
+        if not self.redis.set(lock_key, b"1", nx=True, px=self.lock_timeout_ms):
+            return
+        try:
+            self._fetch_and_store(key, fetch)
+        except Exception as e:
+            print(f"Background refresh of {key} failed: {e}")
+        finally:
+            self.redis.delete(lock_key)
+
+    async def _afetch_coalesced(self, key, fetch):
+        # Per event loop: the first coroutine fetches, the others await its future
+        loop_inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        future = loop_inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._afetch_locked(key, fetch))
+        loop_inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            loop_inflight.pop(key, None)
+
+    async def _afetch_locked(self, key, fetch):
+        lock_key = self._lock_key(key)
+        acquired = await sync_to_async(self.redis.set, thread_sensitive=False)(
+            lock_key, b"1", nx=True, px=self.lock_timeout_ms
+        )
+        if acquired:
+            try:
+                return await self._afetch_and_store(key, fetch)
+            finally:
+                await sync_to_async(self.redis.delete, thread_sensitive=False)(lock_key)
+
+        deadline = time.monotonic() + self.lock_timeout_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            raw, pttl = await sync_to_async(self._read, thread_sensitive=False)(key)
+            if raw is not None:
+                return CacheEntry(raw, CACHE_FRESH, self._age_ms(pttl))
+        return await self._afetch_and_store(key, fetch)
+
+    async def _afetch_and_store(self, key, fetch):
+        data = await fetch()
+        raw = self._encode(data)
+        await sync_to_async(self.redis.set, thread_sensitive=False)(key, raw, px=self.ttl_ms + self.stale_ms)
+        return CacheEntry(raw, CACHE_MISS, 0, data=None if isinstance(data, (bytes, bytearray)) else data)
+
+    async def _arevalidate(self, key, fetch):
+        lock_key = self._lock_key(key)
+        acquired = await sync_to_async(self.redis.set, thread_sensitive=False)(
+            lock_key, b"1", nx=True, px=self.lock_timeout_ms
+        )
+        if not acquired:
+            return
+        try:
+            await self._afetch_and_store(key, fetch)
+        except Exception as e:
+            print(f"Background refresh of {key} failed: {e}")
+        finally:
+            await sync_to_async(self.redis.delete, thread_sensitive=False)(lock_key)
+
+    def _stats_key(self):
+        return f"cache-stats/{self.prefix}"
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _record(self, state):
+        with self._counts_lock:
+            self._counts[state] += 1
+            self._unflushed[state] += 1
+        self._flush_counts()
+
+    def _flush_counts(self, force=False):
+        # Counters are batched per process and pushed to Redis every few seconds
+        with self._counts_lock:
+            if not force and time.monotonic() - self._last_flush < 5:
+                return
+            self._last_flush = time.monotonic()
+            pending, self._unflushed = self._unflushed, dict.fromkeys(self._unflushed, 0)
+        pipe = self.redis.pipeline(transaction=False)
+        for state, count in pending.items():
+            if count:
+                pipe.hincrby(self._stats_key(), state, count)
+        pipe.execute()
+
+
+# ----------------------------------------------
+#                 ODDS CACHE
+# ----------------------------------------------
+
+# Same key convention as the scrape_events command: events-odds/{event_id}
+odds_cache = StaleWhileRevalidateCache(
+    "events-odds",
+    ttl_ms=settings.ODDS_CACHE_TTL_MS,
+    stale_ms=settings.ODDS_CACHE_STALE_MS,
+    lock_timeout_ms=settings.ODDS_CACHE_LOCK_TIMEOUT_MS,
+)
+
+
+def get_cached_odds(sport_id: int, event_id: int, password: str):
+    """get_odds behind the odds cache. Returns a CacheEntry."""
+    # Misses store the decrypted bytes as-is: the cache holds JSON anyway
+    return odds_cache.get_or_fetch(event_id, lambda: get_odds(sport_id, event_id, password, raw=True))
+
+
+async def get_cached_odds_async(sport_id: int, event_id: int, password: str):
+    """get_odds_async behind the odds cache. Returns a CacheEntry."""
+    return await odds_cache.aget_or_fetch(event_id, lambda: get_odds_async(sport_id, event_id, password, raw=True))
+
+
+def get_cached_odds_many(pairs, password: str, timeout: float):
+    """
+    get_cached_odds for many (sport_id, event_id) pairs within one deadline.
+
+    Returns a list aligned with pairs holding a CacheEntry, an exception, or None
+    for events whose fetch did not finish before the timeout.
+    """
+    return odds_cache.get_many_or_fetch(
+        [(event_id, _odds_fetcher(sport_id, event_id, password)) for sport_id, event_id in pairs], timeout
+    )
+
+
+async def get_cached_odds_many_async(pairs, password: str, timeout: float):
+    """Async get_cached_odds_many."""
+    return await odds_cache.aget_many_or_fetch(
+        [(event_id, _async_odds_fetcher(sport_id, event_id, password)) for sport_id, event_id in pairs], timeout
+    )
+
+
+def _odds_fetcher(sport_id, event_id, password):
+    return lambda: get_odds(sport_id, event_id, password, raw=True)
+
+
+def _async_odds_fetcher(sport_id, event_id, password):
+    return lambda: get_odds_async(sport_id, event_id, password, raw=True)
+
+
+# ----------------------------------------------
+#                 HIGHLIGHT CACHE
+# ----------------------------------------------
+
+# Kept warm by prefetch_highlights_task; the TTLs only matter if the prefetch stalls
+highlight_cache = StaleWhileRevalidateCache(
+    "highlight-home",
+    ttl_ms=settings.HIGHLIGHT_CACHE_TTL_MS,
+    stale_ms=settings.HIGHLIGHT_CACHE_STALE_MS,
+    lock_timeout_ms=settings.ODDS_CACHE_LOCK_TIMEOUT_MS,
+)
+
+
+def get_cached_highlight(etid: int, password: str):
+    """get_highlight_home_private behind the highlight cache. Returns a CacheEntry."""
+    return highlight_cache.get_or_fetch(etid, lambda: get_highlight_home_private(etid, password, raw=True))
+
+
+async def get_cached_highlight_async(etid: int, password: str):
+    """get_highlight_home_private_async behind the highlight cache. Returns a CacheEntry."""
+    return await highlight_cache.aget_or_fetch(etid, lambda: get_highlight_home_private_async(etid, password, raw=True))
@@ -1,10 +1,22 @@
 import json
 import hashlib
 from base64 import b64decode
+from functools import lru_cache
 from Crypto.Cipher import AES
 import os
 from base64 import b64encode
 
+try:
+    import orjson
+except ImportError:  # optional: faster parsing of large decrypted payloads
+    orjson = None
+
+KEY_LEN = 32
+IV_LEN = 16
+SALT_HEADER = b"Salted__"
+KEY_CACHE_SIZE = int(os.getenv("CRYPT_KEY_CACHE_SIZE", "1024"))
+
+
 def openssl_bytes_to_key(password: bytes, salt: bytes, key_len: int, iv_len: int):
     """
     Replicates OpenSSL's EVP_BytesToKey (MD5 based).
@@ -18,32 +30,108 @@ def openssl_bytes_to_key(password: bytes, salt: bytes, key_len: int, iv_len: int
     return dtot[:key_len], dtot[key_len:key_len + iv_len]
 
 
-def decrypt_data(ciphertext: str, password: str):
-    raw = b64decode(ciphertext)
+class CryptEngine:
+    """
+    AES-256-CBC helper compatible with the OpenSSL "Salted__" format used by d247.
+
+    Derived key/IV pairs are kept in a bounded LRU cache keyed by (password, salt),
+    so repeated payloads sharing a salt skip the MD5 derivation loop.
+    """
+
+    def __init__(self, key_cache_size: int = KEY_CACHE_SIZE):
+        self._derive = lru_cache(maxsize=key_cache_size)(self._derive_uncached)
+
+    @staticmethod
+    def _derive_uncached(password: bytes, salt: bytes):
+        return openssl_bytes_to_key(password, salt, KEY_LEN, IV_LEN)
+
+    def derive_key(self, password: bytes, salt: bytes):
+        return self._derive(password, salt)
+
+    def cache_info(self):
+        return self._derive.cache_info()
+
+    def clear_cache(self):
+        self._derive.cache_clear()
+
+    def decrypt(self, ciphertext: str, password: str, raw: bool = False):
+        """Decrypt one payload. With raw=True the decrypted bytes are returned unparsed."""
+        return self._decrypt(ciphertext, password.encode(), raw)
+
+    def decrypt_many(self, ciphertexts, password: str, raw: bool = False):
+        """Decrypt a batch of payloads sharing one password."""
+        password_bytes = password.encode()
+        return [self._decrypt(ciphertext, password_bytes, raw) for ciphertext in ciphertexts]
+
+    def encrypt(self, data, password: str, salt: bytes = None) -> str:
+        """Encrypt data (str or JSON-serializable) and return the Base64 OpenSSL blob."""
+        return self._encrypt(data, password.encode(), salt)
+
+    def encrypt_many(self, items, password: str, share_salt: bool = False):
+        """
+        Encrypt a batch of payloads sharing one password.
 
-    if not raw.startswith(b"Salted__"):
-        raise ValueError("Invalid ciphertext format")
+        A fresh salt is used per item by default. share_salt=True derives the key
+        once for the whole batch; only use it for non-sensitive request payloads,
+        since identical plaintexts then produce identical ciphertexts.
+        """
+        password_bytes = password.encode()
+        salt = os.urandom(8) if share_salt else None
+        return [self._encrypt(data, password_bytes, salt) for data in items]
 
-    salt = raw[8:16]
-    encrypted = raw[16:]
+    def _decrypt(self, ciphertext, password: bytes, raw: bool):
+        blob = b64decode(ciphertext)
 
-    key, iv = openssl_bytes_to_key(password.encode(), salt, 32, 16)
-    cipher = AES.new(key, AES.MODE_CBC, iv)
+        if not blob.startswith(SALT_HEADER):
+            raise ValueError("Invalid ciphertext format")
 
-    decrypted = cipher.decrypt(encrypted)
+        salt = blob[8:16]
+        key, iv = self._derive(password, salt)
+        decrypted = AES.new(key, AES.MODE_CBC, iv).decrypt(blob[16:])
 
-    # Remove PKCS7 padding
-    pad_len = decrypted[-1]
-    if pad_len < 1 or pad_len > AES.block_size:
-        raise ValueError("Invalid padding")
-    decrypted = decrypted[:-pad_len]
+        # Remove PKCS7 padding
+        pad_len = decrypted[-1]
+        if pad_len < 1 or pad_len > AES.block_size:
+            raise ValueError("Invalid padding")
+        decrypted = decrypted[:-pad_len]
 
-    text = decrypted.decode("utf-8")
-    try:
-        return json.loads(text)
-    except Exception:
-        return text
+        if raw:
+            return decrypted
 
+        text = decrypted.decode("utf-8")
+        try:
+            return orjson.loads(decrypted) if orjson is not None else json.loads(text)
+        except Exception:
+            return text
+
+    def _encrypt(self, data, password: bytes, salt: bytes = None) -> str:
+        # Convert to JSON string if dict/object
+        if not isinstance(data, str):
+            data = json.dumps(data)
+
+        data_bytes = data.encode("utf-8")
+
+        # PKCS7 padding
+        pad_len = AES.block_size - (len(data_bytes) % AES.block_size)
+        data_bytes += bytes([pad_len]) * pad_len
+
+        salt = salt or os.urandom(8)
+        key, iv = self._derive(password, salt)
+        encrypted = AES.new(key, AES.MODE_CBC, iv).encrypt(data_bytes)
+
+        # Prepend Salted__ + salt (OpenSSL format)
+        return b64encode(SALT_HEADER + salt + encrypted).decode("utf-8")
+
+
+default_engine = CryptEngine()
+
+
+def decrypt_data(ciphertext: str, password: str, raw: bool = False):
+    return default_engine.decrypt(ciphertext, password, raw=raw)
+
+
+def decrypt_many(ciphertexts, password: str, raw: bool = False):
+    return default_engine.decrypt_many(ciphertexts, password, raw=raw)
 
 
 def encrypt_data(data, password: str) -> str:
@@ -51,25 +139,8 @@ def encrypt_data(data, password: str) -> str:
     Encrypts data using AES-256-CBC (OpenSSL compatible with Salted__ header).
     Returns Base64 encoded string.
     """
-    # Convert to JSON string if dict/object
-    if not isinstance(data, str):
-        data = json.dumps(data)
-
-    data_bytes = data.encode("utf-8")
-
-    # PKCS7 padding
-    pad_len = AES.block_size - (len(data_bytes) % AES.block_size)
-    data_bytes += bytes([pad_len]) * pad_len
-
-    # Generate salt
-    salt = os.urandom(8)
-
-    # Derive key and IV
-    key, iv = openssl_bytes_to_key(password.encode(), salt, 32, 16)
+    return default_engine.encrypt(data, password)
 
-    cipher = AES.new(key, AES.MODE_CBC, iv)
-    encrypted = cipher.encrypt(data_bytes)
 
-    # Prepend Salted__ + salt (OpenSSL format)
-    openssl_blob = b"Salted__" + salt + encrypted
-    return b64encode(openssl_blob).decode("utf-8")
+def encrypt_many(items, password: str, share_salt: bool = False):
+    return default_engine.encrypt_many(items, password, share_salt=share_salt)
@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from backend.services.browser_pool import BrowserPool
+from backend.services.cache_service import odds_cache
+from backend.services.crypt_service import decrypt_data
+from backend.services.odds_delta_service import publish_odds_deltas
+
+# -------------------------
+# JS hook for capturing gamedataPrivate responses
+# -------------------------
+CAPTURE_JS = r"""
+(function() {
+  if (window.__gamedataHookInstalled) return;
+  window.__gamedataHookInstalled = true;
+  window.__capturedGamedata = [];
+
+  const tryPush = (url, text) => {
+    if (/gamedataPrivate/.test(url)) {
+      window.__capturedGamedata.push({url, text, ts: Date.now()});
+    }
+  };
+
+  const _fetch = window.fetch;
+  if (_fetch) {
+    window.fetch = function() {
+      return _fetch.apply(this, arguments).then(async function(response) {
+        try {
+          const clone = response.clone();
+          const ct = clone.headers.get('content-type') || '';
+          if (ct.indexOf('application/json') !== -1) {
+            const text = await clone.text();
+            tryPush(clone.url, text);
+          }
+        } catch(e){}
+        return response;
+      });
+    };
+  }
+
+  const _open = XMLHttpRequest.prototype.open;
+  const _send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.open = function(method, url) {
+    this.__requestedUrl = url;
+    return _open.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.send = function(body) {
+    this.addEventListener && this.addEventListener('readystatechange', function() {
+      if(this.readyState === 4 && this.responseText){
+        tryPush(this.__requestedUrl, this.responseText);
+      }
+    });
+    return _send.apply(this, arguments);
+  };
+})();
+"""
+
+
+def capture_events(worker, events, password=None, capture_timeout=5.0):
+    """
+    Capture gamedataPrivate for (event_id, sport_oid) pairs in one logged-in browser.
+
+    Runs in its own process when the command is sharded, so it only relies on
+    settings and Redis, not on the ORM. Every captured payload is decrypted and
+    written to the odds cache (events-odds/{event_id}) and the delta streams.
+    Returns counts, timing and the failed event ids of this worker by error.
+    """
+    password = password or os.getenv("DECRYPTION_KEY")
+    started = time.perf_counter()
+    # One session for the whole shard: log in once, recycle only on max_age
+    pool = BrowserPool(
+        size=1, max_uses=len(events) + 1, driver="undetected",
+        on_create=lambda driver: prepare_capture_driver(driver, worker), reset_on_checkin=False,
+    )
+    stats = {"worker": worker, "events": len(events), "captured": 0, "failed": 0, "failures": {}}
+
+    try:
+        for event_id, sport_oid in events:
+            url = f"https://d247.com/game-details/{sport_oid}/{event_id}/"
+            try:
+                with pool.session() as driver:
+                    try:
+                        driver.get(url)
+                        captured = _wait_for_capture(driver, capture_timeout)
+                    finally:
+                        # Clear captured array for next event
+                        driver.execute_script("window.__capturedGamedata = [];")
+                _store_captured(event_id, captured, password)
+                stats["captured"] += 1
+                print(f"[worker {worker}] Saved decrypted data for event {event_id}", flush=True)
+            except Exception as e:
+                stats["failed"] += 1
+                stats["failures"].setdefault(str(e) or type(e).__name__, []).append(str(event_id))
+                print(f"[worker {worker}] Event {event_id} failed: {e}", flush=True)
+    finally:
+        pool.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def prepare_capture_driver(driver, worker=0):
+    """Runs once per browser session: install the capture hook and log in."""
+    # Inject JS hook for capturing gamedataPrivate
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": CAPTURE_JS})
+
+    # Random viewport
+    width = random.randint(300, 1920)
+    height = random.randint(500, 1080)
+    driver.set_window_size(width, height)
+
+    # 1️⃣ Open main page and login
+    driver.get("https://d247.com/")
+    WebDriverWait(driver, 10).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+
+    # Find and click "Login with demo ID" button
+    try:
+        buttons = driver.find_elements(By.TAG_NAME, "button")
+        for btn in buttons:
+            if "Login with demo ID" in btn.text:
+                btn.click()
+                print(f"[worker {worker}] Clicked 'Login with demo ID'", flush=True)
+                break
+    except Exception as e:
+        print(f"[worker {worker}] Error clicking login button: {e}", flush=True)
+
+    # Wait for the login to set the g_token cookie instead of sleeping a fixed time
+    try:
+        WebDriverWait(driver, 10).until(lambda d: any(c["name"] == "g_token" for c in d.get_cookies()))
+    except TimeoutException:
+        print(f"[worker {worker}] No g_token cookie after login, continuing", flush=True)
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _wait_for_capture(driver, timeout):
+    """The gamedataPrivate responses captured on the page, waiting up to timeout for the first one."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script("return (window.__capturedGamedata || []).length")
+        )
+    except TimeoutException:
+        raise ValueError("no gamedata captured")
+    return driver.execute_script("return window.__capturedGamedata || []")
+
+
+def _store_captured(event_id, captured, password):
+    decrypted = None
+    for item in captured:
+        text = item.get("text")
+        if not text:
+            continue
+        parsed = json.loads(text)
+        decrypted = decrypt_data(parsed.get("data", text), password)
+    if decrypted is None:
+        raise ValueError("captured gamedata has no body")
+
+    # The latest response of the page wins, as the poller would store it
+    event_id = int(event_id) if str(event_id).isdigit() else event_id
+    odds_cache.store(event_id, decrypted)
+    publish_odds_deltas([(event_id, decrypted)])
@@ -1,20 +1,13 @@
-import time
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from backend.services.browser_pool import get_browser_pool
 
-def get_cookie_token():
-    options = Options()
-    # options.add_argument("--headless")   # Uncomment for headless mode
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-
-    driver = webdriver.Chrome(options=options)
 
-    try:
+def get_cookie_token():
+    # Borrow a warm browser from the pool instead of starting Chrome every time
+    with get_browser_pool().session() as driver:
         driver.get("https://d247.com/")
 
         # Wait for login button
@@ -25,14 +18,14 @@ def get_cookie_token():
         login_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Login with demo ID')]")
         login_button.click()
 
-        time.sleep(5)  # TODO: Replace with smarter wait for post-login element
+        # Wait until the login has set the g_token cookie
+        WebDriverWait(driver, 20).until(lambda d: _find_g_token(d.get_cookies()))
+
+        return _find_g_token(driver.get_cookies())
 
-        g_token = None
-        for cookie in driver.get_cookies():
-            if cookie["name"] == "g_token":
-                g_token = f"{cookie['name']}={cookie['value']};"
-                break
 
-        return g_token
-    finally:
-        driver.quit()
+def _find_g_token(cookies):
+    for cookie in cookies:
+        if cookie["name"] == "g_token":
+            return f"{cookie['name']}={cookie['value']};"
+    return None
@@ -0,0 +1,265 @@
+import json
+import math
+import time
+
+import numpy as np
+from django.conf import settings
+
+from backend.services.cache_service import odds_cache
+from backend.services.odds_delta_service import get_snapshots_with_seq, iter_markets
+
+REDIS_KEY_ANALYTICS = "odds-analytics/{event_id}"
+
+
+class OddsFrame:
+    """
+    Best back/lay price of every runner of many events, as parallel NumPy arrays.
+
+    One row per runner; event_index/market_index point into event_ids/markets.
+    Missing prices are NaN.
+    """
+
+    def __init__(self, event_ids, markets, runners, event_index, market_index, back, lay, back_size, lay_size):
+        self.event_ids = event_ids
+        self.markets = markets
+        self.runners = runners
+        self.event_index = np.asarray(event_index, dtype=np.int32)
+        self.market_index = np.asarray(market_index, dtype=np.int32)
+        self.back = np.asarray(back, dtype=np.float64)
+        self.lay = np.asarray(lay, dtype=np.float64)
+        self.back_size = np.asarray(back_size, dtype=np.float64)
+        self.lay_size = np.asarray(lay_size, dtype=np.float64)
+
+
+def build_frame(snapshots):
+    """
+    Flatten (event_id, decrypted gamedataPrivate snapshot) pairs into an OddsFrame.
+
+    Markets are the dicts carrying a "mid" and a "section" list of runners
+    ("sid", "nat"); each runner's "odds" entries are back or lay prices
+    ("otype", or the "oname" prefix). The best back is the highest back price,
+    the best lay the lowest lay price.
+    """
+    event_ids, markets, runners = [], [], []
+    event_index, market_index = [], []
+    back, lay, back_size, lay_size = [], [], [], []
+
+    for event_id, snapshot in snapshots:
+        event_position = len(event_ids)
+        event_ids.append(event_id)
+        for market in iter_markets(snapshot):
+            market_position = len(markets)
+            markets.append((event_position, market.get("mid"), market.get("mname") or ""))
+            for runner in market.get("section") or []:
+                if not isinstance(runner, dict):
+                    continue
+                best_back, best_lay = 0.0, math.inf
+                best_back_size = best_lay_size = None
+                for price in runner.get("odds") or []:
+                    if not isinstance(price, dict):
+                        continue
+                    value = _number(price.get("odds"))
+                    if value is None or value <= 1:
+                        continue
+                    side = (price.get("otype") or price.get("oname") or "").lower()
+                    if side.startswith("back") and value > best_back:
+                        best_back, best_back_size = value, _number(price.get("size"))
+                    elif side.startswith("lay") and value < best_lay:
+                        best_lay, best_lay_size = value, _number(price.get("size"))
+
+                runners.append((runner.get("sid"), str(runner.get("nat") or runner.get("sid") or "")))
+                event_index.append(event_position)
+                market_index.append(market_position)
+                back.append(best_back or math.nan)
+                lay.append(math.nan if best_lay == math.inf else best_lay)
+                back_size.append(math.nan if best_back_size is None else best_back_size)
+                lay_size.append(math.nan if best_lay_size is None else best_lay_size)
+
+    return OddsFrame(event_ids, markets, runners, event_index, market_index, back, lay, back_size, lay_size)
+
+
+def compute_analytics(frame):
+    """
+    Implied probability, overround, spreads and arbitrage for every runner and
+    market of the frame, computed with whole-array operations.
+
+    - implied probability: 1 / best back
+    - overround: sum of implied probabilities of a market - 1, only when every
+      runner has a back price; below zero the market can be backed on all
+      runners at a profit (back_book_arb)
+    - lay overround: the same over best lay prices
+    - spread: best lay - best back, and relative to the back price
+    - cross-market arbitrage: a runner (same event, same name) whose best back in
+      one market is higher than its best lay in another one
+    Returns {event_id: {"markets": [...], "arbitrage": [...]}}.
+    """
+    market_count = len(frame.markets)
+    market_index = frame.market_index
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        back_probability = 1.0 / frame.back
+        lay_probability = 1.0 / frame.lay
+        spread = frame.lay - frame.back
+        spread_pct = spread / frame.back
+
+    runners_per_market = np.bincount(market_index, minlength=market_count)
+    backed = ~np.isnan(back_probability)
+    laid = ~np.isnan(lay_probability)
+    complete_back = np.bincount(market_index, weights=backed, minlength=market_count) == runners_per_market
+    complete_lay = np.bincount(market_index, weights=laid, minlength=market_count) == runners_per_market
+    has_runners = runners_per_market > 0
+
+    overround = np.bincount(market_index, weights=np.where(backed, back_probability, 0), minlength=market_count) - 1
+    overround = np.where(complete_back & has_runners, overround, np.nan)
+    lay_overround = np.bincount(market_index, weights=np.where(laid, lay_probability, 0), minlength=market_count) - 1
+    lay_overround = np.where(complete_lay & has_runners, lay_overround, np.nan)
+    back_book_arb = overround < 0
+
+    arbitrage = _cross_market_arbitrage(frame)
+
+    # Plain lists from here on: building the JSON is cheaper without NumPy scalars
+    back, lay, probability = _values(frame.back), _values(frame.lay), _values(back_probability)
+    spread, spread_pct = _values(spread), _values(spread_pct)
+    overround, lay_overround = _values(overround), _values(lay_overround)
+    back_book_arb = back_book_arb.tolist()
+    market_rows = [[] for _ in range(market_count)]
+    for row, position in enumerate(market_index.tolist()):
+        market_rows[position].append(row)
+
+    results = {event_id: {"markets": [], "arbitrage": []} for event_id in frame.event_ids}
+    for position, (event_position, market_id, market_name) in enumerate(frame.markets):
+        results[frame.event_ids[event_position]]["markets"].append({
+            "market_id": market_id,
+            "name": market_name,
+            "overround": overround[position],
+            "lay_overround": lay_overround[position],
+            "back_book_arb": back_book_arb[position],
+            "runners": [
+                {
+                    "runner_id": frame.runners[row][0],
+                    "name": frame.runners[row][1],
+                    "back": back[row],
+                    "lay": lay[row],
+                    "implied_probability": probability[row],
+                    "spread": spread[row],
+                    "spread_pct": spread_pct[row],
+                }
+                for row in market_rows[position]
+            ],
+        })
+
+    for back_row, lay_row, edge in arbitrage:
+        event_id = frame.event_ids[frame.event_index[back_row]]
+        results[event_id]["arbitrage"].append({
+            "runner": frame.runners[back_row][1],
+            "back_market_id": frame.markets[market_index[back_row]][1],
+            "back": _value(frame.back[back_row]),
+            "back_size": _value(frame.back_size[back_row]),
+            "lay_market_id": frame.markets[market_index[lay_row]][1],
+            "lay": _value(frame.lay[lay_row]),
+            "lay_size": _value(frame.lay_size[lay_row]),
+            "edge": _value(edge),
+        })
+    return results
+
+
+def load_snapshots(event_ids):
+    """
+    Latest published snapshots (events-odds-snapshot/{event_id}) of many events in one round-trip.
+
+    These outlive the seconds-long odds cache entries, so events polled less often
+    are still included. Events without a snapshot are skipped.
+    """
+    if not event_ids:
+        return []
+    snapshots = get_snapshots_with_seq(event_ids)
+    return [(event_id, json.loads(snapshots[event_id][0])) for event_id in event_ids if snapshots[event_id][0]]
+
+
+def analyze_events(event_ids):
+    """Load the latest snapshots of event_ids and compute their analytics."""
+    return compute_analytics(build_frame(load_snapshots(event_ids)))
+
+
+def store_analytics(results):
+    """Keep the latest analytics per event in Redis (odds-analytics/{event_id})."""
+    if not results:
+        return
+    pipe = odds_cache.redis.pipeline(transaction=False)
+    for event_id, result in results.items():
+        pipe.set(
+            REDIS_KEY_ANALYTICS.format(event_id=event_id),
+            json.dumps(result, separators=(",", ":")),
+            ex=settings.ODDS_ANALYTICS_TTL,
+        )
+    pipe.execute()
+
+
+def run_analytics_batch(event_ids):
+    """Analyze and store a batch of events; returns counts and timings for the task result."""
+    started = time.perf_counter()
+    snapshots = load_snapshots(event_ids)
+    frame = build_frame(snapshots)
+    built = time.perf_counter()
+    results = compute_analytics(frame)
+    computed = time.perf_counter()
+    store_analytics(results)
+    return {
+        "events": len(snapshots),
+        # No snapshot published within ODDS_DELTA_STATE_TTL
+        "skipped_events": len(event_ids) - len(snapshots),
+        "markets": len(frame.markets),
+        "runners": len(frame.runners),
+        "back_book_arbs": sum(market["back_book_arb"] for result in results.values() for market in result["markets"]),
+        "cross_market_arbs": sum(len(result["arbitrage"]) for result in results.values()),
+        "build_ms": round((built - started) * 1000, 2),
+        "compute_ms": round((computed - built) * 1000, 2),
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _cross_market_arbitrage(frame):
+    """(back_row, lay_row, edge) where a runner backs higher in one market than it lays in another."""
+    if not len(frame.runners):
+        return []
+    # Group runners by (event, name) across markets
+    keys = [(frame.event_index[row], frame.runners[row][1].strip().lower()) for row in range(len(frame.runners))]
+    _, group = np.unique(np.array([f"{event}\x00{name}" for event, name in keys]), return_inverse=True)
+    group_count = group.max() + 1
+
+    # Best back (highest) and best lay (lowest) row of each group: sort rows by group,
+    # then by price, and take the first row of every group
+    first = np.searchsorted(np.sort(group), np.arange(group_count))
+    back_rows = np.lexsort((-np.nan_to_num(frame.back, nan=-np.inf), group))[first]
+    lay_rows = np.lexsort((np.nan_to_num(frame.lay, nan=np.inf), group))[first]
+    best_back, best_lay = frame.back[back_rows], frame.lay[lay_rows]
+
+    # A crossed book within one market is stale data, not arbitrage
+    with np.errstate(invalid="ignore"):
+        crossed = (best_back > best_lay) & (frame.market_index[back_rows] != frame.market_index[lay_rows])
+    candidates = np.nonzero(crossed)[0]
+    edges = best_back[candidates] / best_lay[candidates] - 1
+    return list(zip(back_rows[candidates].tolist(), lay_rows[candidates].tolist(), edges.tolist()))
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _values(array):
+    """Rounded plain-Python list of an array, with NaN/inf as None (JSON null)."""
+    values = np.round(array, 6).astype(object)
+    values[~np.isfinite(array)] = None
+    return values.tolist()
+
+
+def _value(number):
+    number = float(number)
+    return round(number, 6) if math.isfinite(number) else None
@@ -1,71 +1,78 @@
+import base64
 import json
 import time
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
+from backend.services.browser_pool import get_browser_pool
+
 class SimpleAPIScraper:
-    def __init__(self, url):
+    def __init__(self, url, pool=None, timeout=15.0, poll_interval=0.1):
         self.url = url
+        self.pool = pool or get_browser_pool()
+        # Deadline for the login and for the page's API responses, and how often the log is drained
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.session = None
         self.driver = None
         
     def setup_driver(self):
-        """Setup Chrome driver with network logging enabled"""
-        chrome_options = Options()
-        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.maximize_window()
+        """Borrow a warm Chrome session (network logging enabled) from the browser pool"""
+        self.session = self.pool.checkout()
+        self.driver = self.session.driver
         
-    def get_api_payloads(self):
-        """Get API payloads from browser logs"""
-        logs = self.driver.get_log('performance')
-        payloads = []
+    def release_driver(self, healthy=True):
+        """Return the borrowed session to the pool"""
+        if self.session:
+            self.pool.checkin(self.session, healthy=healthy)
+        self.session = None
+        self.driver = None
         
-        for log in logs:
-            try:
-                message = json.loads(log['message'])['message']
-                
-                if message['method'] == 'Network.responseReceived':
-                    response = message['params']['response']
-                    url = response['url']
-                    
-                    # Filter for gamedataPrivate API
-                    if 'gamedataPrivate' in url or 'gamedata' in url.lower():
-                        request_id = message['params']['requestId']
-                        
-                        try:
-                            response_body = self.driver.execute_cdp_cmd(
-                                'Network.getResponseBody',
-                                {'requestId': request_id}
-                            )
-                            
-                            # Parse and return only the payload
-                            try:
-                                payload = json.loads(response_body.get('body', '{}'))
-                                payloads.append({
-                                    'url': url,
-                                    'payload': payload,
-                                    'timestamp': datetime.now().isoformat()
-                                })
-                            except:
-                                payloads.append({
-                                    'url': url,
-                                    'payload': response_body.get('body', ''),
-                                    'timestamp': datetime.now().isoformat()
-                                })
-                        except:
-                            pass
-            except:
-                continue
-        print(payload)
+    def get_api_payloads(self, url_pattern="gamedata"):
+        """Get API payloads from the network events buffered since the last read"""
+        payloads = []
+        for method, params in self._network_events(url_pattern):
+            if method == 'Network.responseReceived':
+                payload = self._response_payload(params['requestId'], params['response']['url'])
+                if payload is not None:
+                    payloads.append(payload)
         return payloads
-    
+
+    def wait_for_api_payloads(self, url_pattern="gamedataPrivate", expected=1, timeout=None):
+        """
+        Collect API payloads as the network events arrive.
+
+        The performance log is drained every poll_interval, so only the events
+        of the last interval are held in memory, and only requests whose URL
+        matches url_pattern are tracked. A body is fetched once its
+        Network.loadingFinished event is seen. Returns as soon as `expected`
+        payloads are in, or whatever arrived when the deadline passes.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        pending = {}
+        payloads = []
+        while True:
+            for method, params in self._network_events(url_pattern):
+                request_id = params.get('requestId')
+                if method == 'Network.responseReceived':
+                    pending[request_id] = params['response']['url']
+                elif method == 'Network.loadingFinished' and request_id in pending:
+                    payload = self._response_payload(request_id, pending.pop(request_id))
+                    if payload is not None:
+                        payloads.append(payload)
+                elif method == 'Network.loadingFailed':
+                    pending.pop(request_id, None)
+
+            if len(payloads) >= expected or time.monotonic() >= deadline:
+                return payloads
+            time.sleep(self.poll_interval)
+
     def run(self):
         """Run the scraper"""
         print(f"Opening: {self.url}")
+        started = time.perf_counter()
         
         try:
             # Load the page
@@ -80,19 +87,23 @@ class SimpleAPIScraper:
                 )
                 print("Clicking demo login...")
                 demo_button.click()
-                time.sleep(5)
+                # Logged in once the session cookie is set
+                WebDriverWait(self.driver, self.timeout, poll_frequency=self.poll_interval).until(
+                    lambda driver: any(cookie['name'] == 'g_token' for cookie in driver.get_cookies())
+                )
             except Exception as e:
                 print(f"Error clicking demo button: {e}")
                 return None
             
-            # Navigate to game details page
+            # Navigate to game details page; only its own network events count
             print(f"Navigating to: {self.url}")
+            self.driver.get_log('performance')
             self.driver.get(self.url)
-            time.sleep(5)
             
             # Get API payloads
-            print("\nFetching API payloads...")
-            payloads = self.get_api_payloads()
+            print("\nWaiting for API payloads...")
+            payloads = self.wait_for_api_payloads()
+            print(f"Captured in {time.perf_counter() - started:.2f}s")
             
             if payloads:
                 print(f"\n✓ Found {len(payloads)} API payloads:")
@@ -108,8 +119,54 @@ class SimpleAPIScraper:
             print(f"Error: {e}")
             return None
         finally:
-            if self.driver:
-                self.driver.quit()
+            # The pool health-checks the session before lending it out again
+            self.release_driver()
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    def _network_events(self, url_pattern):
+        """(method, params) of the buffered network events that can concern url_pattern"""
+        pattern = url_pattern.lower()
+        for log in self.driver.get_log('performance'):
+            raw = log.get('message', '')
+            # Cheap substring checks first: most entries are unrelated and never parsed
+            if '"Network.responseReceived"' in raw:
+                if pattern not in raw.lower():
+                    continue
+            elif '"Network.loadingFinished"' not in raw and '"Network.loadingFailed"' not in raw:
+                continue
+            try:
+                message = json.loads(raw)['message']
+            except (ValueError, KeyError):
+                continue
+            method = message.get('method')
+            params = message.get('params') or {}
+            if method == 'Network.responseReceived' and pattern not in params.get('response', {}).get('url', '').lower():
+                continue
+            yield method, params
+
+    def _response_payload(self, request_id, url):
+        try:
+            response_body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception:
+            # Body not available (evicted, or the request was a redirect)
+            return None
+        body = response_body.get('body', '')
+        if response_body.get('base64Encoded'):
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        # Parse and return only the payload
+        try:
+            payload = json.loads(body or '{}')
+        except ValueError:
+            payload = body
+        return {
+            'url': url,
+            'payload': payload,
+            'timestamp': datetime.now().isoformat()
+        }
+
 
 def main():
     TARGET_URL = "https://d247.com/game-details/4/559593926"
@@ -127,4 +184,8 @@ def main():
         print(f"{'='*50}")
 
 if __name__ == "__main__":
+    import os
+    import django
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    django.setup()
     main()
\ No newline at end of file
@@ -0,0 +1,216 @@
+import json
+import time
+
+from django.conf import settings
+
+from backend.services.odds_history_service import odds_history
+from backend.services.redis_service import get_redis_client
+
+REDIS_KEY_FLAT = "events-odds-flat/{event_id}"
+REDIS_KEY_SEQ = "events-odds-seq/{event_id}"
+REDIS_KEY_STREAM = "events-odds-stream/{event_id}"
+# Snapshot matching the latest seq, kept as long as the stream (the odds cache entry expires in seconds)
+REDIS_KEY_SNAPSHOT = "events-odds-snapshot/{event_id}"
+# Every delta is also announced here as "<event_id>|<seq>|<changes json>" for live subscribers
+REDIS_CHANNEL_ODDS = "events-odds-updates"
+
+redis_client = get_redis_client()
+
+# Bumps the per-event sequence number and appends the delta under stream id 0-<seq>,
+# so consumers can XREAD/XRANGE straight from the sequence number they hold. The full
+# snapshot is stored in the same step, so a resync always gets the state at its seq.
+# Sequence, stream, snapshot and flattened state expire together once an event stops changing.
+_publish_script = redis_client.register_script("""
+local seq = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '0-' .. seq, 'changes', ARGV[1])
+redis.call('SET', KEYS[3], ARGV[6], 'EX', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('PUBLISH', ARGV[5], ARGV[4] .. '|' .. seq .. '|' .. ARGV[1])
+return seq
+""")
+
+
+def flatten_odds(snapshot):
+    """
+    Flatten a decrypted gamedataPrivate snapshot to {"mid:sid:slot": "price|size"}.
+
+    Markets are the dicts carrying a "mid", runners sit in their "section" list
+    (keyed by "sid") and each runner's "odds" list holds the back/lay ladder
+    ("oname" such as back1/lay1, or otype + tno).
+    """
+    flat = {}
+    for market in iter_markets(snapshot):
+        mid = market.get("mid")
+        for runner in market.get("section") or []:
+            if not isinstance(runner, dict):
+                continue
+            sid = runner.get("sid")
+            for index, price in enumerate(runner.get("odds") or []):
+                if not isinstance(price, dict):
+                    continue
+                slot = price.get("oname") or f"{price.get('otype', 'p')}{price.get('tno', index)}"
+                flat[f"{mid}:{sid}:{slot}"] = f"{price.get('odds')}|{price.get('size')}"
+    return flat
+
+
+def iter_markets(node):
+    """Yield every market (a dict with a "mid" and a "section" list) found in a snapshot."""
+    if isinstance(node, dict):
+        if "mid" in node and "section" in node:
+            yield node
+            return
+        for value in node.values():
+            yield from iter_markets(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from iter_markets(item)
+
+
+def diff_flat(previous, current):
+    """Runner-level changes between two flattened snapshots; removed prices have p/s = None."""
+    changes = []
+    for field, value in current.items():
+        if previous.get(field) != value:
+            changes.append(_change(field, value))
+    for field in previous.keys() - current.keys():
+        changes.append(_change(field, None))
+    return changes
+
+
+def publish_odds_deltas(snapshots):
+    """
+    Diff each (event_id, snapshot) against the previous one and publish only the
+    changed prices/sizes to events-odds-stream/{event_id}.
+
+    Every entry carries a per-event sequence number. Deltas hold absolute values,
+    so a consumer can resync from the full snapshot (events-odds-snapshot/{event_id},
+    written together with the seq) and replay deltas from its sequence number
+    without double-applying anything.
+    The changes are also appended to the odds history.
+    Returns {event_id: seq} for events that changed.
+    """
+    snapshots = list(snapshots)
+    if not snapshots:
+        return {}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for event_id, _ in snapshots:
+        pipe.hgetall(REDIS_KEY_FLAT.format(event_id=event_id))
+    previous_states = pipe.execute()
+
+    changed_events, script_replies = [], []
+    pipe = redis_client.pipeline(transaction=False)
+    for (event_id, snapshot), previous in zip(snapshots, previous_states):
+        try:
+            previous = {field.decode("utf-8"): value.decode("utf-8") for field, value in previous.items()}
+            current = flatten_odds(snapshot)
+            changes = diff_flat(previous, current)
+            if changes:
+                snapshot_json = json.dumps(snapshot, separators=(",", ":"))
+        except Exception as e:
+            # One malformed snapshot must not hold back the rest of the batch
+            print(f"Odds delta for event {event_id} skipped: {e}")
+            continue
+        if not changes:
+            continue
+
+        flat_key = REDIS_KEY_FLAT.format(event_id=event_id)
+        updated = {field: value for field, value in current.items() if previous.get(field) != value}
+        removed = list(previous.keys() - current.keys())
+        if updated:
+            pipe.hset(flat_key, mapping=updated)
+        if removed:
+            pipe.hdel(flat_key, *removed)
+        pipe.expire(flat_key, settings.ODDS_DELTA_STATE_TTL)
+        script_replies.append(len(pipe.command_stack))
+        _publish_script(
+            keys=[REDIS_KEY_SEQ.format(event_id=event_id), REDIS_KEY_STREAM.format(event_id=event_id),
+                  REDIS_KEY_SNAPSHOT.format(event_id=event_id)],
+            args=[json.dumps(changes, separators=(",", ":")), settings.ODDS_STREAM_MAXLEN,
+                  settings.ODDS_DELTA_STATE_TTL, event_id, REDIS_CHANNEL_ODDS, snapshot_json],
+            client=pipe,
+        )
+        changed_events.append((event_id, changes))
+
+    if not changed_events:
+        return {}
+    results = pipe.execute()
+
+    # History only records deltas that were actually published
+    now_ms = int(time.time() * 1000)
+    for event_id, changes in changed_events:
+        try:
+            odds_history.append(event_id, changes, now_ms)
+        except Exception as e:
+            print(f"Odds history append for event {event_id} failed: {e}")
+    return {event_id: results[index] for (event_id, _), index in zip(changed_events, script_replies)}
+
+
+def read_deltas(event_id, after_seq=0, count=500):
+    """Deltas published after after_seq, as [(seq, changes)] in order."""
+    entries = redis_client.xrange(
+        REDIS_KEY_STREAM.format(event_id=event_id), min=f"0-{after_seq + 1}", count=count
+    )
+    return [
+        (int(entry_id.decode("utf-8").split("-")[1]), json.loads(fields[b"changes"]))
+        for entry_id, fields in entries
+    ]
+
+
+def get_snapshot_with_seq(event_id):
+    """Full snapshot plus the sequence number it corresponds to, read atomically."""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.get(REDIS_KEY_SNAPSHOT.format(event_id=event_id))
+    pipe.get(REDIS_KEY_SEQ.format(event_id=event_id))
+    raw, seq = pipe.execute()
+    return (json.loads(raw) if raw else None), int(seq or 0)
+
+
+def get_snapshots_with_seq(event_ids):
+    """{event_id: (raw snapshot JSON bytes or None, seq)} for many events in one round-trip."""
+    pipe = redis_client.pipeline(transaction=True)
+    for event_id in event_ids:
+        pipe.get(REDIS_KEY_SNAPSHOT.format(event_id=event_id))
+        pipe.get(REDIS_KEY_SEQ.format(event_id=event_id))
+    results = pipe.execute()
+    return {
+        event_id: (results[2 * index], int(results[2 * index + 1] or 0))
+        for index, event_id in enumerate(event_ids)
+    }
+
+
+def get_odds_changes(event_id, after_seq=None, count=500):
+    """
+    What a consumer at after_seq needs to catch up: the deltas after it, or the
+    full snapshot when it has none yet or the deltas it missed were trimmed.
+    """
+    if after_seq is not None:
+        deltas = read_deltas(event_id, after_seq, count)
+        if deltas and deltas[0][0] == after_seq + 1:
+            return {"seq": deltas[-1][0], "deltas": deltas}
+        # Nothing new, unless the stream expired and its sequence started over
+        if not deltas and after_seq <= int(redis_client.get(REDIS_KEY_SEQ.format(event_id=event_id)) or 0):
+            return {"seq": after_seq, "deltas": []}
+
+    snapshot, seq = get_snapshot_with_seq(event_id)
+    return {"seq": seq, "snapshot": snapshot, "deltas": []}
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _change(field, value):
+    mid, sid, slot = field.split(":", 2)
+    price, size = value.split("|", 1) if value is not None else (None, None)
+    return {"m": mid, "r": sid, "k": slot, "p": _number(price), "s": _number(size)}
+
+
+def _number(value):
+    if value in (None, "None", ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
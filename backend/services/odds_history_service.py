@@ -0,0 +1,250 @@
+import atexit
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+from django.conf import settings
+
+from backend.services.redis_service import get_redis_client
+
+REDIS_KEY_HISTORY = "odds-history/{event_id}/{hour}"
+HOUR_MS = 3600 * 1000
+
+# base timestamp (ms), tick count, length of the JSON series table
+_BLOCK_HEADER = struct.Struct("<qII")
+
+
+class _Columns:
+    """Ticks of one event/hour, one array per column."""
+
+    __slots__ = ("series", "names", "series_ids", "timestamps", "prices", "sizes")
+
+    def __init__(self):
+        self.series = {}
+        self.names = []
+        self.series_ids = array("H")
+        self.timestamps = array("q")
+        self.prices = array("d")
+        self.sizes = array("d")
+
+    def append(self, name, ts_ms, price, size):
+        # Coerce everything first: a failed append must not leave the columns out of step
+        ts_ms, price, size = int(ts_ms), _float(price), _float(size)
+        series_id = self.series.get(name)
+        if series_id is None:
+            series_id = self.series[name] = len(self.names)
+            self.names.append(name)
+        self.series_ids.append(series_id)
+        self.timestamps.append(ts_ms)
+        self.prices.append(price)
+        self.sizes.append(size)
+
+
+class OddsHistoryBuffer:
+    """
+    Append-only per-runner price/size history.
+
+    Ticks are buffered per process in columnar arrays and flushed as compressed
+    blocks to one Redis list per event and hour (odds-history/{event_id}/{hour}).
+    A block stores the series table once, then the series ids, the timestamps as
+    deltas from the previous tick and the prices and sizes as float64 columns.
+    Appending is a few array appends, so it can sit on the poll path.
+    A background thread flushes ticks older than flush_interval, so the last
+    ones are written even when no further tick arrives.
+    """
+
+    def __init__(self, redis_client=None, flush_ticks=None, flush_interval=None):
+        self.redis = redis_client or get_redis_client()
+        self.flush_ticks = flush_ticks or settings.ODDS_HISTORY_FLUSH_TICKS
+        self.flush_interval = flush_interval or settings.ODDS_HISTORY_FLUSH_INTERVAL
+        self._columns = {}
+        self._ticks = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+
+    def append(self, event_id, changes, ts_ms=None):
+        """Record delta changes ({"m", "r", "k", "p", "s"} dicts) of one event."""
+        self._ensure_flusher()
+        ts_ms = ts_ms or int(time.time() * 1000)
+        with self._lock:
+            columns = self._columns.get((event_id, ts_ms // HOUR_MS))
+            if columns is None:
+                columns = self._columns[(event_id, ts_ms // HOUR_MS)] = _Columns()
+            for change in changes:
+                columns.append(f"{change['m']}:{change['r']}:{change['k']}", ts_ms, change["p"], change["s"])
+            self._ticks += len(changes)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = self._ticks >= self.flush_ticks or time.monotonic() - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered ticks to Redis; returns the number of ticks written."""
+        with self._lock:
+            buffered, self._columns = self._columns, {}
+            ticks, self._ticks, self._oldest = self._ticks, 0, None
+        if not buffered:
+            return 0
+
+        retention = settings.ODDS_HISTORY_RETENTION_DAYS * 86400
+        pipe = self.redis.pipeline(transaction=False)
+        for (event_id, hour), columns in buffered.items():
+            key = REDIS_KEY_HISTORY.format(event_id=event_id, hour=hour)
+            pipe.rpush(key, encode_block(columns))
+            pipe.expire(key, retention)
+        try:
+            pipe.execute()
+        except Exception as e:
+            print(f"Odds history flush failed, dropped {ticks} ticks: {e}")
+            return 0
+        return ticks
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork (Celery prefork), so track the owning pid
+        if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        """Flush ticks that have waited flush_interval, whether or not more ticks arrive."""
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Background odds history flush failed: {e}")
+
+
+def encode_block(columns):
+    timestamps = columns.timestamps
+    deltas = array("i", [0] * len(timestamps))
+    for index in range(1, len(timestamps)):
+        deltas[index] = timestamps[index] - timestamps[index - 1]
+    table = json.dumps(columns.names, separators=(",", ":")).encode("utf-8")
+    body = [_BLOCK_HEADER.pack(timestamps[0], len(timestamps), len(table)), table]
+    for column in (columns.series_ids, deltas, columns.prices, columns.sizes):
+        body.append(_little_endian(column).tobytes())
+    return zlib.compress(b"".join(body), 1)
+
+
+def decode_block(raw):
+    """Return (series names, [(series_id, ts_ms, price, size)]) of an encoded block."""
+    data = zlib.decompress(raw)
+    base_ts, count, table_size = _BLOCK_HEADER.unpack_from(data)
+    offset = _BLOCK_HEADER.size
+    names = json.loads(data[offset:offset + table_size])
+    offset += table_size
+
+    columns = []
+    for typecode in ("H", "i", "d", "d"):
+        column = array(typecode)
+        size = column.itemsize * count
+        column.frombytes(data[offset:offset + size])
+        columns.append(_little_endian(column))
+        offset += size
+    series_ids, deltas, prices, sizes = columns
+
+    ticks, ts_ms = [], base_ts
+    for index in range(count):
+        ts_ms += deltas[index]
+        ticks.append((series_ids[index], ts_ms, prices[index], sizes[index]))
+    return names, ticks
+
+
+def get_ohlc(event_id, start_ms, end_ms, interval_ms, market_id=None):
+    """
+    Downsample the history of an event to OHLC bars per runner price slot.
+
+    Returns [{"market_id", "runner_id", "slot", "bars": [[t, open, high, low, close, size, ticks]]}],
+    where t is the bar start, size the last size seen and removed prices are skipped.
+    Ticks still buffered in the polling workers show up after their next flush.
+    """
+    first_hour, last_hour = start_ms // HOUR_MS, end_ms // HOUR_MS
+    if last_hour - first_hour >= settings.ODDS_HISTORY_MAX_RANGE_HOURS:
+        raise ValueError(f"time range exceeds {settings.ODDS_HISTORY_MAX_RANGE_HOURS} hours")
+
+    redis_client = odds_history.redis
+    pipe = redis_client.pipeline(transaction=False)
+    for hour in range(first_hour, last_hour + 1):
+        pipe.lrange(REDIS_KEY_HISTORY.format(event_id=event_id, hour=hour), 0, -1)
+
+    prefix = f"{market_id}:" if market_id is not None else ""
+    bars = {}
+    for blocks in pipe.execute():
+        for raw in blocks:
+            names, ticks = decode_block(raw)
+            for series_id, ts_ms, price, size in ticks:
+                if not start_ms <= ts_ms <= end_ms or math.isnan(price):
+                    continue
+                name = names[series_id]
+                if not name.startswith(prefix):
+                    continue
+                bucket = start_ms + (ts_ms - start_ms) // interval_ms * interval_ms
+                series_bars = bars.setdefault(name, {})
+                bar = series_bars.get(bucket)
+                if bar is None:
+                    series_bars[bucket] = [ts_ms, price, price, price, price, size, 1, ts_ms]
+                    continue
+                # Blocks from different workers interleave, so order ticks by time
+                if ts_ms < bar[0]:
+                    bar[0], bar[1] = ts_ms, price
+                if ts_ms >= bar[7]:
+                    bar[7], bar[4], bar[5] = ts_ms, price, size
+                bar[2] = max(bar[2], price)
+                bar[3] = min(bar[3], price)
+                bar[6] += 1
+
+    result = []
+    for name in sorted(bars):
+        mid, sid, slot = name.split(":", 2)
+        result.append({
+            "market_id": mid,
+            "runner_id": sid,
+            "slot": slot,
+            "bars": [
+                [bucket, bar[1], bar[2], bar[3], bar[4], None if math.isnan(bar[5]) else bar[5], bar[6]]
+                for bucket, bar in sorted(bars[name].items())
+            ],
+        })
+    return result
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _float(value):
+    """Price/size as a float; missing or non-numeric values ("SUSPENDED", "-") become NaN."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _little_endian(column):
+    # Blocks are stored little-endian whatever the host byte order
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+odds_history = OddsHistoryBuffer()
+atexit.register(odds_history.flush)
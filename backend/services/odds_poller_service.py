@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+
+from django.conf import settings
+
+from backend.services.cache_service import highlight_cache, odds_cache
+from backend.services.odds_delta_service import publish_odds_deltas
+from backend.services.scaper_service import get_highlight_home_private_async, get_many_odds
+from sports.models import Event, Sport
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def get_poll_targets(sport_event_type_id=None):
+    """(sport_id, event_id) pairs of all enabled events, loaded in one query."""
+    events = Event.objects.filter(is_disabled=False)
+    if sport_event_type_id is not None:
+        events = events.filter(sport__event_type_id=sport_event_type_id)
+    return [
+        (sport_id, int(event_id))
+        for sport_id, event_id in events.values_list("sport__event_type_id", "event_id")
+        if sport_id is not None and str(event_id).isdigit()
+    ]
+
+
+def shard(items, shard_size):
+    return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def poll_odds(pairs, password=None, concurrency=None):
+    """
+    Fetch odds for the given (sport_id, event_id) pairs concurrently and write them
+    to the odds cache (events-odds/{event_id}) in one Redis pipeline, then publish
+    what changed since the previous poll to the per-event delta streams.
+    """
+    password = password or os.getenv("DECRYPTION_KEY")
+    results = _run(get_many_odds(pairs, password, concurrency or settings.ODDS_POLL_CONCURRENCY))
+
+    stored, errors = [], {}
+    for (sport_id, event_id), result in zip(pairs, results):
+        if isinstance(result, Exception):
+            errors[str(event_id)] = str(result)
+        else:
+            stored.append((event_id, result))
+
+    changed = {}
+    if stored:
+        odds_cache.store_many(stored)
+        changed = publish_odds_deltas(stored)
+
+    return {
+        "polled": len(pairs),
+        "stored": len(stored),
+        "changed": len(changed),
+        "failed": len(errors),
+        # Keep task results small: only a sample of the errors
+        "errors": dict(list(errors.items())[:10]),
+    }
+
+
+def prefetch_highlights(etids=None, password=None):
+    """
+    Fetch highlight-home data for every known Sport.event_type_id concurrently and
+    store the decrypted bytes in the highlight cache (highlight-home/{etid}).
+    """
+    password = password or os.getenv("DECRYPTION_KEY")
+    if etids is None:
+        etids = sorted(set(Sport.objects.filter(event_type_id__gt=0).values_list("event_type_id", flat=True)))
+    results = _run(_fetch_highlights(etids, password))
+
+    stored, errors = [], {}
+    for etid, result in zip(etids, results):
+        if isinstance(result, Exception):
+            errors[str(etid)] = str(result)
+        else:
+            stored.append((etid, result))
+    if stored:
+        highlight_cache.store_many(stored)
+    return {"etids": len(etids), "stored": len(stored), "failed": len(errors), "errors": errors}
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _run(coro):
+    """
+    Run a coroutine on this process' long-lived event loop.
+
+    asyncio.run() would create and close a loop per task, throwing away the
+    keep-alive connections of the async upstream client every time.
+    """
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+        return _loop.run_until_complete(coro)
+
+
+async def _fetch_highlights(etids, password):
+    return await asyncio.gather(
+        *(get_highlight_home_private_async(etid, password, raw=True) for etid in etids),
+        return_exceptions=True,
+    )
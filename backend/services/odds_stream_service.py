@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend.services.odds_delta_service import REDIS_CHANNEL_ODDS, get_snapshots_with_seq
+from backend.services.redis_service import get_redis_client
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+class OddsSubscription:
+    """
+    One streaming client: the events it follows and the updates queued for it.
+
+    The queue holds references to delta frames shared by every subscriber, so a
+    connection costs little more than its queue. When a slow client lets more than
+    max_pending frames pile up, the queue is dropped and the affected events are
+    resent as full snapshots instead, which bounds memory per connection.
+    """
+
+    def __init__(self, event_ids, max_pending):
+        self.event_ids = set(event_ids)
+        self.max_pending = max_pending
+        self.pending = []
+        self.resync = set()
+        self.last_seq = {}
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+
+    def push(self, event_id, seq, frame):
+        if event_id in self.resync:
+            return
+        if len(self.pending) >= self.max_pending:
+            self.dropped += len(self.pending)
+            self.resync.update(queued_event for queued_event, _, _ in self.pending)
+            self.pending = []
+            self.resync.add(event_id)
+        else:
+            self.pending.append((event_id, seq, frame))
+        self.wakeup.set()
+
+    def take(self):
+        pending, resync = self.pending, self.resync
+        self.pending, self.resync = [], set()
+        self.wakeup.clear()
+        return pending, resync
+
+
+class OddsStreamHub:
+    """
+    Fans out odds deltas to the streaming clients of one event loop.
+
+    A single Redis pub/sub subscription per process feeds every connection: the
+    listener thread hands each message to the loop, which pre-encodes the SSE
+    frame once and queues it for the subscribers of that event.
+    """
+
+    def __init__(self, loop, redis_client=None):
+        self.loop = loop
+        self.redis = redis_client or get_redis_client()
+        self._subscribers = {}
+        self._listener = None
+        self._stats = {"connections": 0, "messages": 0, "frames": 0, "resyncs": 0}
+
+    def subscribe(self, event_ids):
+        self._ensure_listener()
+        subscription = OddsSubscription(event_ids, settings.ODDS_STREAM_MAX_PENDING)
+        for event_id in subscription.event_ids:
+            self._subscribers.setdefault(event_id, set()).add(subscription)
+        self._stats["connections"] += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for event_id in subscription.event_ids:
+            subscribers = self._subscribers.get(event_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[event_id]
+        self._stats["connections"] -= 1
+
+    async def stream(self, event_ids):
+        """
+        Async iterator of SSE frames: a snapshot per event, then its deltas.
+
+        Subscribes before reading the snapshots so nothing published in between
+        is lost; deltas already contained in a snapshot are skipped by sequence.
+        """
+        subscription = self.subscribe(event_ids)
+        try:
+            yield b"retry: 3000\n\n"
+            yield await self._snapshots(subscription, subscription.event_ids)
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.wakeup.wait(), settings.ODDS_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+
+                pending, resync = subscription.take()
+                frames = []
+                for event_id, seq, frame in pending:
+                    last_seq = subscription.last_seq.get(event_id)
+                    if event_id in resync or (last_seq is not None and seq <= last_seq):
+                        continue
+                    if last_seq is None or seq != last_seq + 1:
+                        # No snapshot yet, or a delta went missing → the client needs a fresh one
+                        resync.add(event_id)
+                        continue
+                    subscription.last_seq[event_id] = seq
+                    frames.append(frame)
+                if frames:
+                    yield b"".join(frames)
+                if resync:
+                    self._stats["resyncs"] += len(resync)
+                    yield await self._snapshots(subscription, resync)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {**self._stats, "events": len(self._subscribers)}
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    async def _snapshots(self, subscription, event_ids):
+        event_ids = sorted(event_ids)
+        snapshots = await sync_to_async(get_snapshots_with_seq, thread_sensitive=False)(event_ids)
+        frames = []
+        for event_id in event_ids:
+            raw, seq = snapshots[event_id]
+            if raw is None:
+                # Not polled yet: the first delta will trigger the snapshot
+                subscription.last_seq.pop(event_id, None)
+                raw = b"null"
+            else:
+                subscription.last_seq[event_id] = seq
+            frames.append(_frame(b"snapshot", b'{"event_id":%d,"seq":%d,"odds":%s}' % (event_id, seq, raw)))
+        return b"".join(frames)
+
+    def _dispatch(self, event_id, seq, changes):
+        self._stats["messages"] += 1
+        subscribers = self._subscribers.get(event_id)
+        if not subscribers:
+            return
+        frame = _frame(b"delta", b'{"event_id":%d,"seq":%d,"changes":%s}' % (event_id, seq, changes))
+        for subscription in subscribers:
+            subscription.push(event_id, seq, frame)
+        self._stats["frames"] += len(subscribers)
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener.is_alive():
+            return
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        """Forward published deltas to the event loop; resubscribe on connection errors."""
+        while not self.loop.is_closed():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(REDIS_CHANNEL_ODDS)
+                for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    event_id, seq, changes = message["data"].split(b"|", 2)
+                    self.loop.call_soon_threadsafe(self._dispatch, int(event_id), int(seq), changes)
+            except Exception as e:
+                # Deltas published meanwhile are lost; subscribers see the sequence gap and resync
+                print(f"Odds stream listener error, resubscribing: {e}")
+                time.sleep(1)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def get_odds_stream_hub():
+    """Hub of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = OddsStreamHub(loop)
+    return hub
+
+
+def _frame(event, data):
+    return b"event: " + event + b"\ndata: " + data + b"\n\n"
@@ -0,0 +1,130 @@
+import time
+
+from django.conf import settings
+
+from backend.services.redis_service import get_redis_client
+from sports.models import Event
+
+REDIS_KEY_SCHEDULE = "odds-poll:schedule"
+REDIS_KEY_OPEN_DATES = "odds-poll:open-dates"
+REDIS_KEY_METRICS = "odds-poll:metrics"
+REDIS_KEY_TICK_LOCK = "odds-poll:tick-lock/{tick}"
+
+redis_client = get_redis_client()
+
+
+def poll_interval(open_ts, now=None):
+    """
+    Seconds until an event should be polled again, based on its start time.
+
+    In-play and about-to-start events are polled every second or two; events
+    days out only every few minutes. Events that started more than
+    ODDS_POLL_INPLAY_MAX_AGE ago fall back to the default interval.
+    """
+    now = now or time.time()
+    if open_ts is None:
+        return settings.ODDS_POLL_DEFAULT_INTERVAL
+    starts_in = open_ts - now
+    if starts_in <= 0:
+        if -starts_in > settings.ODDS_POLL_INPLAY_MAX_AGE:
+            return settings.ODDS_POLL_DEFAULT_INTERVAL
+        return settings.ODDS_POLL_INPLAY_INTERVAL
+    if starts_in <= settings.ODDS_POLL_SOON_WINDOW:
+        return settings.ODDS_POLL_SOON_INTERVAL
+    if starts_in <= settings.ODDS_POLL_TODAY_WINDOW:
+        return settings.ODDS_POLL_TODAY_INTERVAL
+    return settings.ODDS_POLL_FAR_INTERVAL
+
+
+def sync_schedule():
+    """
+    Align the schedule with the Event table: add new enabled events (due now),
+    drop disabled or deleted ones and refresh the known start times.
+    """
+    rows = Event.objects.filter(is_disabled=False).values_list(
+        "sport__event_type_id", "event_id", "event_open_date"
+    )
+    open_dates = {}
+    for sport_id, event_id, open_date in rows:
+        if sport_id is None or not str(event_id).isdigit():
+            continue
+        open_dates[_member(sport_id, event_id)] = open_date.timestamp() if open_date else ""
+
+    scheduled = {member.decode("utf-8") for member in redis_client.zrange(REDIS_KEY_SCHEDULE, 0, -1)}
+    removed = scheduled - set(open_dates)
+    added = set(open_dates) - scheduled
+
+    pipe = redis_client.pipeline(transaction=False)
+    if added:
+        now = time.time()
+        pipe.zadd(REDIS_KEY_SCHEDULE, {member: now for member in added}, nx=True)
+    if removed:
+        pipe.zrem(REDIS_KEY_SCHEDULE, *removed)
+        pipe.hdel(REDIS_KEY_OPEN_DATES, *removed)
+    if open_dates:
+        pipe.hset(REDIS_KEY_OPEN_DATES, mapping=open_dates)
+    pipe.execute()
+
+    return {"scheduled": len(open_dates), "added": len(added), "removed": len(removed)}
+
+
+def take_due(now=None, budget=None):
+    """
+    Pop up to `budget` due events, most overdue first, and reschedule each one
+    according to its poll interval. Returns the (sport_id, event_id) pairs to poll.
+    """
+    now = now or time.time()
+    budget = budget or int(settings.ODDS_POLL_BUDGET_PER_SECOND * settings.ODDS_POLL_TICK)
+
+    # One run per tick slot across beat/worker overlap, so no event is taken twice;
+    # keyed on the slot so a run that lands late in one tick doesn't block the next
+    tick = int(now // settings.ODDS_POLL_TICK)
+    lock_key = REDIS_KEY_TICK_LOCK.format(tick=tick)
+    if not redis_client.set(lock_key, b"1", nx=True, px=int(settings.ODDS_POLL_TICK * 2000)):
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrangebyscore(REDIS_KEY_SCHEDULE, "-inf", now, start=0, num=budget, withscores=True)
+    pipe.zcount(REDIS_KEY_SCHEDULE, "-inf", now)
+    pipe.zcard(REDIS_KEY_SCHEDULE)
+    due, overdue, total = pipe.execute()
+
+    members = [member.decode("utf-8") for member, _ in due]
+    open_dates = redis_client.hmget(REDIS_KEY_OPEN_DATES, members) if members else []
+
+    next_run, pairs = {}, []
+    for member, open_ts in zip(members, open_dates):
+        open_ts = float(open_ts) if open_ts else None
+        next_run[member] = now + poll_interval(open_ts, now)
+        sport_id, event_id = member.split(":")
+        pairs.append((int(sport_id), int(event_id)))
+
+    lag_ms = int((now - due[0][1]) * 1000) if due else 0
+    pipe = redis_client.pipeline(transaction=False)
+    if next_run:
+        pipe.zadd(REDIS_KEY_SCHEDULE, next_run, xx=True)
+    pipe.hset(REDIS_KEY_METRICS, mapping={
+        "last_tick_at": now,
+        "scheduled": total,
+        "overdue": overdue,
+        "dispatched": len(pairs),
+        # Left behind once the budget is spent: these wait for the next tick
+        "backlog": max(0, overdue - len(pairs)),
+        "lag_ms": lag_ms,
+        "budget": budget,
+    })
+    pipe.execute()
+    return pairs
+
+
+def scheduler_metrics():
+    """Queue size, overdue backlog and lag of the most overdue event."""
+    metrics = redis_client.hgetall(REDIS_KEY_METRICS)
+    result = {name.decode("utf-8"): float(value) for name, value in metrics.items()}
+    oldest = redis_client.zrange(REDIS_KEY_SCHEDULE, 0, 0, withscores=True)
+    result["current_lag_ms"] = max(0, int((time.time() - oldest[0][1]) * 1000)) if oldest else 0
+    return result
+
+
+def _member(sport_id, event_id):
+    return f"{sport_id}:{event_id}"
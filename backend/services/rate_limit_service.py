@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend.services.redis_service import get_redis_client
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+REDIS_KEY_BUCKET = "upstream-rate/{endpoint}"
+REDIS_KEY_USED = "upstream-rate-used/{endpoint}/{second}"
+REDIS_KEY_STATS = "upstream-rate-stats/{endpoint}"
+USAGE_WINDOW = 60
+
+redis_client = get_redis_client()
+
+# Priority of the upstream calls made in the current context; Celery tasks run as background
+upstream_priority = contextvars.ContextVar("upstream_priority", default=PRIORITY_INTERACTIVE)
+
+# Token bucket shared by every process. Refills at ARGV[1] tokens/s up to ARGV[2];
+# a request takes one token only if ARGV[4] tokens are left afterwards (the share
+# reserved for interactive traffic). Returns {allowed, wait_ms, tokens left}.
+_take_token_script = redis_client.register_script("""
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+if now > ts then
+    tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+    ts = now
+end
+local allowed, wait = 0, 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+    allowed = 1
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[6])
+    redis.call('HINCRBY', KEYS[3], 'allowed:' .. ARGV[5], 1)
+else
+    wait = math.ceil((1 + reserve - tokens) * 1000 / rate)
+    redis.call('HINCRBY', KEYS[3], 'throttled:' .. ARGV[5], 1)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', ts)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait, tostring(tokens)}
+""")
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+@contextmanager
+def priority(level):
+    """Run the upstream calls of a block with the given priority."""
+    token = upstream_priority.set(level)
+    try:
+        yield
+    finally:
+        upstream_priority.reset(token)
+
+
+def acquire(endpoint):
+    """
+    Take a token for one request to endpoint, waiting up to the priority's max wait.
+
+    Raises RateLimitExceeded when no token frees up in time. If Redis is
+    unavailable the request is let through rather than failing.
+    """
+    level = upstream_priority.get()
+    deadline = time.monotonic() + _max_wait(level)
+    while True:
+        wait_ms = _try_take(endpoint, level)
+        if wait_ms is None:
+            return
+        delay = _delay(wait_ms)
+        if time.monotonic() + delay > deadline:
+            _count_rejected(endpoint, level)
+            raise RateLimitExceeded(f"upstream rate limit reached for {endpoint} ({level})")
+        time.sleep(delay)
+
+
+async def acquire_async(endpoint):
+    """Async version of acquire: waits with asyncio.sleep, Redis calls run in a thread."""
+    level = upstream_priority.get()
+    deadline = time.monotonic() + _max_wait(level)
+    while True:
+        wait_ms = await sync_to_async(_try_take, thread_sensitive=False)(endpoint, level)
+        if wait_ms is None:
+            return
+        delay = _delay(wait_ms)
+        if time.monotonic() + delay > deadline:
+            await sync_to_async(_count_rejected, thread_sensitive=False)(endpoint, level)
+            raise RateLimitExceeded(f"upstream rate limit reached for {endpoint} ({level})")
+        await asyncio.sleep(delay)
+
+
+def rate_limit_stats():
+    """
+    Per endpoint: the configured limit, tokens left, requests per second over
+    the last minute (average and peak, cluster-wide) and allowed/throttled/
+    rejected counts per priority.
+    """
+    now = time.time()
+    second = int(now)
+    endpoints = sorted(set(settings.UPSTREAM_RATE_LIMITS) | {
+        key.decode("utf-8").split("/", 1)[1] for key in redis_client.scan_iter(REDIS_KEY_STATS.format(endpoint="*"))
+    })
+
+    pipe = redis_client.pipeline(transaction=False)
+    for endpoint in endpoints:
+        pipe.hmget(REDIS_KEY_BUCKET.format(endpoint=endpoint), ["tokens", "ts"])
+        pipe.mget([REDIS_KEY_USED.format(endpoint=endpoint, second=second - age) for age in range(1, USAGE_WINDOW + 1)])
+        pipe.hgetall(REDIS_KEY_STATS.format(endpoint=endpoint))
+    replies = pipe.execute()
+
+    result = {}
+    for position, endpoint in enumerate(endpoints):
+        (tokens, ts), used, counters = replies[position * 3:position * 3 + 3]
+        rate, burst = _limit(endpoint)
+        if tokens is None:
+            tokens = burst
+        else:
+            tokens = min(burst, float(tokens) + max(0, now * 1000 - int(ts)) * rate / 1000)
+        used = [int(count or 0) for count in used]
+        result[endpoint] = {
+            "rate": rate,
+            "burst": burst,
+            "tokens": round(tokens, 2),
+            "rps_avg": round(sum(used) / USAGE_WINDOW, 2),
+            "rps_peak": max(used),
+            "utilization": round(sum(used) / USAGE_WINDOW / rate, 3),
+            **{name.decode("utf-8"): int(value) for name, value in counters.items()},
+        }
+    return result
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _limit(endpoint):
+    limit = settings.UPSTREAM_RATE_LIMITS.get(endpoint) or settings.UPSTREAM_RATE_LIMIT_DEFAULT
+    return limit["rate"], limit["burst"]
+
+
+def _max_wait(level):
+    if level == PRIORITY_BACKGROUND:
+        return settings.UPSTREAM_RATE_MAX_WAIT_BACKGROUND
+    return settings.UPSTREAM_RATE_MAX_WAIT_INTERACTIVE
+
+
+def _try_take(endpoint, level):
+    """None when a token was taken, else the milliseconds until one could be."""
+    rate, burst = _limit(endpoint)
+    reserve = burst * settings.UPSTREAM_RATE_BACKGROUND_RESERVE if level == PRIORITY_BACKGROUND else 0
+    now_ms = int(time.time() * 1000)
+    keys = [
+        REDIS_KEY_BUCKET.format(endpoint=endpoint),
+        REDIS_KEY_USED.format(endpoint=endpoint, second=now_ms // 1000),
+        REDIS_KEY_STATS.format(endpoint=endpoint),
+    ]
+    try:
+        allowed, wait_ms, _ = _take_token_script(
+            keys=keys, args=[rate, burst, now_ms, reserve, level, USAGE_WINDOW * 2]
+        )
+    except Exception as e:
+        print(f"Upstream rate limiter unavailable, letting request through: {e}")
+        return None
+    return None if allowed else int(wait_ms)
+
+
+def _delay(wait_ms):
+    # Jitter so waiting clients don't all retry in the same millisecond
+    return wait_ms / 1000 * random.uniform(1, 1.5)
+
+
+def _count_rejected(endpoint, level):
+    try:
+        redis_client.hincrby(REDIS_KEY_STATS.format(endpoint=endpoint), f"rejected:{level}", 1)
+    except Exception:
+        pass
@@ -0,0 +1,23 @@
+import redis
+from django.conf import settings
+
+_pools = {}
+
+
+def get_redis_client(decode_responses=False):
+    """
+    Redis client built from settings.REDIS_URL.
+
+    Clients share one connection pool per decode_responses flavour, so modules
+    creating their own client don't each open new connections. redis-py resets
+    pools after a fork, so this is safe to call at import time in Celery workers.
+    """
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=decode_responses,
+        )
+        _pools[decode_responses] = pool
+    return redis.Redis(connection_pool=pool)
@@ -0,0 +1,318 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+_hedge_executor = ThreadPoolExecutor(max_workers=settings.UPSTREAM_HEDGE_WORKERS, thread_name_prefix="upstream-hedge")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker.
+
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds, then lets a single trial call through (half-open):
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("upstream circuit is open")
+                self.state = CIRCUIT_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError("upstream circuit is half-open, trial call in flight")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = CIRCUIT_CLOSED
+            self._trial_in_flight = False
+
+    def abandon(self):
+        """The call was cancelled without an outcome: free the half-open trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.opened += 1
+                self.state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Latencies (seconds) of the last `size` successful calls, for percentile estimates."""
+
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self):
+        return len(self._samples)
+
+    def percentile(self, percent):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class UpstreamGuard:
+    """
+    Resilience policy of one upstream endpoint: circuit breaker, adaptive timeout
+    and optional hedging.
+
+    - timeout: the configured percentile of recent latencies times a multiplier,
+      clamped to [min_timeout, max_timeout]; max_timeout until enough samples exist.
+    - hedging: when the first request has not answered after the hedge
+      percentile (p95 by default), a second identical request is sent and the
+      first response wins. Hedges are capped to hedge_budget of recent calls.
+    Responses with a 5xx status and transport errors count as failures.
+    """
+
+    def __init__(self, name, policy):
+        self.name = name
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy["failure_threshold"], policy["reset_timeout"])
+        self.latency = LatencyTracker(policy["window"])
+        self._recent_hedges = deque(maxlen=policy["window"])
+        self._counters = {"calls": 0, "failures": 0, "rejected": 0, "hedged": 0, "hedge_wins": 0}
+        # Calls run on request threads and the hedge executor at once
+        self._lock = threading.Lock()
+
+    def timeout(self):
+        policy = self.policy
+        if self.latency.count() < policy["min_samples"]:
+            return policy["max_timeout"]
+        adaptive = self.latency.percentile(policy["timeout_percentile"]) * policy["timeout_multiplier"]
+        return min(policy["max_timeout"], max(policy["min_timeout"], adaptive))
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None when this call must not be hedged."""
+        policy = self.policy
+        if not policy["hedge"] or self.latency.count() < policy["min_samples"]:
+            return None
+        with self._lock:
+            hedges = sum(self._recent_hedges)
+        if hedges >= policy["hedge_budget"] * self._recent_hedges.maxlen:
+            return None
+        return max(policy["hedge_min_delay"], self.latency.percentile(policy["hedge_percentile"]))
+
+    def call(self, send, timeout=None, admit=None):
+        """
+        Run send(timeout) -> response under the policy.
+
+        admit() runs only once the breaker lets the call through (e.g. to take a
+        rate-limit token); if it raises, the call is dropped without counting as a failure.
+        """
+        self._before_call()
+        if admit is not None:
+            try:
+                admit()
+            except BaseException:
+                self.breaker.abandon()
+                raise
+        timeout = timeout or self.timeout()
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        try:
+            if delay is None or delay >= timeout:
+                self._note_hedge(False)
+                response = send(timeout)
+            else:
+                response = self._call_hedged(send, timeout, delay)
+        except Exception:
+            self._record_failure()
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self._record_response(response, time.monotonic() - started)
+        return response
+
+    async def acall(self, send, timeout=None, admit=None):
+        """Async call; send(timeout) and admit() return coroutines."""
+        self._before_call()
+        if admit is not None:
+            try:
+                await admit()
+            except BaseException:
+                self.breaker.abandon()
+                raise
+        timeout = timeout or self.timeout()
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        try:
+            if delay is None or delay >= timeout:
+                self._note_hedge(False)
+                response = await send(timeout)
+            else:
+                response = await self._acall_hedged(send, timeout, delay)
+        except Exception:
+            self._record_failure()
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self._record_response(response, time.monotonic() - started)
+        return response
+
+    def stats(self):
+        percentiles = {f"p{p}_ms": self.latency.percentile(p) for p in (50, 95, 99)}
+        delay = self.hedge_delay()
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "opened": self.breaker.opened,
+            **{name: round(value * 1000, 1) if value is not None else None for name, value in percentiles.items()},
+            "timeout_ms": round(self.timeout() * 1000, 1),
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+        }
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _note_hedge(self, hedged):
+        with self._lock:
+            self._recent_hedges.append(1 if hedged else 0)
+            if hedged:
+                self._counters["hedged"] += 1
+
+    def _before_call(self):
+        self._count("calls")
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+    def _record_response(self, response, elapsed):
+        if response.status_code >= 500:
+            self._record_failure()
+            return
+        self.latency.record(elapsed)
+        self.breaker.record_success()
+
+    def _record_failure(self):
+        self._count("failures")
+        self.breaker.record_failure()
+
+    def _call_hedged(self, send, timeout, delay):
+        first = _hedge_executor.submit(send, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            self._note_hedge(False)
+            return first.result()
+
+        self._note_hedge(True)
+        second = _hedge_executor.submit(send, max(0.001, timeout - delay))
+        pending = {first, second}
+        error = None
+        # Threads can't be cancelled: the losing request runs on until its own timeout
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code < 500:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future
+        # Both failed: surface the last outcome
+        return error.result()
+
+    async def _acall_hedged(self, send, timeout, delay):
+        first = asyncio.ensure_future(send(timeout))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                self._note_hedge(False)
+                return first.result()
+
+            self._note_hedge(True)
+            second = asyncio.ensure_future(send(max(0.001, timeout - delay)))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result().status_code < 500:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task
+            return error.result()
+        finally:
+            # The slower request is not needed any more
+            for task in pending:
+                task.cancel()
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def endpoint_name(url):
+    """Endpoint key of a d247 URL: the last path segment (treedata, gamedataPrivate, ...)."""
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def get_guard(url):
+    """Process-wide UpstreamGuard for the endpoint of url, configured from UPSTREAM_ENDPOINTS."""
+    name = endpoint_name(url)
+    guard = _guards.get(name)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(name)
+            if guard is None:
+                policy = {**settings.UPSTREAM_ENDPOINT_DEFAULTS, **settings.UPSTREAM_ENDPOINTS.get(name, {})}
+                guard = _guards[name] = UpstreamGuard(name, policy)
+    return guard
+
+
+def resilience_stats():
+    return {name: guard.stats() for name, guard in list(_guards.items())}
@@ -1,99 +1,212 @@
-import requests
-import redis
+import asyncio
+import json
 import os
+from asgiref.sync import sync_to_async
 from backend.services.crypt_service import decrypt_data, encrypt_data
-from backend.services.gtoken_service import get_cookie_token
+from backend.services.redis_service import get_redis_client
+from backend.services.rate_limit_service import acquire, acquire_async
+from backend.services.resilience_service import endpoint_name, get_guard
+from backend.services.token_manager import TokenPool
+from backend.services.upstream_client import get_upstream_client, get_async_upstream_client
 
 
 
-redis_client = redis.Redis(host="localhost", port=6379, db=0)
-REDIS_KEY_G_TOKEN = "G_TOKEN"
+redis_client = get_redis_client()
+token_pool = TokenPool(redis_client)
 
 
-def get_tree_record(password: str):
-    url = "https://d247.com/api/front/treedata"
-    payload = {"data": {}}
+def get_tree_record(password: str, raw: bool = False):
+    url, payload = _tree_record_request()
     res_json = fetch_api(url, method="POST", payload=payload)
-    encrypted_data = res_json.get("data")
-    if not encrypted_data:
-        raise Exception("No 'data' field in response")
-    return decrypt_data(encrypted_data, password)
+    return _decrypt_response(res_json, password, raw)
 
 
 
-def get_odds(sport_id: int, event_id: int, password: str):
+def get_odds(sport_id: int, event_id: int, password: str, raw: bool = False):
     """
     Python equivalent of getOddsFn
     """
-    url = f"https://d247.com/api/front/gamedataPrivate?etId={sport_id}&gmid={event_id}"
+    url, payload = _odds_request(sport_id, event_id, password)
+    res_json = fetch_api(url, method="POST", payload=payload)
+    return _decrypt_response(res_json, password, raw)
+
+def get_highlight_home_private(etid: int, password: str, raw: bool = False):
+    """
+    Python equivalent of getHighlightHomePrivateFn
+    """
+    url, payload = _highlight_home_private_request(etid, password)
+    res_json = fetch_api(url, method="POST", payload=payload)
+    return _decrypt_response(res_json, password, raw)
+
+
+# ----------------------------------------------
+#                 ASYNC API
+# ----------------------------------------------
+
+async def get_tree_record_async(password: str, raw: bool = False):
+    url, payload = _tree_record_request()
+    res_json = await fetch_api_async(url, method="POST", payload=payload)
+    return _decrypt_response(res_json, password, raw)
+
+
+async def get_odds_async(sport_id: int, event_id: int, password: str, raw: bool = False):
+    """
+    Async version of get_odds
+    """
+    url, payload = _odds_request(sport_id, event_id, password)
+    res_json = await fetch_api_async(url, method="POST", payload=payload)
+    return _decrypt_response(res_json, password, raw)
+
+
+async def get_highlight_home_private_async(etid: int, password: str, raw: bool = False):
+    """
+    Async version of get_highlight_home_private
+    """
+    url, payload = _highlight_home_private_request(etid, password)
+    res_json = await fetch_api_async(url, method="POST", payload=payload)
+    return _decrypt_response(res_json, password, raw)
+
+
+async def get_many_odds(pairs, password: str, concurrency: int = None):
+    """
+    Fetch odds for many (sport_id, event_id) pairs concurrently.
+
+    At most `concurrency` requests are in flight at once (on top of the client-wide
+    limit). Returns a list aligned with `pairs`; failed items hold the exception.
+    """
+    semaphore = asyncio.Semaphore(concurrency or get_async_upstream_client().concurrency)
+
+    async def fetch_one(sport_id, event_id):
+        async with semaphore:
+            return await get_odds_async(sport_id, event_id, password)
+
+    return await asyncio.gather(
+        *(fetch_one(sport_id, event_id) for sport_id, event_id in pairs),
+        return_exceptions=True,
+    )
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _tree_record_request():
+    url = _upstream_url("/front/treedata")
+    payload = {"data": {}}
+    return url, payload
+
 
+def _odds_request(sport_id: int, event_id: int, password: str):
+    url = _upstream_url(f"/front/gamedataPrivate?etId={sport_id}&gmid={event_id}")
     payload = {
         "data": encrypt_data({
             "etid": sport_id,
             "gmid": event_id,
         },password=password)
     }
+    return url, payload
 
-    res_json = fetch_api(url, method="POST", payload=payload)
-    encrypted_data = res_json.get("data")
-
-    if not encrypted_data:
-        raise Exception("No 'data' field in response")
-
-    return decrypt_data(encrypted_data, password)
-
-def get_highlight_home_private(etid: int, password: str):
-    """
-    Python equivalent of getHighlightHomePrivateFn
-    """
-    url = f"{os.getenv('BASE_URL')}/front/highlighthomePrivate?etid={etid}"
 
+def _highlight_home_private_request(etid: int, password: str):
+    url = _upstream_url(f"/front/highlighthomePrivate?etid={etid}")
     payload = {
         "data": encrypt_data({
             "etid": etid,
             "type": "all",
         }, password)  # <-- pass password
     }
+    return url, payload
+
+
+def _upstream_url(path):
+    # BASE_URL can point at a local fake upstream (see the fake_upstream command)
+    return f"{os.getenv('BASE_URL', 'https://d247.com/api')}{path}"
 
-    res_json = fetch_api(url, method="POST", payload=payload, timeout=3)
-    encrypted_data = res_json.get("data")
 
+def _decrypt_response(res_json, password: str, raw: bool = False):
+    """
+    Decrypt the "data" field. With raw=True the decrypted JSON is returned as
+    UTF-8 bytes, ready to be embedded in a response without parsing it.
+    """
+    encrypted_data = res_json.get("data")
     if not encrypted_data:
         raise Exception("No 'data' field in response")
+    if not raw:
+        return decrypt_data(encrypted_data, password)
 
-    return decrypt_data(encrypted_data, password)
-# ----------------------------------------------
-#                 HELPER FUNCTIONS
-# ----------------------------------------------
+    decrypted = decrypt_data(encrypted_data, password, raw=True)
+    if decrypted.lstrip()[:1] in (b"{", b"["):
+        return decrypted
+    # Plain text payloads become a JSON string, as in the parsed mode
+    return json.dumps(decrypted.decode("utf-8")).encode("utf-8")
 
-def fetch_api(url, method="GET", payload=None, headers=None, timeout=3):
-    # 1. Try existing cookie from Redis
-    cookie_value = redis_client.get(REDIS_KEY_G_TOKEN)
-    print(cookie_value)
-    if cookie_value:
-        cookie_value = cookie_value.decode("utf-8")
+
+def fetch_api(url, method="GET", payload=None, headers=None, timeout=None):
+    # 1. Least-loaded token of the pool (2. empty pool → Selenium/Playwright)
+    with token_pool.lease() as cookie_value:
         resp = make_request(cookie_value, headers, url, method, payload, timeout)
-        if resp.status_code == 401:  # expired → refresh
-            cookie_value = get_cookie_token()   # 🔥 call Selenium/Playwright here
-            redis_client.setex(REDIS_KEY_G_TOKEN, 3600, cookie_value)
+    if resp.status_code == 401:  # expired → retire this session, retry on another one
+        token_pool.retire(cookie_value)
+        with token_pool.lease() as cookie_value:
             resp = make_request(cookie_value, headers, url, method, payload, timeout)
-    else:
-        # 2. No cookie → use Selenium/Playwright
-        cookie_value = get_cookie_token()
-        redis_client.setex(REDIS_KEY_G_TOKEN, 3600, cookie_value)
-        resp = make_request(cookie_value, headers, url, method, payload, timeout)
 
     resp.raise_for_status()
     return resp.json()
 
 
-def make_request(cookie_value,headers=None, url=None, method="GET", payload=None, timeout=3):
-    final_headers = {
+async def fetch_api_async(url, method="GET", payload=None, headers=None, timeout=None):
+    # Token lookup/refresh is blocking (Redis, Selenium), so it runs in a thread
+    cookie_value = await sync_to_async(token_pool.acquire, thread_sensitive=False)()
+    try:
+        resp = await make_request_async(cookie_value, headers, url, method, payload, timeout)
+    finally:
+        token_pool.release(cookie_value)
+    if resp.status_code == 401:  # expired → retire this session, retry on another one
+        await sync_to_async(token_pool.retire, thread_sensitive=False)(cookie_value)
+        cookie_value = await sync_to_async(token_pool.acquire, thread_sensitive=False)()
+        try:
+            resp = await make_request_async(cookie_value, headers, url, method, payload, timeout)
+        finally:
+            token_pool.release(cookie_value)
+
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _request_headers(cookie_value, headers=None):
+    return {
         **(headers or {}),
         "Cookie": f"{cookie_value}",
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
-    if method.upper() == "POST":
-        return requests.post(url, headers=final_headers, json=payload, timeout=timeout)
-    return requests.get(url, headers=final_headers, timeout=timeout)
+
+
+def make_request(cookie_value,headers=None, url=None, method="GET", payload=None, timeout=None):
+    """
+    Send one upstream request through the endpoint's circuit breaker.
+
+    Raises CircuitOpenError while the endpoint is failing; otherwise waits for
+    a token of the cluster-wide rate limit (RateLimitExceeded if none frees up
+    in time). timeout=None uses the endpoint's adaptive timeout.
+    """
+    final_headers = _request_headers(cookie_value, headers)
+    client = get_upstream_client()
+
+    def send(request_timeout):
+        return client.request(method, url, headers=final_headers,
+                              json=payload if method.upper() == "POST" else None, timeout=request_timeout)
+
+    # The breaker is checked before the limiter, so a rejected call never spends a token
+    return get_guard(url).call(send, timeout, admit=lambda: acquire(endpoint_name(url)))
+
+
+async def make_request_async(cookie_value, headers=None, url=None, method="GET", payload=None, timeout=None):
+    final_headers = _request_headers(cookie_value, headers)
+    client = get_async_upstream_client()
+
+    def send(request_timeout):
+        return client.request(method, url, headers=final_headers,
+                              json=payload if method.upper() == "POST" else None, timeout=request_timeout)
+
+    return await get_guard(url).acall(send, timeout, admit=lambda: acquire_async(endpoint_name(url)))
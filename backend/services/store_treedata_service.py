@@ -1,97 +1,286 @@
+import hashlib
+import json
 from sports.models import Sport, Competition, Event
+from backend.services.redis_service import get_redis_client
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from datetime import datetime
 
+BULK_BATCH_SIZE = 1000
+SDATETIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+# Bumped whenever the catalog tables change; the catalog endpoints build their ETags from it
+REDIS_KEY_CATALOG_VERSION = "catalog-version"
 
-def save_tree_data(tree_data: dict):
+redis_client = get_redis_client()
+
+
+def fingerprint_tree(tree_data: dict):
+    """
+    Hash the decrypted tree per sport subtree and overall.
+
+    Returns (overall_hash, {"t1:4": hash, ...}). The overall hash is derived from
+    the sorted per-sport hashes, so the tree is only serialized once.
+    """
+    sports_data = tree_data.get("data") or {}
+    sport_hashes = {}
+    for tree in ("t1", "t2"):
+        for sport_item in sports_data.get(tree) or []:
+            encoded = json.dumps(sport_item, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            sport_hashes[f"{tree}:{sport_item.get('etid')}"] = hashlib.sha1(encoded).hexdigest()
+
+    overall = hashlib.sha1()
+    for name in sorted(sport_hashes):
+        overall.update(f"{name}={sport_hashes[name]};".encode("utf-8"))
+    return overall.hexdigest(), sport_hashes
+
+
+def count_tree_nodes(tree_data: dict, sport_names=None):
+    """Count sports, competitions and events in the tree (optionally only for the given "t1:4" names)."""
+    sports_data = tree_data.get("data") or {}
+    total = 0
+    for tree in ("t1", "t2"):
+        for sport_item in sports_data.get(tree) or []:
+            if sport_names is not None and f"{tree}:{sport_item.get('etid')}" not in sport_names:
+                continue
+            total += 1
+            for child in sport_item.get("children") or []:
+                total += 1 + len(child.get("children") or [])
+    return total
+
+
+def save_tree_data(tree_data: dict, sport_names=None):
     """
     Save tree data into Sport, Competition, and Event models.
 
-    - Insert new data if not present.
+    - Insert new data if not present, update rows whose name/region/date changed.
     - If competitions/events are missing in new payload but exist in DB → delete them.
     - Never delete Sport records.
+    - If sport_names ("t1:4", "t2:99", ...) is given, only those sports are synced.
+
+    Existing rows are loaded once per model and diffed in memory, so the number of
+    queries depends on the batch size rather than on the size of the tree.
+    The catalog version is bumped once the changes are committed.
+    Returns insert/update/delete counts per model.
     """
+    sports_data = tree_data.get("data") or {}
+    wanted = _parse_tree(sports_data, sport_names)
+
     with transaction.atomic():
-        sports_data = tree_data.get("data") or {}
-
-        # ----------------- Handle T1 -----------------
-        for sport_item in sports_data.get("t1") or []:
-            sport, _ = Sport.objects.get_or_create(
-                event_type_id=sport_item.get("etid"),
-                tree="t1",
-                defaults={
-                    "oid": sport_item.get("oid"),
-                    "name": sport_item.get("name") or "",
-                }
-            )
+        sports, sport_stats = _sync_sports(wanted["sports"])
+        competitions, competition_stats = _sync_competitions(wanted["competitions"], sports)
+        event_stats = _sync_events(wanted["events"], sports, competitions)
+        if any(any(stats.values()) for stats in (sport_stats, competition_stats, event_stats)):
+            transaction.on_commit(bump_catalog_version)
 
-            # Track competitions seen in this payload
-            seen_competition_ids = set()
+    return {
+        "sports": sport_stats,
+        "competitions": competition_stats,
+        "events": event_stats,
+    }
 
-            for comp_item in sport_item.get("children") or []:
-                competition, _ = Competition.objects.get_or_create(
-                    competition_id=comp_item.get("cid"),
-                    sport=sport,
-                    defaults={
-                        "competition_name": comp_item.get("name") or "",
-                        "competition_region": comp_item.get("region") or "",
-                    }
-                )
 
-                seen_competition_ids.add(competition.competition_id)
+def get_catalog_version():
+    return int(redis_client.get(REDIS_KEY_CATALOG_VERSION) or 0)
 
-                # Track events seen under this competition
-                seen_event_ids = set()
 
-                for event_item in comp_item.get("children") or []:
-                    event, _ = Event.objects.get_or_create(
-                        event_id=event_item.get("gmid"),
-                        defaults={
-                            "event_name": event_item.get("name") or "",
-                            "sport": sport,
-                            "competition": competition,
-                        }
-                    )
-                    seen_event_ids.add(event.event_id)
-
-                # Delete missing events for this competition
-                Event.objects.filter(competition=competition).exclude(event_id__in=seen_event_ids).delete()
-
-            # Delete missing competitions (and cascade delete events)
-            Competition.objects.filter(sport=sport).exclude(competition_id__in=seen_competition_ids).delete()
-
-        # ----------------- Handle T2 -----------------
-        for sport_item in sports_data.get("t2") or []:
-            sport, _ = Sport.objects.get_or_create(
-                event_type_id=sport_item.get("etid"),
-                tree="t2",
-                defaults={
-                    "oid": sport_item.get("oid"),
-                    "name": sport_item.get("name") or "",
+def bump_catalog_version():
+    """Invalidate the catalog ETags and cached pages; call after writing Sport/Competition/Event."""
+    try:
+        redis_client.incr(REDIS_KEY_CATALOG_VERSION)
+    except Exception as e:
+        print(f"Catalog version bump failed: {e}")
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _parse_tree(sports_data: dict, sport_names=None):
+    """
+    Flatten the t1/t2 payload into dicts keyed the same way rows are matched in DB:
+      sports:       (event_type_id, tree)              -> fields
+      competitions: (sport_key, competition_id)        -> fields
+      events:       event_id                           -> fields (+ sport/competition keys)
+    """
+    sports, competitions, events = {}, {}, {}
+
+    for tree in ("t1", "t2"):
+        for sport_item in sports_data.get(tree) or []:
+            if sport_names is not None and f"{tree}:{sport_item.get('etid')}" not in sport_names:
+                continue
+            sport_key = (sport_item.get("etid"), tree)
+            sports[sport_key] = {
+                "oid": sport_item.get("oid"),
+                "name": sport_item.get("name") or "",
+            }
+
+            if tree == "t2":
+                # T2 has no competitions, events hang directly under sport
+                for event_item in sport_item.get("children") or []:
+                    events[str(event_item.get("gmid"))] = _parse_event(event_item, sport_key, None)
+                continue
+
+            for comp_item in sport_item.get("children") or []:
+                comp_key = (sport_key, str(comp_item.get("cid")))
+                competitions[comp_key] = {
+                    "competition_name": comp_item.get("name") or "",
+                    "competition_region": comp_item.get("region") or "",
                 }
-            )
-
-            # Track events seen directly under sport
-            seen_event_ids = set()
-
-            for event_item in sport_item.get("children") or []:
-                event_date = None
-                sdatetime = event_item.get("sdatetime")
-                if sdatetime:
-                    try:
-                        event_date = datetime.strptime(sdatetime, "%m/%d/%Y %I:%M:%S %p")
-                    except Exception:
-                        pass
-
-                event, _ = Event.objects.get_or_create(
-                    event_id=event_item.get("gmid"),
-                    defaults={
-                        "event_name": event_item.get("name") or "",
-                        "sport": sport,
-                        "event_open_date": event_date,
-                    }
-                )
-                seen_event_ids.add(event.event_id)
-
-            # Delete missing events under this sport (T2 has no competitions)
-            Event.objects.filter(sport=sport, competition__isnull=True).exclude(event_id__in=seen_event_ids).delete()
+                for event_item in comp_item.get("children") or []:
+                    events[str(event_item.get("gmid"))] = _parse_event(event_item, sport_key, comp_key)
+
+    return {"sports": sports, "competitions": competitions, "events": events}
+
+
+def _parse_event(event_item: dict, sport_key, comp_key):
+    return {
+        "event_name": event_item.get("name") or "",
+        "event_open_date": _parse_sdatetime(event_item.get("sdatetime")),
+        "sport_key": sport_key,
+        "comp_key": comp_key,
+    }
+
+
+def _parse_sdatetime(sdatetime):
+    if not sdatetime:
+        return None
+    try:
+        return timezone.make_aware(datetime.strptime(sdatetime, SDATETIME_FORMAT))
+    except Exception:
+        return None
+
+
+def _new_stats():
+    return {"inserted": 0, "updated": 0, "deleted": 0}
+
+
+def _sync_sports(wanted: dict):
+    """Upsert sports. Returns ({sport_key: Sport}, stats)."""
+    stats = _new_stats()
+    existing = {}
+    trees = {tree for _, tree in wanted}
+    for sport in Sport.objects.filter(tree__in=trees).only("id", "event_type_id", "tree", "oid", "name"):
+        existing.setdefault((sport.event_type_id, sport.tree), sport)
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for key, fields in wanted.items():
+        sport = existing.get(key)
+        if sport is None:
+            sport = Sport(event_type_id=key[0], tree=key[1], **fields)
+            to_create.append(sport)
+            existing[key] = sport
+        elif sport.name != fields["name"]:
+            sport.name = fields["name"]
+            sport.updated_at = now
+            to_update.append(sport)
+
+    Sport.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    Sport.objects.bulk_update(to_update, ["name", "updated_at"], batch_size=BULK_BATCH_SIZE)
+    stats["inserted"], stats["updated"] = len(to_create), len(to_update)
+
+    return {key: existing[key] for key in wanted}, stats
+
+
+def _sync_competitions(wanted: dict, sports: dict):
+    """Upsert competitions of T1 sports and delete the ones missing from the payload."""
+    stats = _new_stats()
+    sport_key_by_id = {sport.id: key for key, sport in sports.items() if key[1] == "t1"}
+
+    existing, stale_ids = {}, []
+    rows = Competition.objects.filter(sport_id__in=sport_key_by_id).only(
+        "id", "sport_id", "competition_id", "competition_name", "competition_region"
+    )
+    for competition in rows:
+        key = (sport_key_by_id[competition.sport_id], competition.competition_id)
+        if key in wanted and key not in existing:
+            existing[key] = competition
+        else:
+            # Missing from payload, or a duplicate row of one we already matched
+            stale_ids.append(competition.id)
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for key, fields in wanted.items():
+        competition = existing.get(key)
+        if competition is None:
+            competition = Competition(sport=sports[key[0]], competition_id=key[1], **fields)
+            to_create.append(competition)
+            existing[key] = competition
+        elif (
+            competition.competition_name != fields["competition_name"]
+            or competition.competition_region != fields["competition_region"]
+        ):
+            competition.competition_name = fields["competition_name"]
+            competition.competition_region = fields["competition_region"]
+            competition.updated_at = now
+            to_update.append(competition)
+
+    Competition.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    Competition.objects.bulk_update(
+        to_update, ["competition_name", "competition_region", "updated_at"], batch_size=BULK_BATCH_SIZE
+    )
+    if stale_ids:
+        # Cascade deletes the events of the removed competitions as well
+        Competition.objects.filter(id__in=stale_ids).delete()
+
+    stats["inserted"], stats["updated"], stats["deleted"] = len(to_create), len(to_update), len(stale_ids)
+    return existing, stats
+
+
+def _sync_events(wanted: dict, sports: dict, competitions: dict):
+    """Upsert events and delete those of the synced sports that are missing from the payload."""
+    stats = _new_stats()
+    sport_ids = [sport.id for sport in sports.values()]
+
+    existing, stale_ids = {}, []
+    rows = Event.objects.filter(Q(sport_id__in=sport_ids) | Q(event_id__in=list(wanted))).only(
+        "id", "event_id", "event_name", "event_open_date", "sport_id", "competition_id"
+    )
+    for event in rows:
+        if event.event_id in wanted and event.event_id not in existing:
+            existing[event.event_id] = event
+        else:
+            stale_ids.append(event.id)
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for event_id, fields in wanted.items():
+        sport = sports[fields["sport_key"]]
+        competition = competitions.get(fields["comp_key"]) if fields["comp_key"] else None
+        competition_pk = competition.id if competition else None
+        event = existing.get(event_id)
+
+        if event is None:
+            to_create.append(Event(
+                event_id=event_id,
+                event_name=fields["event_name"],
+                event_open_date=fields["event_open_date"],
+                sport=sport,
+                competition=competition,
+            ))
+        elif (
+            event.event_name != fields["event_name"]
+            or event.event_open_date != fields["event_open_date"]
+            or event.sport_id != sport.id
+            or event.competition_id != competition_pk
+        ):
+            event.event_name = fields["event_name"]
+            event.event_open_date = fields["event_open_date"]
+            event.sport_id = sport.id
+            event.competition_id = competition_pk
+            event.updated_at = now
+            to_update.append(event)
+
+    Event.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    Event.objects.bulk_update(
+        to_update,
+        ["event_name", "event_open_date", "sport_id", "competition_id", "updated_at"],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    if stale_ids:
+        Event.objects.filter(id__in=stale_ids).delete()
+
+    stats["inserted"], stats["updated"], stats["deleted"] = len(to_create), len(to_update), len(stale_ids)
+    return stats
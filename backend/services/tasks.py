@@ -1,14 +1,113 @@
 import os
+import time
 from celery import shared_task
-from backend.services.scaper_service import get_tree_record
-from backend.services.store_treedata_service import save_tree_data
+from django.conf import settings
+from backend.services.odds_analytics_service import run_analytics_batch
+from backend.services.odds_poller_service import get_poll_targets, poll_odds, prefetch_highlights, shard
+from backend.services.poll_scheduler import sync_schedule, take_due
+from backend.services.scaper_service import get_tree_record, redis_client, token_pool
+from backend.services.store_treedata_service import save_tree_data, fingerprint_tree, count_tree_nodes
+from backend.services.tree_snapshot_service import store_tree_snapshot
+
+REDIS_KEY_TREE_HASHES = "TREE_DATA_HASHES"
+REDIS_KEY_TREE_SYNC_RATE = "TREE_DATA_SYNC_MS_PER_NODE"
+TREE_HASH_OVERALL_FIELD = "__all__"
 
 
 @shared_task
 def save_tree_data_task():
-    """Periodic task to fetch and save tree data"""
-    from django.conf import settings
+    """
+    Periodic task to fetch and save tree data.
+
+    The tree is fingerprinted per sport and the hashes are kept in Redis, so only
+    sports whose subtree changed since the last successful run are synced.
+    The response served by TreeRecordView is rebuilt here when the tree changed.
+    """
     data = get_tree_record(os.getenv("DECRYPTION_KEY"))
-    if "error" not in data:
-        save_tree_data(data)
-    return "Tree data saved successfully"
\ No newline at end of file
+    if "error" in data:
+        return {"message": "Tree data not saved", "error": data.get("error")}
+    snapshot_updated = store_tree_snapshot(data)
+
+    overall_hash, sport_hashes = fingerprint_tree(data)
+    previous = {
+        name.decode("utf-8"): value.decode("utf-8")
+        for name, value in redis_client.hgetall(REDIS_KEY_TREE_HASHES).items()
+    }
+    changed = {name for name, value in sport_hashes.items() if previous.get(name) != value}
+    if previous.get(TREE_HASH_OVERALL_FIELD) == overall_hash:
+        changed = set()
+    skipped = sorted(set(sport_hashes) - changed)
+
+    ms_per_node = float(redis_client.get(REDIS_KEY_TREE_SYNC_RATE) or 0)
+    skipped_nodes = count_tree_nodes(data, set(skipped))
+    result = {
+        "synced_sports": sorted(changed),
+        "skipped_sports": skipped,
+        "estimated_ms_saved": round(skipped_nodes * ms_per_node, 2),
+        "snapshot_updated": snapshot_updated,
+    }
+
+    if not changed:
+        return {"message": "Tree data unchanged", **result}
+
+    started = time.perf_counter()
+    stats = save_tree_data(data, sport_names=changed)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    synced_nodes = count_tree_nodes(data, changed)
+    if synced_nodes:
+        redis_client.set(REDIS_KEY_TREE_SYNC_RATE, elapsed_ms / synced_nodes)
+    redis_client.hset(REDIS_KEY_TREE_HASHES, mapping={**sport_hashes, TREE_HASH_OVERALL_FIELD: overall_hash})
+
+    return {"message": "Tree data saved successfully", "stats": stats, "sync_ms": round(elapsed_ms, 2), **result}
+
+
+@shared_task
+def refresh_g_token_task():
+    """Periodic task keeping the g_token pool full and renewing tokens before they expire, so requests never wait on a browser"""
+    refreshed = token_pool.refresh_if_expiring()
+    return {"refreshed": refreshed, "pool": token_pool.stats()}
+
+
+@shared_task
+def dispatch_odds_poll_task(sport_event_type_id=None):
+    """Poll every enabled event once, split into shards polled by the workers"""
+    pairs = get_poll_targets(sport_event_type_id)
+    shards = shard(pairs, settings.ODDS_POLL_SHARD_SIZE)
+    for shard_pairs in shards:
+        poll_odds_shard_task.delay(shard_pairs)
+    return {"events": len(pairs), "shards": len(shards)}
+
+
+@shared_task
+def poll_odds_shard_task(pairs):
+    """Fetch odds for one shard of (sport_id, event_id) pairs and cache them in Redis"""
+    return poll_odds([tuple(pair) for pair in pairs])
+
+
+@shared_task
+def sync_odds_schedule_task():
+    """Periodic task adding new events to the adaptive poll schedule and dropping disabled ones"""
+    return sync_schedule()
+
+
+@shared_task
+def odds_poll_tick_task():
+    """Periodic task dispatching the events that are due, within the upstream request budget"""
+    pairs = take_due()
+    for shard_pairs in shard(pairs, settings.ODDS_POLL_SHARD_SIZE):
+        poll_odds_shard_task.delay(shard_pairs)
+    return {"dispatched": len(pairs)}
+
+
+@shared_task
+def compute_odds_analytics_task(sport_event_type_id=None):
+    """Periodic task computing overround, spreads and arbitrage flags for all polled events in one pass"""
+    event_ids = [event_id for _, event_id in get_poll_targets(sport_event_type_id)]
+    return run_analytics_batch(event_ids)
+
+
+@shared_task
+def prefetch_highlights_task():
+    """Periodic task refreshing the cached highlight-home data of every sport"""
+    return prefetch_highlights()
@@ -0,0 +1,281 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from redis.exceptions import LockError
+
+from backend.services.gtoken_service import get_cookie_token
+
+REDIS_KEY_G_TOKEN_SLOT = "G_TOKEN_POOL:{slot}"
+REDIS_KEY_G_TOKEN_LOCK = "G_TOKEN_POOL:{slot}:refresh-lock"
+REDIS_CHANNEL_G_TOKEN = "G_TOKEN_POOL:updates"
+
+
+class TokenRefreshError(Exception):
+    pass
+
+
+class TokenPool:
+    """
+    Pool of independently acquired d247 g_tokens (upstream sessions) in Redis.
+
+    - Each of the `size` slots (G_TOKEN_POOL:{slot}) holds its own token from a
+      separate browser login and expires on its own.
+    - acquire() hands out the token with the fewest requests in flight in this
+      process, round-robin among equals, so load spreads over the sessions.
+    - A token rejected with a 401 is retired alone; the other sessions keep
+      serving while its slot is refilled in the background.
+    - Slots are filled single-flight under a per-slot Redis lock, ahead of
+      expiry, by the beat task or a background thread; callers only wait on a
+      browser when the whole pool is empty.
+    - The slots are read from Redis at most every local_ttl seconds; changes are
+      broadcast over Redis pub/sub so every process reloads immediately.
+    """
+
+    def __init__(self, redis_client, fetch_token=get_cookie_token, size=None):
+        self.redis = redis_client
+        self.fetch_token = fetch_token
+        self.size = size or settings.G_TOKEN_POOL_SIZE
+        self.ttl = settings.G_TOKEN_TTL
+        self.refresh_ahead = settings.G_TOKEN_REFRESH_AHEAD
+        self.lock_timeout = settings.G_TOKEN_LOCK_TIMEOUT
+        self.wait_timeout = settings.G_TOKEN_WAIT_TIMEOUT
+        self.local_ttl = settings.G_TOKEN_LOCAL_TTL
+        self._background_refresh = None
+        self._background_started_at = 0.0
+
+        self._slots = {}
+        self._loaded_at = None
+        self._in_flight = {}
+        self._cursor = 0
+        self._counters = {"acquired": 0, "retired": 0, "filled": 0}
+        self._local_lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+
+    def acquire(self):
+        """Return the least-loaded live token, acquiring one if the pool is empty. Pair with release()."""
+        self._ensure_listener()
+        slots = self._load()
+        if not slots:
+            slots = self._fill_blocking()
+        if not slots:
+            # Every slot was retired again between the refresh and this read
+            raise TokenRefreshError("No g_token left in the pool after refresh")
+        if len(slots) < self.size or any(ttl < self.refresh_ahead for _, ttl in slots.values()):
+            self._refresh_in_background()
+
+        with self._local_lock:
+            tokens = [token for token, _ in slots.values()]
+            self._cursor = (self._cursor + 1) % len(tokens)
+            rotated = tokens[self._cursor:] + tokens[:self._cursor]
+            token = min(rotated, key=lambda candidate: self._in_flight.get(candidate, 0))
+            self._in_flight[token] = self._in_flight.get(token, 0) + 1
+            self._counters["acquired"] += 1
+        return token
+
+    def release(self, token):
+        with self._local_lock:
+            count = self._in_flight.get(token, 0) - 1
+            if count > 0:
+                self._in_flight[token] = count
+            else:
+                self._in_flight.pop(token, None)
+
+    @contextmanager
+    def lease(self):
+        token = self.acquire()
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    def retire(self, token):
+        """Drop a token upstream rejected; its slot is refilled in the background."""
+        slot = next((slot for slot, (value, _) in self._load().items() if value == token), None)
+        if slot is not None:
+            key = REDIS_KEY_G_TOKEN_SLOT.format(slot=slot)
+            # Only delete the slot if it still holds this token, not a fresh one
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.watch(key)
+            if pipe.get(key) == token.encode("utf-8"):
+                pipe.multi()
+                pipe.delete(key)
+                pipe.publish(REDIS_CHANNEL_G_TOKEN, slot)
+                try:
+                    pipe.execute()
+                except Exception:
+                    pass
+            pipe.reset()
+        with self._local_lock:
+            self._counters["retired"] += 1
+        self._invalidate()
+        self._refresh_in_background()
+
+    def refresh_if_expiring(self):
+        """
+        Fill empty slots and renew the ones about to expire, skipping slots
+        another process is already working on. Returns the number of tokens stored.
+        """
+        filled = 0
+        for slot in range(self.size):
+            if not self._slot_expiring(slot):
+                continue
+            lock = self._lock(slot)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                if self._slot_expiring(slot):
+                    self._fetch_and_store(slot)
+                    filled += 1
+            except Exception as e:
+                print(f"g_token slot {slot} refresh failed: {e}")
+            finally:
+                self._release(lock)
+        return filled
+
+    def stats(self):
+        slots = self._load()
+        with self._local_lock:
+            return {
+                **self._counters,
+                "size": self.size,
+                "live": len(slots),
+                "slots": {slot: {"ttl": ttl, "in_flight": self._in_flight.get(token, 0)}
+                          for slot, (token, ttl) in sorted(slots.items())},
+            }
+
+    # ----------------------------------------------
+    #                 HELPER FUNCTIONS
+    # ----------------------------------------------
+
+    def _load(self):
+        """{slot: (token, ttl)} of the live slots, from the local copy while it is fresh."""
+        with self._local_lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.local_ttl:
+                elapsed = int(time.monotonic() - self._loaded_at)
+                return {slot: (token, ttl - elapsed) for slot, (token, ttl) in self._slots.items()
+                        if ttl - elapsed > 0}
+
+        pipe = self.redis.pipeline()
+        for slot in range(self.size):
+            pipe.get(REDIS_KEY_G_TOKEN_SLOT.format(slot=slot))
+            pipe.ttl(REDIS_KEY_G_TOKEN_SLOT.format(slot=slot))
+        replies = pipe.execute()
+        slots = {}
+        for slot in range(self.size):
+            token, ttl = replies[slot * 2], replies[slot * 2 + 1]
+            if token:
+                # ttl is -1 when the key has no expiry
+                slots[slot] = (token.decode("utf-8"), ttl if ttl >= 0 else self.ttl)
+        with self._local_lock:
+            self._slots, self._loaded_at = slots, time.monotonic()
+        return dict(slots)
+
+    def _invalidate(self):
+        with self._local_lock:
+            self._loaded_at = None
+
+    def _fill_blocking(self):
+        """
+        Fill a slot while the caller waits; used only when no token is left.
+
+        Blocks at most wait_timeout seconds for a refresh running elsewhere.
+        """
+        lock = self._lock(0)
+        if not lock.acquire(blocking=True, blocking_timeout=self.wait_timeout):
+            self._invalidate()
+            slots = self._load()
+            if slots:
+                return slots
+            raise TokenRefreshError("Timed out waiting for g_token refresh")
+        try:
+            # Someone filled a slot while we were waiting on the lock → use it
+            self._invalidate()
+            slots = self._load()
+            if slots:
+                return slots
+            self._fetch_and_store(0)
+            return self._load()
+        finally:
+            self._release(lock)
+
+    def _slot_expiring(self, slot):
+        # ttl is -2 when the key is missing and -1 when it has no expiry
+        ttl = self.redis.ttl(REDIS_KEY_G_TOKEN_SLOT.format(slot=slot))
+        return ttl == -2 or 0 <= ttl < self.refresh_ahead
+
+    def _fetch_and_store(self, slot):
+        token = self.fetch_token()   # 🔥 call Selenium/Playwright here (a separate login per slot)
+        if not token:
+            raise TokenRefreshError("g_token not found after login")
+        self.redis.setex(REDIS_KEY_G_TOKEN_SLOT.format(slot=slot), self.ttl, token)
+        self.redis.publish(REDIS_CHANNEL_G_TOKEN, slot)
+        with self._local_lock:
+            self._counters["filled"] += 1
+        self._invalidate()
+        return token
+
+    def _ensure_listener(self):
+        # Threads don't survive a fork (Celery prefork), so track the owning pid
+        if self._listener is not None and self._listener_pid == os.getpid() and self._listener.is_alive():
+            return
+        with self._local_lock:
+            if self._listener is not None and self._listener_pid == os.getpid() and self._listener.is_alive():
+                return
+            if self._listener_pid != os.getpid():
+                # In-flight counts belong to the parent process
+                self._in_flight = {}
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """Reload the slots when another process fills or retires one."""
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(REDIS_CHANNEL_G_TOKEN)
+                # Anything published before we subscribed is unknown → start from Redis
+                self._invalidate()
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._invalidate()
+            except Exception as e:
+                print(f"g_token listener error, resubscribing: {e}")
+                self._invalidate()
+                time.sleep(1)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _lock(self, slot):
+        return self.redis.lock(REDIS_KEY_G_TOKEN_LOCK.format(slot=slot), timeout=self.lock_timeout)
+
+    @staticmethod
+    def _release(lock):
+        try:
+            lock.release()
+        except LockError:
+            # Lock expired while the browser was running; nothing to release
+            pass
+
+    def _refresh_in_background(self):
+        if self._background_refresh is not None and self._background_refresh.is_alive():
+            return
+        # A slot locked by another process stays empty for a while: don't re-check on every call
+        if time.monotonic() - self._background_started_at < 1:
+            return
+        self._background_started_at = time.monotonic()
+        self._background_refresh = threading.Thread(target=self._safe_refresh_if_expiring, daemon=True)
+        self._background_refresh.start()
+
+    def _safe_refresh_if_expiring(self):
+        try:
+            self.refresh_if_expiring()
+        except Exception as e:
+            print(f"Background g_token refresh failed: {e}")
@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import json
+import time
+
+from django.conf import settings
+
+from backend.services.redis_service import get_redis_client
+
+REDIS_KEY_TREE_JSON = "tree-snapshot:json"
+REDIS_KEY_TREE_GZIP = "tree-snapshot:gzip"
+REDIS_KEY_TREE_META = "tree-snapshot:meta"
+
+redis_client = get_redis_client()
+
+
+class TreeSnapshot:
+    """Stored tree response body, its version (used as ETag) and age."""
+
+    __slots__ = ("body", "version", "created_at_ms", "gzipped")
+
+    def __init__(self, body, version, created_at_ms, gzipped):
+        self.body = body
+        self.version = version
+        self.created_at_ms = created_at_ms
+        self.gzipped = gzipped
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+    @property
+    def age_ms(self):
+        return max(0, int(time.time() * 1000) - self.created_at_ms)
+
+
+def encode_tree_response(tree_data):
+    """The exact JSON body TreeRecordView returns for the tree."""
+    return json.dumps(
+        {"message": "Tree data fetched successfully", "data": tree_data}, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def store_tree_snapshot(tree_data):
+    """
+    Materialize the tree response as JSON and gzip bytes, once per change.
+
+    When the encoded body matches the stored version only the expiry is
+    extended; otherwise both variants and the metadata are replaced in one
+    transaction. Returns True when a new version was written.
+    """
+    body = encode_tree_response(tree_data)
+    version = hashlib.sha1(body).hexdigest()
+    ttl = settings.TREE_SNAPSHOT_TTL
+
+    pipe = redis_client.pipeline(transaction=True)
+    if redis_client.hget(REDIS_KEY_TREE_META, "version") == version.encode("utf-8"):
+        for key in (REDIS_KEY_TREE_JSON, REDIS_KEY_TREE_GZIP, REDIS_KEY_TREE_META):
+            pipe.expire(key, ttl)
+        pipe.execute()
+        return False
+
+    pipe.set(REDIS_KEY_TREE_JSON, body, ex=ttl)
+    pipe.set(REDIS_KEY_TREE_GZIP, gzip.compress(body, compresslevel=6), ex=ttl)
+    pipe.hset(REDIS_KEY_TREE_META, mapping={"version": version, "created_at_ms": int(time.time() * 1000)})
+    pipe.expire(REDIS_KEY_TREE_META, ttl)
+    pipe.execute()
+    return True
+
+
+def get_tree_snapshot(gzipped=False):
+    """Return the stored TreeSnapshot (gzip variant if asked), or None when there is none."""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.get(REDIS_KEY_TREE_GZIP if gzipped else REDIS_KEY_TREE_JSON)
+    pipe.hmget(REDIS_KEY_TREE_META, ["version", "created_at_ms"])
+    body, (version, created_at_ms) = pipe.execute()
+    if body is None or version is None:
+        return None
+    return TreeSnapshot(body, version.decode("utf-8"), int(created_at_ms or 0), gzipped)
@@ -0,0 +1,211 @@
+import asyncio
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for d247 calls.
+
+    Keeps one requests.Session per host, each mounted with a keep-alive
+    connection pool and a retry/backoff policy, so repeated calls reuse
+    established TCP/TLS connections instead of reconnecting every time.
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None,
+                 max_retries=None, backoff_factor=None, retry_statuses=None):
+        self.pool_connections = pool_connections or settings.UPSTREAM_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or settings.UPSTREAM_POOL_MAXSIZE
+        self.pool_block = settings.UPSTREAM_POOL_BLOCK if pool_block is None else pool_block
+        self.max_retries = settings.UPSTREAM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_factor = settings.UPSTREAM_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        self.retry_statuses = retry_statuses or settings.UPSTREAM_RETRY_STATUSES
+
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, json=None, timeout=3):
+        host = urlsplit(url).netloc
+        session = self._get_session(host)
+        counters = self._counters[host]
+
+        with self._lock:
+            counters["requests"] += 1
+            counters["in_flight"] += 1
+            counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+        try:
+            return session.request(method.upper(), url, headers=headers, json=json, timeout=timeout)
+        except requests.RequestException:
+            with self._lock:
+                counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                counters["in_flight"] -= 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Per-host request counters plus connection pool usage, for sizing pools against worker count."""
+        with self._lock:
+            result = {}
+            for host, session in self._sessions.items():
+                pools = []
+                adapter = session.get_adapter(f"https://{host}/")
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    pools.append({
+                        "scheme": pool.scheme,
+                        "host": pool.host,
+                        "connections_opened": pool.num_connections,
+                        "requests_sent": pool.num_requests,
+                        # The pool queue is pre-filled with None placeholders
+                        "idle_connections": sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                        if pool.pool else 0,
+                        "maxsize": self.pool_maxsize,
+                    })
+                result[host] = {**self._counters[host], "pools": pools}
+            return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._counters.clear()
+
+    def _get_session(self, host):
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = self._build_session()
+                self._counters[host] = {"requests": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0}
+            return self._sessions[host]
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            # Never resend after a read timeout: the request may already have been
+            # processed, and slow responses are handled by the guard's timeout and hedging
+            read=0,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            # d247 reads are POSTs, so connect errors and retry statuses must retry them too
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_upstream_client():
+    """Process-wide UpstreamClient, created lazily so settings are loaded first."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient()
+    return _client
+
+
+class AsyncUpstreamClient:
+    """
+    asyncio counterpart of UpstreamClient built on httpx.AsyncClient.
+
+    An AsyncClient is bound to the event loop it was created in, so one is kept
+    per running loop. Concurrency is bounded by a per-loop semaphore.
+    """
+
+    def __init__(self, concurrency=None, max_connections=None, max_retries=None):
+        self.concurrency = concurrency or settings.UPSTREAM_ASYNC_CONCURRENCY
+        self.max_connections = max_connections or settings.UPSTREAM_POOL_MAXSIZE
+        self.max_retries = settings.UPSTREAM_MAX_RETRIES if max_retries is None else max_retries
+        self._clients = weakref.WeakKeyDictionary()
+        self._counters = {"requests": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    async def request(self, method, url, headers=None, json=None, timeout=3):
+        client, semaphore = self._get_client()
+        async with semaphore:
+            self._counters["requests"] += 1
+            self._counters["in_flight"] += 1
+            self._counters["peak_in_flight"] = max(self._counters["peak_in_flight"], self._counters["in_flight"])
+            try:
+                return await client.request(method.upper(), url, headers=headers, json=json, timeout=timeout)
+            except httpx.HTTPError:
+                self._counters["errors"] += 1
+                raise
+            finally:
+                self._counters["in_flight"] -= 1
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self):
+        return {**self._counters, "concurrency": self.concurrency, "loops": len(self._clients)}
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            )
+            # httpx only retries connection failures, which is what we want for keep-alive resets
+            transport = httpx.AsyncHTTPTransport(limits=limits, retries=self.max_retries)
+            entry = (httpx.AsyncClient(transport=transport), asyncio.Semaphore(self.concurrency))
+            self._clients[loop] = entry
+        return entry
+
+
+_async_client = None
+
+
+def get_async_upstream_client():
+    """Process-wide AsyncUpstreamClient."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncUpstreamClient()
+    return _async_client
+
+
+def upstream_pool_stats():
+    stats = {"sync": get_upstream_client().stats()}
+    if _async_client is not None:
+        stats["async"] = _async_client.stats()
+    return stats
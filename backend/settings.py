@@ -111,13 +111,23 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "backend.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
+# Catalog read API (/api/catalog/...): default and max page size, rendered page cache TTL (seconds)
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "1000"))
+CATALOG_MAX_PAGE_SIZE = int(os.getenv("CATALOG_MAX_PAGE_SIZE", "10000"))
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+
 # CORS config
 CORS_ALLOW_ALL_ORIGINS = True
 
 # Celery & Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
 
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -131,9 +141,183 @@ BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 DECRYPTION_KEY = os.getenv("DECRYPTION_KEY")
 COOKIE_TOKEN = os.getenv("COOKIE_TOKEN")
 
+# g_token pool: requests are spread over N independently logged-in upstream sessions,
+# each refreshed single-flight under a Redis lock, ahead of expiry
+G_TOKEN_POOL_SIZE = int(os.getenv("G_TOKEN_POOL_SIZE", "3"))
+G_TOKEN_TTL = int(os.getenv("G_TOKEN_TTL", "3600"))
+G_TOKEN_REFRESH_AHEAD = int(os.getenv("G_TOKEN_REFRESH_AHEAD", "600"))
+G_TOKEN_LOCK_TIMEOUT = int(os.getenv("G_TOKEN_LOCK_TIMEOUT", "120"))
+G_TOKEN_WAIT_TIMEOUT = int(os.getenv("G_TOKEN_WAIT_TIMEOUT", "90"))
+# In-process token cache in front of Redis, invalidated via pub/sub on refresh
+G_TOKEN_LOCAL_TTL = float(os.getenv("G_TOKEN_LOCAL_TTL", "30"))
+
+# Warm headless browser pool used for token acquisition and page capture
+BROWSER_POOL_DRIVER = os.getenv("BROWSER_POOL_DRIVER", "chrome")  # chrome | undetected | fake
+BROWSER_POOL_HEADLESS = os.getenv("BROWSER_POOL_HEADLESS", "1") == "1"
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", "50"))
+BROWSER_POOL_MAX_AGE = int(os.getenv("BROWSER_POOL_MAX_AGE", "1800"))
+BROWSER_POOL_CHECKOUT_TIMEOUT = float(os.getenv("BROWSER_POOL_CHECKOUT_TIMEOUT", "60"))
+
+# Upstream (d247) HTTP client: per-host keep-alive pools and retry policy
+UPSTREAM_POOL_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_CONNECTIONS", "4"))
+UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "32"))
+UPSTREAM_POOL_BLOCK = os.getenv("UPSTREAM_POOL_BLOCK", "0") == "1"
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_FACTOR = float(os.getenv("UPSTREAM_BACKOFF_FACTOR", "0.2"))
+UPSTREAM_RETRY_STATUSES = [
+    int(code) for code in os.getenv("UPSTREAM_RETRY_STATUSES", "502,503,504").split(",") if code
+]
+UPSTREAM_ASYNC_CONCURRENCY = int(os.getenv("UPSTREAM_ASYNC_CONCURRENCY", "50"))
+
+# Upstream resilience, per endpoint (last URL path segment): circuit breaker, timeouts adapted to
+# observed latency percentiles, and hedged requests (a second request after the p95 delay)
+UPSTREAM_HEDGE_WORKERS = int(os.getenv("UPSTREAM_HEDGE_WORKERS", "16"))
+UPSTREAM_ENDPOINT_DEFAULTS = {
+    "failure_threshold": int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+    "reset_timeout": float(os.getenv("UPSTREAM_BREAKER_RESET", "10")),
+    "window": int(os.getenv("UPSTREAM_LATENCY_WINDOW", "200")),
+    "min_samples": int(os.getenv("UPSTREAM_LATENCY_MIN_SAMPLES", "20")),
+    "min_timeout": float(os.getenv("UPSTREAM_TIMEOUT_MIN", "0.5")),
+    "max_timeout": float(os.getenv("UPSTREAM_TIMEOUT_MAX", "3")),
+    "timeout_percentile": float(os.getenv("UPSTREAM_TIMEOUT_PERCENTILE", "99")),
+    "timeout_multiplier": float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "2")),
+    "hedge": False,
+    "hedge_percentile": float(os.getenv("UPSTREAM_HEDGE_PERCENTILE", "95")),
+    "hedge_min_delay": float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY", "0.05")),
+    # Share of recent calls allowed to send a hedge, so a slow upstream is not hit twice as hard
+    "hedge_budget": float(os.getenv("UPSTREAM_HEDGE_BUDGET", "0.1")),
+}
+UPSTREAM_HEDGE_ENDPOINTS = [
+    name for name in os.getenv("UPSTREAM_HEDGE_ENDPOINTS", "gamedataPrivate,highlighthomePrivate").split(",") if name
+]
+UPSTREAM_ENDPOINTS = {
+    # The tree is large and fetched in the background: longer timeout, no hedging
+    "treedata": {"max_timeout": float(os.getenv("UPSTREAM_TREEDATA_TIMEOUT_MAX", "10"))},
+    "gamedataPrivate": {"max_timeout": float(os.getenv("UPSTREAM_GAMEDATA_TIMEOUT_MAX", "3"))},
+    "highlighthomePrivate": {"max_timeout": float(os.getenv("UPSTREAM_HIGHLIGHT_TIMEOUT_MAX", "3"))},
+}
+for _name in UPSTREAM_HEDGE_ENDPOINTS:
+    UPSTREAM_ENDPOINTS.setdefault(_name, {})["hedge"] = True
+
+# Cluster-wide upstream rate limit: one Redis token bucket per endpoint (requests/s, burst).
+# Background traffic (Celery tasks) leaves a share of the burst to interactive requests;
+# callers wait up to the max wait for a token before giving up. scrape_events drives a
+# browser rather than the API client, so its page loads are not limited here.
+# One token is taken per make_request call: the transport-level retries of
+# UPSTREAM_MAX_RETRIES (connect errors and retried 5xx statuses) and hedged duplicates
+# are not counted, so keep the rates below the real upstream limit by that margin.
+UPSTREAM_RATE_LIMIT_DEFAULT = {
+    "rate": float(os.getenv("UPSTREAM_RATE_DEFAULT", "20")),
+    "burst": float(os.getenv("UPSTREAM_RATE_DEFAULT_BURST", "40")),
+}
+UPSTREAM_RATE_LIMITS = {
+    "treedata": {
+        "rate": float(os.getenv("UPSTREAM_RATE_TREEDATA", "1")),
+        "burst": float(os.getenv("UPSTREAM_RATE_TREEDATA_BURST", "3")),
+    },
+    "gamedataPrivate": {
+        "rate": float(os.getenv("UPSTREAM_RATE_GAMEDATA", "150")),
+        "burst": float(os.getenv("UPSTREAM_RATE_GAMEDATA_BURST", "300")),
+    },
+    "highlighthomePrivate": {
+        "rate": float(os.getenv("UPSTREAM_RATE_HIGHLIGHT", "20")),
+        "burst": float(os.getenv("UPSTREAM_RATE_HIGHLIGHT_BURST", "40")),
+    },
+}
+UPSTREAM_RATE_BACKGROUND_RESERVE = float(os.getenv("UPSTREAM_RATE_BACKGROUND_RESERVE", "0.25"))
+UPSTREAM_RATE_MAX_WAIT_INTERACTIVE = float(os.getenv("UPSTREAM_RATE_MAX_WAIT_INTERACTIVE", "0.5"))
+UPSTREAM_RATE_MAX_WAIT_BACKGROUND = float(os.getenv("UPSTREAM_RATE_MAX_WAIT_BACKGROUND", "5"))
+
+# Tree snapshot served by TreeRecordView: dropped (→ live fetch) if the sync task stops refreshing it
+TREE_SNAPSHOT_TTL = int(os.getenv("TREE_SNAPSHOT_TTL", "3600"))
+
+# Odds cache (events-odds/{event_id}): fresh TTL plus stale-while-revalidate window
+ODDS_CACHE_TTL_MS = int(os.getenv("ODDS_CACHE_TTL_MS", "500"))
+ODDS_CACHE_STALE_MS = int(os.getenv("ODDS_CACHE_STALE_MS", "4500"))
+ODDS_CACHE_LOCK_TIMEOUT_MS = int(os.getenv("ODDS_CACHE_LOCK_TIMEOUT_MS", "3000"))
+
+# Highlight-home cache (highlight-home/{etid}), refreshed by the prefetch task every N seconds
+HIGHLIGHT_PREFETCH_INTERVAL = float(os.getenv("HIGHLIGHT_PREFETCH_INTERVAL", "10"))
+HIGHLIGHT_CACHE_TTL_MS = int(os.getenv("HIGHLIGHT_CACHE_TTL_MS", "15000"))
+HIGHLIGHT_CACHE_STALE_MS = int(os.getenv("HIGHLIGHT_CACHE_STALE_MS", "60000"))
+
+# Batch odds endpoint (/api/odds/batch/): max events per request, deadline, concurrent upstream fetches
+ODDS_BATCH_MAX_ITEMS = int(os.getenv("ODDS_BATCH_MAX_ITEMS", "100"))
+ODDS_BATCH_TIMEOUT_MS = int(os.getenv("ODDS_BATCH_TIMEOUT_MS", "2000"))
+ODDS_BATCH_WORKERS = int(os.getenv("ODDS_BATCH_WORKERS", "16"))
+
+# Direct-API odds poller: events are split into shards fetched concurrently per worker
+ODDS_POLL_SHARD_SIZE = int(os.getenv("ODDS_POLL_SHARD_SIZE", "100"))
+ODDS_POLL_CONCURRENCY = int(os.getenv("ODDS_POLL_CONCURRENCY", "25"))
+
+# Adaptive poll scheduler: per-event intervals (seconds) by time to start, shared request budget
+ODDS_POLL_TICK = float(os.getenv("ODDS_POLL_TICK", "1"))
+ODDS_POLL_BUDGET_PER_SECOND = float(os.getenv("ODDS_POLL_BUDGET_PER_SECOND", "100"))
+ODDS_POLL_INPLAY_INTERVAL = float(os.getenv("ODDS_POLL_INPLAY_INTERVAL", "1"))
+# Past this age a started event is treated as stale (finished, never settled) and polled at the default interval
+ODDS_POLL_INPLAY_MAX_AGE = float(os.getenv("ODDS_POLL_INPLAY_MAX_AGE", "43200"))
+ODDS_POLL_SOON_WINDOW = float(os.getenv("ODDS_POLL_SOON_WINDOW", "1800"))
+ODDS_POLL_SOON_INTERVAL = float(os.getenv("ODDS_POLL_SOON_INTERVAL", "2"))
+ODDS_POLL_TODAY_WINDOW = float(os.getenv("ODDS_POLL_TODAY_WINDOW", "86400"))
+ODDS_POLL_TODAY_INTERVAL = float(os.getenv("ODDS_POLL_TODAY_INTERVAL", "30"))
+ODDS_POLL_FAR_INTERVAL = float(os.getenv("ODDS_POLL_FAR_INTERVAL", "300"))
+ODDS_POLL_DEFAULT_INTERVAL = float(os.getenv("ODDS_POLL_DEFAULT_INTERVAL", "15"))
+
+# Odds deltas (events-odds-stream/{event_id}): entries kept per stream, expiry of idle event state (seconds)
+ODDS_STREAM_MAXLEN = int(os.getenv("ODDS_STREAM_MAXLEN", "1000"))
+ODDS_DELTA_STATE_TTL = int(os.getenv("ODDS_DELTA_STATE_TTL", "86400"))
+
+# Odds history (odds-history/{event_id}/{hour}): buffered ticks are flushed every N ticks or
+# seconds, kept for N days; range queries span at most N hours
+ODDS_HISTORY_FLUSH_TICKS = int(os.getenv("ODDS_HISTORY_FLUSH_TICKS", "5000"))
+ODDS_HISTORY_FLUSH_INTERVAL = float(os.getenv("ODDS_HISTORY_FLUSH_INTERVAL", "10"))
+ODDS_HISTORY_RETENTION_DAYS = int(os.getenv("ODDS_HISTORY_RETENTION_DAYS", "30"))
+ODDS_HISTORY_MAX_RANGE_HOURS = int(os.getenv("ODDS_HISTORY_MAX_RANGE_HOURS", "168"))
+
+# Odds analytics batch (odds-analytics/{event_id}): run interval and result expiry (seconds)
+ODDS_ANALYTICS_INTERVAL = float(os.getenv("ODDS_ANALYTICS_INTERVAL", "5"))
+ODDS_ANALYTICS_TTL = int(os.getenv("ODDS_ANALYTICS_TTL", "30"))
+
+# Odds SSE stream (ASGI only): events per connection, frames queued before a slow client
+# is resynced from snapshots, heartbeat interval (seconds)
+ODDS_STREAM_MAX_EVENTS = int(os.getenv("ODDS_STREAM_MAX_EVENTS", "50"))
+ODDS_STREAM_MAX_PENDING = int(os.getenv("ODDS_STREAM_MAX_PENDING", "256"))
+ODDS_STREAM_HEARTBEAT = float(os.getenv("ODDS_STREAM_HEARTBEAT", "15"))
+
+# Proxy endpoints embed the decrypted upstream JSON bytes in the response as-is
+PROXY_RAW_PASSTHROUGH = os.getenv("PROXY_RAW_PASSTHROUGH", "1") == "1"
+
+# Serve the upstream proxy endpoints with async views (enabled by backend/asgi.py)
+ASYNC_PROXY_VIEWS = os.getenv("ASYNC_PROXY_VIEWS", "0") == "1"
+
 CELERY_BEAT_SCHEDULE = {
     "save-tree-data-every-10-min": {
         "task": "backend.services.tasks.save_tree_data_task",
         "schedule": 60.0,
     },
+    "odds-poll-tick": {
+        "task": "backend.services.tasks.odds_poll_tick_task",
+        "schedule": ODDS_POLL_TICK,
+        # A tick that could not run in time is useless, the next one covers it
+        "options": {"expires": ODDS_POLL_TICK},
+    },
+    "odds-poll-schedule-sync": {
+        "task": "backend.services.tasks.sync_odds_schedule_task",
+        "schedule": 60.0,
+    },
+    "odds-analytics": {
+        "task": "backend.services.tasks.compute_odds_analytics_task",
+        "schedule": ODDS_ANALYTICS_INTERVAL,
+        "options": {"expires": ODDS_ANALYTICS_INTERVAL},
+    },
+    "prefetch-highlights": {
+        "task": "backend.services.tasks.prefetch_highlights_task",
+        "schedule": HIGHLIGHT_PREFETCH_INTERVAL,
+        "options": {"expires": HIGHLIGHT_PREFETCH_INTERVAL},
+    },
+    "refresh-g-token-ahead-of-expiry": {
+        "task": "backend.services.tasks.refresh_g_token_task",
+        "schedule": 60.0,
+    },
 }
\ No newline at end of file
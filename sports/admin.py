@@ -1,7 +1,26 @@
 from django.contrib import admin
+from django.db import transaction
+
+from backend.services.store_treedata_service import bump_catalog_version
 from .models import Sport, Competition, Event
 
 
+class CatalogVersionMixin:
+    """Edits change what the catalog endpoints serve, so their ETags are invalidated on commit."""
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        transaction.on_commit(bump_catalog_version)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(bump_catalog_version)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(bump_catalog_version)
+
+
 class CompetitionInline(admin.TabularInline):
     model = Competition
     extra = 1
@@ -17,7 +36,7 @@ class EventInline(admin.TabularInline):
 
 
 @admin.register(Sport)
-class SportAdmin(admin.ModelAdmin):
+class SportAdmin(CatalogVersionMixin, admin.ModelAdmin):
     list_display = ("name", "event_type_id", "oid", "tree")
     search_fields = ("name", "event_type_id", "oid")
     list_filter = ("tree",)
@@ -25,7 +44,7 @@ class SportAdmin(admin.ModelAdmin):
 
 
 @admin.register(Competition)
-class CompetitionAdmin(admin.ModelAdmin):
+class CompetitionAdmin(CatalogVersionMixin, admin.ModelAdmin):
     list_display = ("competition_name", "competition_id", "sport", "competition_region", "market_count")
     search_fields = ("competition_name", "competition_id")
     list_filter = ("competition_region", "sport")
@@ -33,7 +52,7 @@ class CompetitionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(CatalogVersionMixin, admin.ModelAdmin):
     list_display = (
         "event_name",
         "event_id",
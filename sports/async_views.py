@@ -0,0 +1,150 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from backend.services.cache_service import (
+    get_cached_highlight_async,
+    get_cached_odds_async,
+    get_cached_odds_many_async,
+)
+from backend.services.odds_stream_service import get_odds_stream_hub
+from backend.services.rate_limit_service import RateLimitExceeded
+from backend.services.scaper_service import get_tree_record_async
+from backend.services.tree_snapshot_service import get_tree_snapshot, store_tree_snapshot
+from .views import (
+    accepts_gzip,
+    get_decryption_key,
+    odds_batch_response,
+    parse_odds_batch,
+    passthrough_response,
+    tree_snapshot_response,
+)
+
+
+class BaseAsyncView(View):
+    """
+    Base async view for ASGI deployments.
+
+    Mirrors BaseAPIView's response envelopes, but awaits upstream I/O instead of
+    holding a worker thread while d247 responds.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, RateLimitExceeded):
+            response = JsonResponse({"error": str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response["Retry-After"] = "1"
+            return response
+        return JsonResponse({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncTreeRecordView(BaseAsyncView):
+    """Async variant of TreeRecordView."""
+
+    async def get(self, request, *args, **kwargs):
+        snapshot = await sync_to_async(get_tree_snapshot, thread_sensitive=False)(gzipped=accepts_gzip(request))
+        if snapshot is not None:
+            return tree_snapshot_response(snapshot, request)
+
+        key = get_decryption_key()
+        data = await get_tree_record_async(key)
+        if "error" in data:
+            return JsonResponse(data, status=status.HTTP_401_UNAUTHORIZED)
+        await sync_to_async(store_tree_snapshot, thread_sensitive=False)(data)
+        return JsonResponse({"message": "Tree data fetched successfully", "data": data}, status=status.HTTP_200_OK)
+
+
+class AsyncOddsView(BaseAsyncView):
+    """Async variant of OddsView."""
+
+    async def get(self, request, *args, **kwargs):
+        sport_id = request.GET.get("sport_id")
+        event_id = request.GET.get("event_id")
+
+        if not sport_id or not event_id:
+            return JsonResponse(
+                {"error": "sport_id and event_id are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        key = get_decryption_key()
+        entry = await get_cached_odds_async(int(sport_id), int(event_id), key)
+        headers = {"X-Cache": entry.state, "X-Cache-Age-Ms": str(entry.age_ms)}
+        if settings.PROXY_RAW_PASSTHROUGH:
+            return passthrough_response("odds", entry.raw, headers)
+        response = JsonResponse({"odds": entry.data()}, status=status.HTTP_200_OK)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncOddsBatchView(BaseAsyncView):
+    """Async variant of OddsBatchView."""
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            pairs, timeout = parse_odds_batch(json.loads(request.body or b"null"))
+        except (TypeError, ValueError) as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = get_decryption_key()
+        return odds_batch_response(pairs, await get_cached_odds_many_async(pairs, key, timeout))
+
+
+class AsyncHighlightHomePrivateView(BaseAsyncView):
+    """Async variant of HighlightHomePrivateView."""
+
+    async def get(self, request, *args, **kwargs):
+        etid = request.GET.get("etid")
+        if not etid:
+            return JsonResponse({"error": "etid is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = get_decryption_key()
+        entry = await get_cached_highlight_async(int(etid), key)
+        headers = {"X-Cache": entry.state, "X-Cache-Age-Ms": str(entry.age_ms)}
+        if settings.PROXY_RAW_PASSTHROUGH:
+            return passthrough_response("highlight", entry.raw, headers)
+        response = JsonResponse({"highlight": entry.data()}, status=status.HTTP_200_OK)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+
+class OddsStreamView(BaseAsyncView):
+    """
+    Server-Sent Events stream of odds for ?event_ids=1,2,3.
+
+    Sends a snapshot per event, then only the changed prices as they are polled.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        event_ids = [event_id for event_id in request.GET.get("event_ids", "").split(",") if event_id.strip()]
+        if not event_ids or not all(event_id.strip().isdigit() for event_id in event_ids):
+            return JsonResponse({"error": "event_ids is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(event_ids) > settings.ODDS_STREAM_MAX_EVENTS:
+            return JsonResponse(
+                {"error": f"at most {settings.ODDS_STREAM_MAX_EVENTS} event_ids per stream"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        hub = get_odds_stream_hub()
+        response = StreamingHttpResponse(
+            hub.stream(int(event_id) for event_id in event_ids),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -0,0 +1,150 @@
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import DateTimeField, IntegerField, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.generics import ListAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from backend.services.redis_service import get_redis_client
+from backend.services.store_treedata_service import get_catalog_version
+from .models import Sport, Competition, Event
+from .pagination import CatalogCursorPagination
+from .serializers import SportSerializer, CompetitionWithSportIdSerializer, EventOnlySerializer
+
+redis_client = get_redis_client()
+
+NO_OPEN_DATE = datetime(9999, 12, 31, tzinfo=dt_timezone.utc)
+
+
+class CatalogListView(ListAPIView):
+    """
+    Paginated read of the synced catalog tables.
+
+    Each page gets an ETag built from its URL and the catalog version, a Redis
+    counter bumped whenever the tree sync (or the admin) changes the tables. An
+    unchanged page costs one Redis GET and no query: a 304 when the client
+    already has it, otherwise the JSON rendered for that ETag is served from Redis.
+    """
+
+    pagination_class = CatalogCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if "*" in client_etags or etag in client_etags:
+            return self._with_etag(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        cache_key = f"catalog-page/{etag}"
+        body = redis_client.get(cache_key)
+        if body is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            data = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+            body = JSONRenderer().render(data)
+            redis_client.set(cache_key, body, ex=settings.CATALOG_CACHE_TTL)
+        return self._with_etag(HttpResponse(body, content_type="application/json"), etag)
+
+    def get_etag(self):
+        key = f"{self.request.build_absolute_uri()}|{get_catalog_version()}"
+        return '"' + hashlib.md5(key.encode("utf-8")).hexdigest() + '"'
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ValueError):
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+
+    @staticmethod
+    def _with_etag(response, etag):
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class SportListView(CatalogListView):
+    """Sports, optionally filtered by ?sport=<event_type_id>."""
+
+    serializer_class = SportSerializer
+    cursor_ordering = ("sort_event_type_id", "id")
+
+    def get_queryset(self):
+        # The cursor position can't be NULL
+        queryset = Sport.objects.annotate(
+            sort_event_type_id=Coalesce("event_type_id", Value(0), output_field=IntegerField())
+        )
+        sport = self.request.query_params.get("sport")
+        if sport:
+            queryset = queryset.filter(event_type_id=int(sport))
+        return queryset
+
+
+class CompetitionListView(CatalogListView):
+    """
+    Competitions with their sport's event_type_id.
+
+    Filters: ?sport=<event_type_id>, ?competition=<competition_id>.
+    """
+
+    serializer_class = CompetitionWithSportIdSerializer
+    cursor_ordering = ("competition_name", "id")
+
+    def get_queryset(self):
+        queryset = Competition.objects.select_related("sport")
+        sport = self.request.query_params.get("sport")
+        competition = self.request.query_params.get("competition")
+        if sport:
+            queryset = queryset.filter(sport__event_type_id=int(sport))
+        if competition:
+            queryset = queryset.filter(competition_id=competition)
+        return queryset
+
+
+class EventListView(CatalogListView):
+    """
+    Events with their sport's event_type_id and competition_id.
+
+    Filters: ?sport=<event_type_id>, ?competition=<competition_id>,
+    ?open_from / ?open_to (ISO date or datetime), ?is_disabled=true|false.
+    """
+
+    serializer_class = EventOnlySerializer
+    cursor_ordering = ("sort_open_date", "id")
+
+    def get_queryset(self):
+        # Events without an open date come last; the cursor position can't be NULL
+        queryset = Event.objects.select_related("sport", "competition").annotate(
+            sort_open_date=Coalesce("event_open_date", Value(NO_OPEN_DATE), output_field=DateTimeField())
+        )
+        params = self.request.query_params
+        if params.get("sport"):
+            queryset = queryset.filter(sport__event_type_id=int(params["sport"]))
+        if params.get("competition"):
+            queryset = queryset.filter(competition__competition_id=params["competition"])
+        if params.get("open_from"):
+            queryset = queryset.filter(event_open_date__gte=_parse_when(params["open_from"]))
+        if params.get("open_to"):
+            queryset = queryset.filter(event_open_date__lte=_parse_when(params["open_to"]))
+        if params.get("is_disabled") in ("true", "false"):
+            queryset = queryset.filter(is_disabled=params["is_disabled"] == "true")
+        return queryset
+
+
+# ----------------------------------------------
+#                 HELPER FUNCTIONS
+# ----------------------------------------------
+
+def _parse_when(value):
+    when = parse_datetime(value)
+    if when is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"invalid date: {value}")
+        when = datetime.combine(day, time.min)
+    return timezone.make_aware(when) if timezone.is_naive(when) else when
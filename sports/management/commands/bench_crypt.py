@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+
+from backend.services.crypt_service import CryptEngine
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark of per-call vs batched decryption with and without the key-derivation cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payloads", type=int, default=2000, help="Number of payloads per run")
+        parser.add_argument("--salts", type=int, default=16, help="Distinct salts among the payloads")
+        parser.add_argument("--size", type=int, default=4096, help="Approximate JSON size of each payload in bytes")
+        parser.add_argument("--password", default="bench-password")
+
+    def handle(self, *args, **options):
+        count, password = options["payloads"], options["password"]
+        sample = {"gmid": 559593926, "markets": ["x" * 32] * max(1, options["size"] // 36)}
+
+        # Ciphertexts are built with a limited set of salts, as upstream responses reuse them
+        builder = CryptEngine()
+        salts = [bytes([i % 256]) * 8 for i in range(max(1, options["salts"]))]
+        ciphertexts = [builder.encrypt(sample, password, salt=salts[i % len(salts)]) for i in range(count)]
+
+        uncached = CryptEngine(key_cache_size=0)
+        cached = CryptEngine()
+
+        runs = [
+            ("per-call, no key cache", lambda: [uncached.decrypt(c, password) for c in ciphertexts]),
+            ("per-call, key cache", lambda: [cached.decrypt(c, password) for c in ciphertexts]),
+            ("decrypt_many", lambda: cached.decrypt_many(ciphertexts, password)),
+            ("decrypt_many raw", lambda: cached.decrypt_many(ciphertexts, password, raw=True)),
+            ("encrypt per-call", lambda: [cached.encrypt(sample, password) for _ in range(count)]),
+            ("encrypt_many shared salt", lambda: cached.encrypt_many([sample] * count, password, share_salt=True)),
+        ]
+
+        self.stdout.write(f"{count} payloads, ~{options['size']} bytes each, {len(salts)} salts")
+        for name, run in runs:
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{name:<28} {count / elapsed:>12.0f} ops/s  {elapsed * 1000:>9.1f} ms")
+
+        self.stdout.write(f"key cache: {cached.cache_info()}")
@@ -0,0 +1,53 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from backend.renderers import FastJSONRenderer
+from backend.services.crypt_service import CryptEngine
+from sports.views import passthrough_response
+
+
+class Command(BaseCommand):
+    help = "CPU time per odds response: parse + re-serialize vs raw passthrough of the decrypted bytes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Responses built per mode")
+        parser.add_argument("--size", type=int, default=300, help="Approximate payload size in KB")
+        parser.add_argument("--password", default="bench-password")
+
+    def handle(self, *args, **options):
+        count, password = options["requests"], options["password"]
+        # Shaped like gamedataPrivate: markets → runners → back/lay ladder
+        runner = {"sid": 1, "nat": "Runner", "odds": [
+            {"oname": f"{side}{tier}", "otype": side, "odds": 1.5 + tier / 100, "size": 1000.25 + tier}
+            for side in ("back", "lay") for tier in range(1, 4)
+        ]}
+        market = {"mid": 1, "mname": "Match Odds", "gtype": "match", "section": [runner] * 3}
+        per_market = len(json.dumps(market))
+        payload = {"success": True, "data": [market] * max(1, options["size"] * 1024 // per_market)}
+
+        engine = CryptEngine()
+        ciphertext = engine.encrypt(payload, password)
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+
+        runs = [
+            ("parse + JSONRenderer", lambda: stock.render({"odds": engine.decrypt(ciphertext, password)})),
+            ("parse + FastJSONRenderer", lambda: fast.render({"odds": engine.decrypt(ciphertext, password)})),
+            ("raw passthrough", lambda: passthrough_response("odds", engine.decrypt(ciphertext, password, raw=True))),
+            ("decrypt only", lambda: engine.decrypt(ciphertext, password, raw=True)),
+        ]
+
+        self.stdout.write(f"{count} responses, payload {len(json.dumps(payload)) / 1024:.0f} KB")
+        baseline = None
+        for name, run in runs:
+            run()
+            started = time.process_time()
+            for _ in range(count):
+                run()
+            per_request = (time.process_time() - started) / count * 1000
+            baseline = baseline or per_request
+            saved = baseline - per_request
+            self.stdout.write(
+                f"{name:<26} {per_request:>8.3f} ms CPU/request   saved {saved:>7.3f} ms ({saved / baseline:>4.0%})"
+            )
@@ -0,0 +1,83 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand
+
+from backend.services.crypt_service import encrypt_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Local stand-in for the d247 API with injected latency and errors, for exercising "
+        "timeouts, hedging and the circuit breaker (run with BASE_URL=http://127.0.0.1:<port>/api)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--password", default="fake-password", help="Must match DECRYPTION_KEY")
+        parser.add_argument("--latency-ms", type=float, default=50, help="Base latency of every response")
+        parser.add_argument("--jitter-ms", type=float, default=20, help="Uniform jitter added to the latency")
+        parser.add_argument("--slow-ratio", type=float, default=0.05, help="Share of responses that are slow")
+        parser.add_argument("--slow-ms", type=float, default=2000, help="Extra latency of a slow response")
+        parser.add_argument("--error-ratio", type=float, default=0.0, help="Share of responses that are 503s")
+
+    def handle(self, *args, **options):
+        handler = type("FakeUpstreamHandler", (_FakeUpstreamHandler,), {"options": options})
+        server = ThreadingHTTPServer(("127.0.0.1", options["port"]), handler)
+        self.stdout.write(f"Fake upstream on http://127.0.0.1:{options['port']}/api")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+class _FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        options = self.options
+        delay = options["latency_ms"] + random.uniform(0, options["jitter_ms"])
+        if random.random() < options["slow_ratio"]:
+            delay += options["slow_ms"]
+        time.sleep(delay / 1000)
+
+        if random.random() < options["error_ratio"]:
+            return self._send(503, {"success": False})
+        url = urlsplit(self.path)
+        data = _payload(url.path.rstrip("/").rsplit("/", 1)[-1], parse_qs(url.query))
+        self._send(200, {"success": True, "data": encrypt_data(data, options["password"])})
+
+    do_GET = do_POST
+
+    def _send(self, status_code, body):
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _payload(endpoint, query):
+    """Small decrypted payloads shaped like the real endpoints."""
+    if endpoint == "treedata":
+        return {"t1": [{"etid": 4, "name": "Cricket", "children": [
+            {"cid": 1, "name": "Fake League", "children": [{"gmid": 1, "name": "A v B", "etid": 4}]},
+        ]}]}
+    runner = {"sid": 1, "nat": "A", "odds": [
+        {"oname": "back1", "otype": "back", "odds": round(random.uniform(1.5, 2.5), 2), "size": 100},
+        {"oname": "lay1", "otype": "lay", "odds": round(random.uniform(2.5, 3.5), 2), "size": 100},
+    ]}
+    if endpoint == "gamedataPrivate":
+        return [{"mid": 1, "mname": "Match Odds", "gmid": int(query.get("gmid", ["1"])[0]), "section": [runner]}]
+    return {"etid": int(query.get("etid", ["4"])[0]), "data": [{"gmid": 1, "ename": "A v B", "section": [runner]}]}
@@ -1,155 +1,84 @@
 import time
-import random
-import json
-from django.core.management.base import BaseCommand
-from django.db.models import Q
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-from backend.services.crypt_service import decrypt_data
-from sports.models import Event  # <-- replace with your actual Event model
+from concurrent.futures import ProcessPoolExecutor
 
-# -------------------------
-# Redis helper functions
-# -------------------------
-import redis
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-
-def set_ex_redis_data(key, value, ex_seconds=5):
-    redis_client.set(key, json.dumps(value), ex=ex_seconds)
-
-# -------------------------
-# JS hook for capturing gamedataPrivate responses
-# -------------------------
-CAPTURE_JS = r"""
-(function() {
-  if (window.__gamedataHookInstalled) return;
-  window.__gamedataHookInstalled = true;
-  window.__capturedGamedata = [];
-
-  const tryPush = (url, text) => {
-    if (/gamedataPrivate/.test(url)) {
-      window.__capturedGamedata.push({url, text, ts: Date.now()});
-    }
-  };
+from django.core.management.base import BaseCommand
+from django.db import connections
 
-  const _fetch = window.fetch;
-  if (_fetch) {
-    window.fetch = function() {
-      return _fetch.apply(this, arguments).then(async function(response) {
-        try {
-          const clone = response.clone();
-          const ct = clone.headers.get('content-type') || '';
-          if (ct.indexOf('application/json') !== -1) {
-            const text = await clone.text();
-            tryPush(clone.url, text);
-          }
-        } catch(e){}
-        return response;
-      });
-    };
-  }
+from backend.services.event_capture_service import capture_events
+from sports.models import Event
 
-  const _open = XMLHttpRequest.prototype.open;
-  const _send = XMLHttpRequest.prototype.send;
-  XMLHttpRequest.prototype.open = function(method, url) {
-    this.__requestedUrl = url;
-    return _open.apply(this, arguments);
-  };
-  XMLHttpRequest.prototype.send = function(body) {
-    this.addEventListener && this.addEventListener('readystatechange', function() {
-      if(this.readyState === 4 && this.responseText){
-        tryPush(this.__requestedUrl, this.responseText);
-      }
-    });
-    return _send.apply(this, arguments);
-  };
-})();
-"""
 
 # -------------------------
 # Django Management Command
 # -------------------------
 class Command(BaseCommand):
-    help = "Login first, then scrape events for sport_type_id=4 and store in Redis"
+    help = "Login first, then scrape the events of a sport in parallel browsers and store their odds in Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Browser processes, each logged in once")
+        parser.add_argument("--sport", type=int, default=4, help="Sport event_type_id")
+        parser.add_argument("--capture-timeout", type=float, default=5.0,
+                            help="Seconds to wait for an event page to load its odds")
 
     def handle(self, *args, **options):
         self.stdout.write("Starting scraping...")
 
-        # Setup undetected Chrome
-        options = uc.ChromeOptions()
-        options.add_argument("--disable-notifications")
-        options.add_argument("--start-maximized")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        driver = uc.Chrome(options=options)
-
-        # Inject JS hook for capturing gamedataPrivate
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": CAPTURE_JS})
-
-        # Random viewport
-        width = random.randint(300, 1920)
-        height = random.randint(500, 1080)
-        driver.set_window_size(width, height)
-        self.stdout.write(f"Viewport set to width: {width}, height: {height}")
-
-        try:
-            # 1️⃣ Open main page and login
-            driver.get("https://d247.com/")
-            WebDriverWait(driver, 10).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-
-            # Find and click "Login with demo ID" button
-            try:
-                buttons = driver.find_elements(By.TAG_NAME, "button")
-                for btn in buttons:
-                    if "Login with demo ID" in btn.text:
-                        btn.click()
-                        self.stdout.write("Clicked 'Login with demo ID'")
-                        break
-            except Exception as e:
-                self.stdout.write(f"Error clicking login button: {e}")
-
-            # Wait for login to complete (adjust selector if needed)
-            time.sleep(3)
-
-            # 2️⃣ Query events with sport_type_id=4
-            events = Event.objects.filter(sport__event_type_id=4)
-            self.stdout.write(f"Found {events.count()} events in database")
-
-            for element in events:
-                event_id = element.event_id  # External ID expected by site
-                sport_id = element.sport.oid  # Use the correct field for URL
-                url = f"https://d247.com/game-details/{sport_id}/{event_id}/"
-
-                driver.get(url)
-                # time.sleep(3)  # wait for APIs to fire
-
-                # 3️⃣ Get captured gamedata
-                captured = driver.execute_script("return window.__capturedGamedata || []")
-                if not captured:
-                    self.stdout.write(f"No gamedata captured for event {event_id}")
-                    continue
-
-                for item in captured:
-                    text = item.get("text")
-                    if not text:
-                        continue
+        # 2️⃣ Query events of the sport, sport oid included, in one query
+        rows = (
+            Event.objects.filter(sport__event_type_id=options["sport"])
+            .order_by("event_id")
+            .values_list("event_id", "sport__oid")
+        )
+        # An event listed under both trees is scraped once
+        sport_oids = {}
+        for event_id, sport_oid in rows:
+            sport_oids.setdefault(event_id, sport_oid)
+        events = list(sport_oids.items())
+        self.stdout.write(f"Found {len(events)} events in database")
+        if not events:
+            return
+
+        workers = max(1, min(options["workers"], len(events)))
+        # Round-robin shards keep the workers' lists the same length
+        shards = [events[worker::workers] for worker in range(workers)]
+        started = time.perf_counter()
+
+        if workers == 1:
+            results = [capture_events(0, shards[0], capture_timeout=options["capture_timeout"])]
+        else:
+            # Workers don't use the ORM; don't hand them the parent's DB connection
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(capture_events, worker, shard, capture_timeout=options["capture_timeout"])
+                    for worker, shard in enumerate(shards)
+                ]
+                results = []
+                for worker, future in enumerate(futures):
                     try:
-                        parsed = json.loads(text)
-                        data_payload = parsed.get("data", text)
-                        decrypted = decrypt_data(data_payload, "YOUR_PASSWORD_HERE")
-                        set_ex_redis_data(f"events-odds/{event_id}", decrypted, ex_seconds=5)
-                        self.stdout.write(f"Saved decrypted data for event {event_id}")
+                        results.append(future.result())
                     except Exception as e:
-                        self.stdout.write(f"Error decrypting event {event_id}: {e}")
-
-                # Clear captured array for next event
-                driver.execute_script("window.__capturedGamedata = [];")
-
-        finally:
-            driver.quit()
-            self.stdout.write("Scraping finished.")
-
+                        # The whole worker died (e.g. the browser would not start)
+                        event_ids = [str(event_id) for event_id, _ in shards[worker]]
+                        results.append({"worker": worker, "events": len(event_ids), "captured": 0,
+                                        "failed": len(event_ids), "failures": {str(e): event_ids}, "seconds": 0})
+
+        self.print_summary(results, time.perf_counter() - started)
+        self.stdout.write("Scraping finished.")
+
+    def print_summary(self, results, elapsed):
+        captured = sum(result["captured"] for result in results)
+        failed = sum(result["failed"] for result in results)
+        self.stdout.write(
+            f"{captured} captured, {failed} failed in {elapsed:.1f}s "
+            f"({(captured + failed) / elapsed:.2f} events/s, {len(results)} workers)"
+        )
+        for result in results:
+            rate = result["events"] / result["seconds"] if result["seconds"] else 0
+            self.stdout.write(
+                f"  worker {result['worker']}: {result['captured']}/{result['events']} captured, "
+                f"{result['failed']} failed, {result['seconds']}s ({rate:.2f} events/s)"
+            )
+            for error, event_ids in sorted(result["failures"].items(), key=lambda item: -len(item[1])):
+                sample = ", ".join(event_ids[:5]) + (", ..." if len(event_ids) > 5 else "")
+                self.stdout.write(f"    {len(event_ids)} x {error} ({sample})")
@@ -0,0 +1,20 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the catalog endpoints.
+
+    Pages are fetched with an indexed WHERE key > cursor instead of an OFFSET, so
+    deep pages cost the same as the first one. Each view orders by a stable,
+    non-null key of its own (view.cursor_ordering) with "id" breaking ties.
+    """
+
+    ordering = ("created_at", "id")
+    page_size = settings.CATALOG_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, "cursor_ordering", self.ordering))
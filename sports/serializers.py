@@ -20,6 +20,14 @@ class CompetitionWithSportSerializer(serializers.Serializer):
     competitions = CompetitionOnlySerializer(many=True)
 
 
+class CompetitionWithSportIdSerializer(serializers.ModelSerializer):
+    event_type_id = serializers.IntegerField(source="sport.event_type_id", read_only=True)
+
+    class Meta:
+        model = Competition
+        fields = ["competition_id", "competition_name", "competition_region", "market_count", "event_type_id"]
+
+
 class EventOnlySerializer(serializers.ModelSerializer):
     event_type_id = serializers.IntegerField(source="sport.event_type_id", read_only=True)
     competition_id = serializers.CharField(source="competition.competition_id", read_only=True)
@@ -1,3 +1,597 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import threading
+import time
+import unittest
+import uuid
+from base64 import b64decode
+from http.server import ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import redis
+import requests
+from Crypto.Cipher import AES
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from backend.services import rate_limit_service, scaper_service, tasks, token_manager
+from backend.services.browser_pool import BrowserPool
+from backend.services.cache_service import CACHE_FRESH, CACHE_MISS, CACHE_STALE, StaleWhileRevalidateCache
+from backend.services.crypt_service import CryptEngine, openssl_bytes_to_key
+from backend.services.odds_delta_service import diff_flat, flatten_odds
+from backend.services.odds_history_service import OddsHistoryBuffer, _Columns, decode_block, encode_block
+from backend.services.poll_scheduler import poll_interval
+from backend.services.rate_limit_service import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    RateLimitExceeded,
+    acquire,
+    priority,
+    rate_limit_stats,
+)
+from backend.services.redis_service import get_redis_client
+from backend.services.resilience_service import CIRCUIT_OPEN, CircuitOpenError, UpstreamGuard
+from backend.services.store_treedata_service import save_tree_data
+from backend.services.token_manager import TokenPool, TokenRefreshError
+from sports.management.commands.fake_upstream import _FakeUpstreamHandler
+from sports.models import Competition, Event, Sport
+from sports.views import odds_batch_response, parse_odds_batch
+
+
+def _redis():
+    """The configured Redis client; tests that need it are skipped when it is not reachable."""
+    client = get_redis_client()
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        raise unittest.SkipTest("Redis is not reachable at REDIS_URL")
+    return client
+
+
+def _snapshot(*runners):
+    return [{"mid": 1, "mname": "Match Odds", "section": [
+        {"sid": sid, "odds": [{"oname": "back1", "odds": price, "size": size}]} for sid, price, size in runners
+    ]}]
+
+
+class OddsDeltaTests(SimpleTestCase):
+    def test_flatten_odds(self):
+        flat = flatten_odds({"data": _snapshot((1, 1.5, 100), (2, "SUSPENDED", "-"))})
+        self.assertEqual(flat, {"1:1:back1": "1.5|100", "1:2:back1": "SUSPENDED|-"})
+
+    def test_diff_flat_keeps_non_numeric_price(self):
+        previous = flatten_odds(_snapshot((1, 1.5, 100)))
+        current = flatten_odds(_snapshot((1, "SUSPENDED", 100)))
+        self.assertEqual(diff_flat(previous, current),
+                         [{"m": "1", "r": "1", "k": "back1", "p": "SUSPENDED", "s": 100.0}])
+
+    def test_diff_flat_removed_runner(self):
+        previous = flatten_odds(_snapshot((1, 1.5, 100), (2, 2.5, 50)))
+        current = flatten_odds(_snapshot((1, 1.5, 100)))
+        self.assertEqual(diff_flat(previous, current),
+                         [{"m": "1", "r": "2", "k": "back1", "p": None, "s": None}])
+
+    def test_diff_flat_unchanged(self):
+        flat = flatten_odds(_snapshot((1, 1.5, 100)))
+        self.assertEqual(diff_flat(flat, dict(flat)), [])
+
+
+class OddsHistoryBlockTests(SimpleTestCase):
+    def test_encode_decode_round_trip(self):
+        columns = _Columns()
+        columns.append("1:1:back1", 1_700_000_000_000, 1.5, 100)
+        columns.append("1:2:back1", 1_700_000_000_250, "2.5", "40")
+        columns.append("1:1:back1", 1_700_000_001_000, 1.6, None)
+
+        names, ticks = decode_block(encode_block(columns))
+
+        self.assertEqual(names, ["1:1:back1", "1:2:back1"])
+        self.assertEqual(ticks[:2], [(0, 1_700_000_000_000, 1.5, 100.0), (1, 1_700_000_000_250, 2.5, 40.0)])
+        series_id, ts_ms, price, size = ticks[2]
+        self.assertEqual((series_id, ts_ms, price), (0, 1_700_000_001_000, 1.6))
+        self.assertNotEqual(size, size)  # NaN
+
+    def test_non_numeric_tick_keeps_columns_aligned(self):
+        columns = _Columns()
+        columns.append("1:1:back1", 1000, "SUSPENDED", "-")
+        with self.assertRaises(ValueError):
+            columns.append("1:1:back1", "not a timestamp", 1.5, 100)
+        lengths = {len(columns.series_ids), len(columns.timestamps), len(columns.prices), len(columns.sizes)}
+        self.assertEqual(lengths, {1})
+
+
+class OddsHistoryFlushTests(SimpleTestCase):
+    def test_idle_buffer_is_flushed_in_background(self):
+        client = _redis()
+        event_id = f"test-{uuid.uuid4().hex}"
+        buffer = OddsHistoryBuffer(redis_client=client, flush_ticks=1000, flush_interval=0.05)
+        buffer.append(event_id, [{"m": "1", "r": "1", "k": "back1", "p": 1.5, "s": 100}], ts_ms=1000)
+
+        keys = []
+        for _ in range(50):
+            keys = client.keys(f"odds-history/{event_id}/*")
+            if keys:
+                break
+            time.sleep(0.02)
+        self.addCleanup(lambda: keys and client.delete(*keys))
+
+        # No further append arrived, the flusher thread wrote the tick on its own
+        self.assertEqual(len(keys), 1)
+        names, ticks = decode_block(client.lindex(keys[0], 0))
+        self.assertEqual((names, ticks), (["1:1:back1"], [(0, 1000, 1.5, 100.0)]))
+
+
+class PollIntervalTests(SimpleTestCase):
+    now = 1_700_000_000
+
+    def test_in_play(self):
+        self.assertEqual(poll_interval(self.now - 60, self.now), settings.ODDS_POLL_INPLAY_INTERVAL)
+
+    def test_started_long_ago(self):
+        open_ts = self.now - settings.ODDS_POLL_INPLAY_MAX_AGE - 1
+        self.assertEqual(poll_interval(open_ts, self.now), settings.ODDS_POLL_DEFAULT_INTERVAL)
+
+    def test_starting_soon(self):
+        self.assertEqual(poll_interval(self.now + 60, self.now), settings.ODDS_POLL_SOON_INTERVAL)
+
+    def test_far_out(self):
+        open_ts = self.now + settings.ODDS_POLL_TODAY_WINDOW + 1
+        self.assertEqual(poll_interval(open_ts, self.now), settings.ODDS_POLL_FAR_INTERVAL)
+
+    def test_unknown_open_date(self):
+        self.assertEqual(poll_interval(None, self.now), settings.ODDS_POLL_DEFAULT_INTERVAL)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        options = {"password": "fake-password", "latency_ms": 0, "jitter_ms": 0,
+                   "slow_ratio": 0, "slow_ms": 0, "error_ratio": 1}
+        handler = type("FailingUpstreamHandler", (_FakeUpstreamHandler,), {"options": options})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/gamedataPrivate"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_opens_after_failures(self):
+        policy = {**settings.UPSTREAM_ENDPOINT_DEFAULTS, "failure_threshold": 2, "reset_timeout": 60, "hedge": False}
+        guard = UpstreamGuard("gamedataPrivate", policy)
+        admitted = []
+
+        def send(timeout):
+            return requests.post(self.url, json={}, timeout=timeout)
+
+        for _ in range(2):
+            self.assertEqual(guard.call(send).status_code, 503)
+        self.assertEqual(guard.breaker.state, CIRCUIT_OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            guard.call(send, admit=lambda: admitted.append(1))
+        # A rejected call never reaches the rate limiter
+        self.assertEqual(admitted, [])
+        self.assertEqual(guard.stats()["rejected"], 1)
+
+
+class BrowserPoolTests(SimpleTestCase):
+    def test_recycles_after_max_uses(self):
+        pool = BrowserPool(size=1, max_uses=2, max_age=3600, driver="fake")
+        try:
+            with pool.session() as first:
+                pass
+            with pool.session() as second:
+                pass
+            self.assertIs(first, second)
+            self.assertTrue(second.quit_called)
+
+            with pool.session() as third:
+                pass
+            self.assertIsNot(third, first)
+            self.assertEqual(pool.stats()["recycled"], 1)
+        finally:
+            pool.close()
+
+    def test_discards_unhealthy_session(self):
+        pool = BrowserPool(size=1, max_uses=10, max_age=3600, driver="fake")
+        try:
+            with pool.session() as driver:
+                driver.fail_health_check = True
+            with pool.session() as replacement:
+                pass
+            self.assertIsNot(replacement, driver)
+            self.assertTrue(driver.quit_called)
+            self.assertEqual(pool.stats()["unhealthy"], 1)
+        finally:
+            pool.close()
+
+
+def _tree(t1_competitions, t2_events=()):
+    """Decrypted treedata payload: one T1 sport (etid 4) with the given competitions and one T2 sport."""
+    return {"data": {
+        "t1": [{"etid": 4, "oid": 1, "name": "Cricket", "children": [
+            {"cid": cid, "name": name, "region": "IN", "children": [
+                {"gmid": gmid, "name": event_name, "sdatetime": "10/18/2026 07:30:00 PM"}
+                for gmid, event_name in events
+            ]}
+            for cid, name, events in t1_competitions
+        ]}],
+        "t2": [{"etid": 99, "oid": 2, "name": "Casino", "children": [
+            {"gmid": gmid, "name": event_name} for gmid, event_name in t2_events
+        ]}],
+    }}
+
+
+class TreeSyncTests(TestCase):
+    tree = _tree(
+        [("101", "IPL", [(1, "A v B"), (2, "C v D")]), ("102", "BBL", [(3, "E v F")])],
+        [(900, "Roulette")],
+    )
+
+    def test_initial_sync(self):
+        # Savepoint, then one select and one bulk insert per model, then release
+        with self.assertNumQueries(8):
+            stats = save_tree_data(self.tree)
+
+        self.assertEqual(stats, {
+            "sports": {"inserted": 2, "updated": 0, "deleted": 0},
+            "competitions": {"inserted": 2, "updated": 0, "deleted": 0},
+            "events": {"inserted": 4, "updated": 0, "deleted": 0},
+        })
+        self.assertEqual(Event.objects.get(event_id="900").competition_id, None)
+
+    def test_query_count_does_not_grow_with_tree(self):
+        save_tree_data(self.tree)
+        bigger = _tree(
+            [("101", "IPL", [(gmid, f"Match {gmid}") for gmid in range(1, 30)]),
+             ("102", "BBL", [(gmid, f"Match {gmid}") for gmid in range(30, 40)])],
+            [(900, "Roulette")],
+        )
+        # Savepoint, three selects, one insert and one update of events, release
+        with self.assertNumQueries(7):
+            stats = save_tree_data(bigger)
+        self.assertEqual(stats["events"], {"inserted": 36, "updated": 3, "deleted": 0})
+
+    def test_resync_edited_tree(self):
+        save_tree_data(self.tree)
+        ipl = Competition.objects.get(competition_id="101")
+
+        edited = _tree(
+            [("101", "IPL 2026", [(1, "A v B")]), ("103", "WPL", [(2, "C v D"), (4, "G v H")])],
+            [(900, "Roulette"), (901, "Blackjack")],
+        )
+        stats = save_tree_data(edited)
+
+        self.assertEqual(stats, {
+            "sports": {"inserted": 0, "updated": 0, "deleted": 0},
+            # IPL renamed, WPL added, BBL removed
+            "competitions": {"inserted": 1, "updated": 1, "deleted": 1},
+            # Event 2 moved to WPL; event 3 went with BBL (cascade); 4 and 901 are new
+            "events": {"inserted": 2, "updated": 1, "deleted": 0},
+        })
+        self.assertEqual(Competition.objects.get(pk=ipl.pk).competition_name, "IPL 2026")
+        self.assertFalse(Competition.objects.filter(competition_id="102").exists())
+        self.assertEqual(sorted(Event.objects.values_list("event_id", flat=True)), ["1", "2", "4", "900", "901"])
+
+        cricket = Sport.objects.get(event_type_id=4, tree="t1")
+        moved = Event.objects.get(event_id="2")
+        self.assertEqual(moved.competition_id, Competition.objects.get(competition_id="103").pk)
+        self.assertEqual(moved.sport_id, cricket.pk)
+        self.assertEqual(Event.objects.get(event_id="1").competition_id, ipl.pk)
+
+    def test_resync_unchanged_tree_writes_nothing(self):
+        save_tree_data(self.tree)
+        # Savepoint, three selects, release
+        with self.assertNumQueries(5):
+            stats = save_tree_data(self.tree)
+        self.assertEqual(stats["events"], {"inserted": 0, "updated": 0, "deleted": 0})
+        self.assertEqual(stats["competitions"], {"inserted": 0, "updated": 0, "deleted": 0})
+
+
+class CatalogETagTests(TestCase):
+    url = "/api/catalog/events/?page_size=2"
+
+    def setUp(self):
+        _redis()
+        with self.captureOnCommitCallbacks(execute=True):
+            save_tree_data(TreeSyncTests.tree)
+
+    def test_unchanged_page_is_served_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response["ETag"]), (200, etag))
+
+    def test_if_none_match_compares_whole_tags(self):
+        etag = self.client.get(self.url)["ETag"]
+        for header in (etag, f'W/"stale", {etag}', "*"):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=header).status_code, 304, header)
+        # A tag that merely contains part of the current one is not a match
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag[:-3] + '"').status_code, 200)
+
+    def test_sync_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            save_tree_data(TreeSyncTests.tree)
+        self.assertEqual(self.client.get(self.url)["ETag"], etag)
+
+        edited = _tree([("101", "IPL", [(1, "A v B")])], [(900, "Roulette")])
+        with self.captureOnCommitCallbacks(execute=True):
+            save_tree_data(edited)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class _Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def json(self):
+        return self._body
+
+
+class TokenPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = _redis()
+        prefix = f"test-g-token-{uuid.uuid4().hex}"
+        # Keep the pool off the real G_TOKEN_POOL keys and channel
+        for name, value in (("REDIS_KEY_G_TOKEN_SLOT", prefix + ":{slot}"),
+                            ("REDIS_KEY_G_TOKEN_LOCK", prefix + ":{slot}:refresh-lock"),
+                            ("REDIS_CHANNEL_G_TOKEN", prefix + ":updates")):
+            patcher = mock.patch(f"backend.services.token_manager.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: self.redis.delete(*(self.redis.keys(prefix + "*") or [prefix])))
+
+        self.fetched = itertools.count(1)
+        self.pool = TokenPool(self.redis, fetch_token=lambda: f"fresh-{next(self.fetched)}", size=2)
+        for slot, token in enumerate(("token-a", "token-b")):
+            self.redis.setex(token_manager.REDIS_KEY_G_TOKEN_SLOT.format(slot=slot), settings.G_TOKEN_TTL, token)
+
+    def test_acquire_prefers_least_loaded_token(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertEqual({first, second}, {"token-a", "token-b"})
+
+        # first is idle again while second still has a request in flight
+        self.pool.release(first)
+        self.assertEqual(self.pool.acquire(), first)
+
+        # One request each: whichever gets the next one, the other gets the one after
+        third = self.pool.acquire()
+        self.assertEqual(self.pool.acquire(), second if third == first else first)
+
+    def test_fetch_api_retires_token_on_401(self):
+        used = []
+
+        def make_request(cookie_value, *args, **kwargs):
+            used.append(cookie_value)
+            return _Response(401) if len(used) == 1 else _Response(200, {"success": True})
+
+        with mock.patch.object(scaper_service, "token_pool", self.pool), \
+                mock.patch.object(scaper_service, "make_request", make_request):
+            self.assertEqual(scaper_service.fetch_api("http://upstream.test/api/front/treedata"), {"success": True})
+
+        retired, retried = used
+        self.assertNotEqual(retried, retired)
+        slots = [self.redis.get(token_manager.REDIS_KEY_G_TOKEN_SLOT.format(slot=slot)) for slot in range(2)]
+        self.assertNotIn(retired.encode("utf-8"), slots)
+        self.assertEqual(self.pool.stats()["retired"], 1)
+
+    def test_acquire_raises_when_refresh_leaves_pool_empty(self):
+        self.redis.delete(*[token_manager.REDIS_KEY_G_TOKEN_SLOT.format(slot=slot) for slot in range(2)])
+        with mock.patch.object(self.pool, "_fill_blocking", return_value={}):
+            with self.assertRaises(TokenRefreshError):
+                self.pool.acquire()
+
+
+class StaleWhileRevalidateCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = _redis()
+        prefix = f"test-cache-{uuid.uuid4().hex}"
+        self.cache = StaleWhileRevalidateCache(prefix, ttl_ms=100, stale_ms=10000, redis_client=self.redis)
+        self.addCleanup(lambda: self.redis.delete(*(self.redis.keys(f"*{prefix}*") or [prefix])))
+        self.calls = []
+
+    def slow_fetch(self, value):
+        def fetch():
+            self.calls.append(value)
+            time.sleep(0.1)
+            return {"value": value}
+        return fetch
+
+    def test_concurrent_misses_fetch_once(self):
+        entries = []
+        threads = [
+            threading.Thread(target=lambda: entries.append(self.cache.get_or_fetch(1, self.slow_fetch("new"))))
+            for _ in range(8)
+        ]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual([entry.data() for entry in entries], [{"value": "new"}] * 8)
+        self.assertEqual(self.cache.stats()["process"][CACHE_MISS], 8)
+
+    def test_async_concurrent_misses_fetch_once(self):
+        async def fetch():
+            self.calls.append("new")
+            await asyncio.sleep(0.1)
+            return {"value": "new"}
+
+        async def run():
+            return await asyncio.gather(*(self.cache.aget_or_fetch(1, fetch) for _ in range(8)))
+
+        entries = asyncio.run(run())
+        self.assertEqual(self.calls, ["new"])
+        self.assertEqual({entry.raw for entry in entries}, {b'{"value":"new"}'})
+
+    def test_stale_entry_is_served_while_revalidating(self):
+        self.cache.store(1, {"value": "old"})
+        time.sleep(0.15)
+
+        entry = self.cache.get_or_fetch(1, self.slow_fetch("new"))
+        self.assertEqual((entry.state, entry.data()), (CACHE_STALE, {"value": "old"}))
+
+        for _ in range(50):
+            refreshed = self.cache.peek(1)
+            if refreshed.data() == {"value": "new"}:
+                break
+            time.sleep(0.02)
+        self.assertEqual((refreshed.state, refreshed.data()), (CACHE_FRESH, {"value": "new"}))
+        self.assertEqual(self.calls, ["new"])
+
+
+class OddsBatchTests(SimpleTestCase):
+    def test_timeout_must_be_positive(self):
+        for timeout_ms in (0, -50):
+            with self.assertRaises(ValueError):
+                parse_odds_batch({"events": [[4, 1]], "timeout_ms": timeout_ms})
+            response = self.client.post("/api/odds/batch/", {"events": [[4, 1]], "timeout_ms": timeout_ms},
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+
+    def test_timeout_is_capped(self):
+        pairs, timeout = parse_odds_batch({"events": [{"sport_id": 4, "event_id": 1}], "timeout_ms": 10 ** 9})
+        self.assertEqual((pairs, timeout), ([(4, 1)], settings.ODDS_BATCH_TIMEOUT_MS / 1000))
+        self.assertEqual(parse_odds_batch({"events": [[4, 1]]})[1], settings.ODDS_BATCH_TIMEOUT_MS / 1000)
+
+    def test_deadline_returns_partial_results(self):
+        client = _redis()
+        prefix = f"test-batch-{uuid.uuid4().hex}"
+        cache = StaleWhileRevalidateCache(prefix, ttl_ms=1000, stale_ms=1000, redis_client=client)
+        self.addCleanup(lambda: client.delete(*(client.keys(f"*{prefix}*") or [prefix])))
+
+        def slow():
+            time.sleep(0.5)
+            return {"slow": True}
+
+        pairs, timeout = parse_odds_batch({"events": [[4, 1], [4, 2]], "timeout_ms": 100})
+        started = time.monotonic()
+        results = cache.get_many_or_fetch([(1, lambda: {"fast": True}), (2, slow)], timeout)
+        self.assertLess(time.monotonic() - started, 0.4)
+
+        body = json.loads(odds_batch_response(pairs, results).content)
+        self.assertFalse(body["complete"])
+        self.assertEqual([(item["event_id"], item["status"], item["odds"]) for item in body["results"]],
+                         [(1, "miss", {"fast": True}), (2, "timeout", None)])
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = _redis()
+        self.endpoint = f"test-{uuid.uuid4().hex}"
+        self.addCleanup(lambda: self.redis.delete(*(self.redis.keys(f"upstream-rate*{self.endpoint}*") or ["-"])))
+
+    def limit(self, rate, burst, reserve=0.0):
+        return override_settings(
+            UPSTREAM_RATE_LIMITS={self.endpoint: {"rate": rate, "burst": burst}},
+            UPSTREAM_RATE_BACKGROUND_RESERVE=reserve,
+            UPSTREAM_RATE_MAX_WAIT_INTERACTIVE=0,
+            UPSTREAM_RATE_MAX_WAIT_BACKGROUND=0,
+        )
+
+    def take(self, count, level=PRIORITY_INTERACTIVE):
+        """How many of count requests got a token right away."""
+        return sum(rate_limit_service._try_take(self.endpoint, level) is None for _ in range(count))
+
+    def test_refill_and_burst_cap(self):
+        with self.limit(rate=20, burst=3):
+            self.assertEqual(self.take(4), 3)
+            wait_ms = rate_limit_service._try_take(self.endpoint, PRIORITY_INTERACTIVE)
+            self.assertTrue(0 < wait_ms <= 50, wait_ms)
+
+            # 0.12 s at 20/s refills two tokens
+            time.sleep(0.12)
+            self.assertEqual(self.take(3), 2)
+
+            # A long pause refills up to the burst, not beyond it
+            time.sleep(0.5)
+            self.assertEqual(self.take(10), 3)
+
+    def test_background_leaves_reserve_to_interactive(self):
+        # Half of the burst is reserved; the refill is too slow to matter here
+        with self.limit(rate=0.01, burst=4, reserve=0.5):
+            self.assertEqual(self.take(4, PRIORITY_BACKGROUND), 2)
+            with priority(PRIORITY_BACKGROUND), self.assertRaises(RateLimitExceeded):
+                acquire(self.endpoint)
+
+            # The reserved tokens are still there for interactive requests
+            self.assertEqual(self.take(4), 2)
+            stats = rate_limit_stats()[self.endpoint]
+            self.assertEqual((stats["allowed:background"], stats["rejected:background"]), (2, 1))
+
+
+class CryptEngineTests(SimpleTestCase):
+    def test_round_trip(self):
+        engine = CryptEngine()
+        payload = {"gmid": 1, "odds": [1.85, 2.1]}
+
+        self.assertEqual(engine.decrypt(engine.encrypt(payload, "secret"), "secret"), payload)
+        self.assertEqual(engine.decrypt(engine.encrypt("plain text", "secret"), "secret"), "plain text")
+        blobs = engine.encrypt_many(["a", "b", "c"], "secret")
+        self.assertEqual(engine.decrypt_many(blobs, "secret"), ["a", "b", "c"])
+        self.assertEqual(engine.decrypt(blobs[0], "secret", raw=True), b"a")
+
+    def test_matches_openssl_key_derivation(self):
+        salt = b"12345678"
+        blob = CryptEngine().encrypt("hello", "secret", salt=salt)
+        key, iv = openssl_bytes_to_key(b"secret", salt, 32, 16)
+        encrypted = b64decode(blob)[16:]
+        self.assertEqual(AES.new(key, AES.MODE_CBC, iv).decrypt(encrypted), b"hello" + bytes([11]) * 11)
+
+    def test_key_derivation_is_cached_per_salt(self):
+        engine = CryptEngine()
+        blobs = engine.encrypt_many([{"n": n} for n in range(5)], "secret", share_salt=True)
+        self.assertEqual(engine.decrypt_many(blobs, "secret"), [{"n": n} for n in range(5)])
+
+        info = engine.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 9))
+
+        with mock.patch("backend.services.crypt_service.openssl_bytes_to_key") as derive:
+            engine.decrypt(blobs[0], "secret")
+        derive.assert_not_called()
+
+
+class TreeSyncTaskTests(TestCase):
+    def setUp(self):
+        self.redis = _redis()
+        prefix = f"test-tree-{uuid.uuid4().hex}"
+        for name, key in (("REDIS_KEY_TREE_HASHES", "hashes"), ("REDIS_KEY_TREE_SYNC_RATE", "rate")):
+            patcher = mock.patch.object(tasks, name, f"{prefix}:{key}")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            self.addCleanup(self.redis.delete, f"{prefix}:{key}")
+        patcher = mock.patch.object(tasks, "store_tree_snapshot", return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, tree):
+        with mock.patch.object(tasks, "get_tree_record", return_value=tree), \
+                mock.patch.object(tasks, "save_tree_data", wraps=save_tree_data) as save:
+            return tasks.save_tree_data_task(), save
+
+    def test_only_changed_sport_subtrees_are_synced(self):
+        tree = _tree([("101", "IPL", [(1, "A v B")])], [(900, "Roulette")])
+        result, save = self.run_task(tree)
+        self.assertEqual(result["synced_sports"], ["t1:4", "t2:99"])
+        save.assert_called_once_with(tree, sport_names={"t1:4", "t2:99"})
+
+        result, save = self.run_task(tree)
+        self.assertEqual(result["message"], "Tree data unchanged")
+        self.assertEqual(result["skipped_sports"], ["t1:4", "t2:99"])
+        save.assert_not_called()
+
+        edited = _tree([("101", "IPL", [(1, "A v B"), (2, "C v D")])], [(900, "Roulette")])
+        result, save = self.run_task(edited)
+        self.assertEqual((result["synced_sports"], result["skipped_sports"]), (["t1:4"], ["t2:99"]))
+        save.assert_called_once_with(edited, sport_names={"t1:4"})
+        self.assertEqual(result["stats"]["events"], {"inserted": 1, "updated": 0, "deleted": 0})
+        self.assertTrue(Event.objects.filter(event_id="2", competition__competition_id="101").exists())
@@ -1,8 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from .views import TreeRecordView,OddsView,HighlightHomePrivateView
+from .catalog_views import SportListView, CompetitionListView, EventListView
+from .views import TreeRecordView,OddsView,HighlightHomePrivateView,UpstreamStatsView,CacheStatsView,PollSchedulerStatsView,OddsDeltasView,OddsHistoryView,OddsAnalyticsView,OddsBatchView
+
+if settings.ASYNC_PROXY_VIEWS:
+    # ASGI deployments await upstream I/O instead of blocking a worker thread
+    from .async_views import (
+        AsyncTreeRecordView as TreeRecordView,
+        AsyncOddsView as OddsView,
+        AsyncOddsBatchView as OddsBatchView,
+        AsyncHighlightHomePrivateView as HighlightHomePrivateView,
+        OddsStreamView,
+    )
 
 urlpatterns = [
     path('tree-record/', TreeRecordView.as_view(), name='tree_record_api'),
     path("odds/", OddsView.as_view(), name="odds"),
+    path("odds/batch/", OddsBatchView.as_view(), name="odds-batch"),
+    path("odds/deltas/", OddsDeltasView.as_view(), name="odds-deltas"),
+    path("odds/history/", OddsHistoryView.as_view(), name="odds-history"),
+    path("odds/analytics/", OddsAnalyticsView.as_view(), name="odds-analytics"),
     path("highlight-home/", HighlightHomePrivateView.as_view(), name="highlight-home"),
-]
\ No newline at end of file
+    path("catalog/sports/", SportListView.as_view(), name="catalog-sports"),
+    path("catalog/competitions/", CompetitionListView.as_view(), name="catalog-competitions"),
+    path("catalog/events/", EventListView.as_view(), name="catalog-events"),
+    path("upstream/stats/", UpstreamStatsView.as_view(), name="upstream-stats"),
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("odds/poll/stats/", PollSchedulerStatsView.as_view(), name="odds-poll-stats"),
+]
+
+if settings.ASYNC_PROXY_VIEWS:
+    # Long-lived streams need the ASGI server; under WSGI each one would pin a worker
+    urlpatterns.append(path("odds/stream/", OddsStreamView.as_view(), name="odds-stream"))
@@ -1,15 +1,34 @@
+import json
 import os
+import time
+
 from dotenv import load_dotenv
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
 
-from backend.services.scaper_service import (
-    get_tree_record,
-    get_odds,
-    get_highlight_home_private,
+from backend.services.scaper_service import get_tree_record, token_pool
+from backend.services.cache_service import (
+    CacheEntry,
+    get_cached_highlight,
+    get_cached_odds,
+    get_cached_odds_many,
+    highlight_cache,
+    odds_cache,
 )
+from backend.services.odds_delta_service import get_odds_changes
+from backend.services.odds_analytics_service import analyze_events
+from backend.services.odds_history_service import get_ohlc
+from backend.services.odds_poller_service import get_poll_targets
+from backend.services.poll_scheduler import scheduler_metrics
+from backend.services.tree_snapshot_service import get_tree_snapshot, store_tree_snapshot
+from backend.services.rate_limit_service import RateLimitExceeded, rate_limit_stats
+from backend.services.resilience_service import resilience_stats
+from backend.services.upstream_client import upstream_pool_stats
+from sports.models import Event
 
 load_dotenv()
 
@@ -22,15 +41,104 @@ def get_decryption_key():
     return key
 
 
+def passthrough_response(field, raw_json, headers=None):
+    """Wrap already-encoded JSON bytes as {"<field>": ...} without a parse/serialize cycle."""
+    response = HttpResponse(b'{"%s":%s}' % (field.encode("utf-8"), raw_json), content_type="application/json")
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def parse_odds_batch(data):
+    """
+    Validate an odds batch body: {"events": [{"sport_id", "event_id"} or [sport_id, event_id]], "timeout_ms"}.
+
+    timeout_ms is optional and capped at ODDS_BATCH_TIMEOUT_MS.
+    Returns ([(sport_id, event_id)], timeout in seconds); raises ValueError on bad input.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("events"), list) or not data["events"]:
+        raise ValueError("events must be a non-empty list")
+    if len(data["events"]) > settings.ODDS_BATCH_MAX_ITEMS:
+        raise ValueError(f"at most {settings.ODDS_BATCH_MAX_ITEMS} events per batch")
+
+    pairs = []
+    for item in data["events"]:
+        sport_id, event_id = (item.get("sport_id"), item.get("event_id")) if isinstance(item, dict) else item
+        pairs.append((int(sport_id), int(event_id)))
+
+    timeout_ms = data.get("timeout_ms")
+    timeout_ms = settings.ODDS_BATCH_TIMEOUT_MS if timeout_ms is None else int(timeout_ms)
+    if timeout_ms <= 0:
+        raise ValueError("timeout_ms must be positive")
+    return pairs, min(timeout_ms, settings.ODDS_BATCH_TIMEOUT_MS) / 1000
+
+
+def odds_batch_response(pairs, results):
+    """
+    One combined response with a status per event: hit/stale/miss, error or timeout.
+
+    "complete" is false when some events are missing, e.g. because the deadline
+    was reached; the other results are still returned.
+    """
+    items, complete = [], True
+    for (sport_id, event_id), result in zip(pairs, results):
+        item = {"sport_id": sport_id, "event_id": event_id}
+        if isinstance(result, CacheEntry):
+            item.update(status=result.state, age_ms=result.age_ms)
+        elif result is None:
+            item["status"] = "timeout"
+            complete = False
+        else:
+            item.update(status="error", error=str(result))
+            complete = False
+        items.append((item, result if isinstance(result, CacheEntry) else None))
+
+    if not settings.PROXY_RAW_PASSTHROUGH:
+        results = [{**item, "odds": entry.data() if entry else None} for item, entry in items]
+        return HttpResponse(json.dumps({"complete": complete, "results": results}), content_type="application/json")
+
+    encoded = []
+    for item, entry in items:
+        meta = json.dumps(item, separators=(",", ":")).encode("utf-8")
+        encoded.append(meta[:-1] + b',"odds":' + (entry.raw if entry else b"null") + b"}")
+    body = b'{"complete":%s,"results":[%s]}' % (b"true" if complete else b"false", b",".join(encoded))
+    return HttpResponse(body, content_type="application/json")
+
+
+def accepts_gzip(request):
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+
+def tree_snapshot_response(snapshot, request):
+    """Send the stored tree bytes as-is (304 when the client already has this version)."""
+    if snapshot.etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type="application/json")
+        if snapshot.gzipped:
+            response["Content-Encoding"] = "gzip"
+    response["ETag"] = snapshot.etag
+    response["Vary"] = "Accept-Encoding"
+    response["X-Snapshot-Age-Ms"] = str(snapshot.age_ms)
+    return response
+
+
 class BaseAPIView(APIView):
     """Base APIView with common methods."""
 
     def handle_exception(self, exc):
+        if isinstance(exc, RateLimitExceeded):
+            return Response({"error": str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": "1"})
         return Response({"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class TreeRecordView(BaseAPIView):
-    """API endpoint to fetch and return tree records."""
+    """
+    API endpoint to fetch and return tree records.
+
+    Served from the snapshot kept by save_tree_data_task; d247 is only called
+    when no snapshot exists yet.
+    """
 
     def get(self, request, *args, **kwargs):
         TARGET_URL = "https://d247.com/game-details/4/559593926"
@@ -38,10 +146,15 @@ class TreeRecordView(BaseAPIView):
 
         # run_scraper(target_url=TARGET_URL, password_for_decrypt=PASSWORD_FOR_DECRYPT)
         try:
+            snapshot = get_tree_snapshot(gzipped=accepts_gzip(request))
+            if snapshot is not None:
+                return tree_snapshot_response(snapshot, request)
+
             key = get_decryption_key()
             data = get_tree_record(key)
             if "error" in data:
                 return Response(data, status=status.HTTP_401_UNAUTHORIZED)
+            store_tree_snapshot(data)
             return Response({"message": "Tree data fetched successfully", "data": data}, status=status.HTTP_200_OK)
         except Exception as e:
             return self.handle_exception(e)
@@ -62,15 +175,116 @@ class OddsView(BaseAPIView):
                 )
 
             key = get_decryption_key()
-            data = get_odds(int(sport_id), int(event_id), key)
-            return Response({"odds": data}, status=status.HTTP_200_OK)
+            entry = get_cached_odds(int(sport_id), int(event_id), key)
+            headers = {"X-Cache": entry.state, "X-Cache-Age-Ms": str(entry.age_ms)}
+            if settings.PROXY_RAW_PASSTHROUGH:
+                return passthrough_response("odds", entry.raw, headers)
+            return Response({"odds": entry.data()}, status=status.HTTP_200_OK, headers=headers)
+
+        except Exception as e:
+            return self.handle_exception(e)
+
+
+class OddsBatchView(BaseAPIView):
+    """API endpoint returning odds of many events in one request (see parse_odds_batch for the body)."""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            try:
+                pairs, timeout = parse_odds_batch(request.data)
+            except (TypeError, ValueError) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            key = get_decryption_key()
+            return odds_batch_response(pairs, get_cached_odds_many(pairs, key, timeout))
+
+        except Exception as e:
+            return self.handle_exception(e)
+
+
+class OddsDeltasView(BaseAPIView):
+    """API endpoint returning odds changes of an event after a sequence number."""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            event_id = request.query_params.get("event_id")
+            after_seq = request.query_params.get("after_seq")
+            if not event_id:
+                return Response({"error": "event_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+            changes = get_odds_changes(int(event_id), int(after_seq) if after_seq else None)
+            return Response(changes, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return self.handle_exception(e)
+
+
+class OddsHistoryView(BaseAPIView):
+    """
+    API endpoint returning OHLC bars of an event's odds.
+
+    Query params: event_id, optional market_id, start/end (epoch ms, default the
+    last hour) and interval (ms, default 60000).
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            event_id = request.query_params.get("event_id")
+            if not event_id:
+                return Response({"error": "event_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+            event = Event.objects.filter(event_id=event_id).values("event_id", "event_name", "sport__event_type_id").first()
+            if event is None:
+                return Response({"error": "event not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            end = int(request.query_params.get("end") or time.time() * 1000)
+            start = int(request.query_params.get("start") or end - 3600 * 1000)
+            interval = int(request.query_params.get("interval") or 60000)
+            if start > end or interval <= 0:
+                return Response({"error": "invalid start, end or interval"}, status=status.HTTP_400_BAD_REQUEST)
+
+            series = get_ohlc(event_id, start, end, interval, request.query_params.get("market_id"))
+            return Response(
+                {
+                    "event_id": event["event_id"],
+                    "event_name": event["event_name"],
+                    "sport_id": event["sport__event_type_id"],
+                    "start": start,
+                    "end": end,
+                    "interval": interval,
+                    "series": series,
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return self.handle_exception(e)
+
+
+class OddsAnalyticsView(BaseAPIView):
+    """API endpoint returning implied probabilities, overround, spreads and arbitrage flags."""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            event_ids = request.query_params.get("event_ids")
+            sport_id = request.query_params.get("sport_id")
+            if event_ids:
+                event_ids = [int(event_id) for event_id in event_ids.split(",") if event_id.strip()]
+            elif sport_id:
+                event_ids = [event_id for _, event_id in get_poll_targets(int(sport_id))]
+            else:
+                return Response({"error": "event_ids or sport_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({"events": analyze_events(event_ids)}, status=status.HTTP_200_OK)
 
         except Exception as e:
             return self.handle_exception(e)
 
 
 class HighlightHomePrivateView(BaseAPIView):
-    """API endpoint to fetch highlight home private data using etid."""
+    """API endpoint to fetch highlight home private data using etid, served from the prefetched cache."""
 
     def get(self, request, *args, **kwargs):
         try:
@@ -79,8 +293,42 @@ class HighlightHomePrivateView(BaseAPIView):
                 return Response({"error": "etid is required"}, status=status.HTTP_400_BAD_REQUEST)
 
             key = get_decryption_key()
-            data = get_highlight_home_private(int(etid), key)
-            return Response({"highlight": data}, status=status.HTTP_200_OK)
+            entry = get_cached_highlight(int(etid), key)
+            headers = {"X-Cache": entry.state, "X-Cache-Age-Ms": str(entry.age_ms)}
+            if settings.PROXY_RAW_PASSTHROUGH:
+                return passthrough_response("highlight", entry.raw, headers)
+            return Response({"highlight": entry.data()}, status=status.HTTP_200_OK, headers=headers)
 
         except Exception as e:
             return self.handle_exception(e)
+
+
+class UpstreamStatsView(BaseAPIView):
+    """API endpoint exposing upstream connection pool usage, per-endpoint breaker/latency state, rate limits and g_token sessions."""
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "pools": upstream_pool_stats(),
+                "endpoints": resilience_stats(),
+                "rate_limits": rate_limit_stats(),
+                "sessions": token_pool.stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class CacheStatsView(BaseAPIView):
+    """API endpoint exposing hit/miss/stale counts of the odds and highlight caches."""
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {"odds": odds_cache.stats(), "highlight": highlight_cache.stats()}, status=status.HTTP_200_OK
+        )
+
+
+class PollSchedulerStatsView(BaseAPIView):
+    """API endpoint exposing odds poll queue size, backlog and lag."""
+
+    def get(self, request, *args, **kwargs):
+        return Response({"scheduler": scheduler_metrics()}, status=status.HTTP_200_OK)